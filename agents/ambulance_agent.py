@@ -1,95 +1,32 @@
 from typing import Dict, Any
+import asyncio
+import logging
+import functools
+import heapq
+from operator import itemgetter
 from agents.base_agent import BaseAgent
 from schemas.agent_schema import AgentOutputSchema
-from utils.file_utils import read_json_file, format_evidence_path
-import google.generativeai as genai
-import json
+from utils.file_utils import read_json_file, format_evidence_path, dumps_json, get_mtime_ns
+from utils.gemini_client import configure, get_model
 from config import Config
 
-class AmbulanceAgent(BaseAgent):
-    """
-    Ambulance/Transport verification agent that assesses transport needs
-    and provider availability using Gemini API.
-    """
-    
-    def __init__(self, api_key: str = None):
-        super().__init__("Ambulance")
-        
-        if api_key:
-            genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
-        
-    def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
-        """Verify transport requirements and availability"""
-        self.start_timer()
-        
-        # Load data files
-        patient_data = self.load_patient_data(patient_id)
-        # Transport providers are global resources, not per-patient
-        transport_providers = read_json_file("data/transport_providers.json")
-        
-        self.add_checked_field("mobility")
-        self.add_checked_field("discharge_disposition")
-        self.add_checked_field("transport_providers")
-        
-        # Build prompt for Gemini
-        prompt = self._build_verification_prompt(patient_data, transport_providers)
-        
-        try:
-            # print("  Calling Gemini API for ambulance verification...")
-            
-            generation_config = {
-                "temperature": 0.1,
-                "max_output_tokens": 8192,
-                "response_mime_type": "application/json"
-            }
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-            
-            # Check if response has text
-            if not response or not response.text:
-                print("  ✗ Gemini API returned empty response")
-                print("  → Falling back to rule-based verification...")
-                return self._fallback_verification(patient_data, transport_providers)
-            
-            print("  Gemini API response received, parsing...")
-            result = self._parse_gemini_response(response.text)
-            print(f"  ✓ Ambulance verification complete (NOC: {result['noc']})")
-            
-            return self.create_output(
-                noc=result["noc"],
-                confidence=result["confidence"],
-                issues=result["issues"],
-                raw_response=result.get("raw_data", {})
-            )
-            
-        except Exception as e:
-            print(f"  ✗ Gemini API error: {type(e).__name__}: {str(e)}")
-            print(f"  → Falling back to rule-based verification...")
-            return self._fallback_verification(patient_data, transport_providers)
-    
-    def _build_verification_prompt(self, patient_data: Dict, transport_providers: Dict) -> str:
-        """Build verification prompt for Gemini"""
-        
-        # Extract relevant patient info
-        patient_info = patient_data.get("Patient Information", {})
-        diagnosis = patient_info.get("Current Diagnosis", "")
-        conditions = patient_info.get("Existing Conditions", "")
-        
-        return f"""You are an Ambulance/Transport Verification Agent for hospital discharge.
-Assess if patient needs ambulance transport and verify provider availability.
+logger = logging.getLogger(__name__)
 
-PATIENT INFORMATION:
-- Diagnosis: {diagnosis}
-- Existing Conditions: {conditions}
-- Age: {patient_info.get("Age", "Unknown")}
-- Address: {patient_info.get("Address", "Unknown")}
+TRANSPORT_PROVIDERS_FILE = "data/transport_providers.json"
+
+# Diagnoses or billed procedures that suggest the patient needs ambulance transport
+_TRANSPORT_TRIGGER_KEYWORDS = frozenset({"cancer", "dialysis", "chemotherapy", "transplant"})
+
+# Providers further out than this cannot serve a same-day discharge
+MAX_PROVIDER_ETA_MINUTES = 120
+
+_CONTEXT_HEADER = """You are an Ambulance/Transport Verification Agent for hospital discharge.
+Assess if patient needs ambulance transport and verify provider availability.
 
 TRANSPORT PROVIDERS:
-{json.dumps(transport_providers, indent=2)}
+"""
+
+_CONTEXT_RUBRIC = """
 
 ASSESSMENT RULES:
 1. Transport REQUIRED if:
@@ -108,27 +45,27 @@ ASSESSMENT RULES:
 
 OUTPUT REQUIREMENTS:
 Return ONLY valid JSON (no markdown):
-{{
+{
   "noc": true or false,
   "confidence": 0.0 to 1.0,
   "issues": [
-    {{
+    {
       "code": "ISSUE_CODE",
       "title": "Short title",
       "severity": "low|medium|high|critical",
       "message": "Detailed explanation",
       "suggested_action": "What to do",
       "evidence": ["file_path#reference"],
-      "data": {{"key": "value"}}
-    }}
+      "data": {"key": "value"}
+    }
   ],
-  "raw_data": {{
+  "raw_data": {
     "transport_required": true or false,
     "recommended_vehicle_type": "BLS|ALS|ICU|Wheelchair",
     "provider_available": true or false,
     "estimated_eta": 0
-  }}
-}}
+  }
+}
 
 ISSUE CODES:
 - TRANSPORT_REQUIRED: Transport assessment completed, booking needed
@@ -138,55 +75,145 @@ ISSUE CODES:
 Set noc=true if transport not required OR suitable provider available with acceptable ETA.
 Set noc=false if transport required but no suitable provider available.
 """
+
+
+@functools.lru_cache(maxsize=4)
+def _static_context(providers_mtime_ns: int) -> str:
+    """Render the shared prompt context once per version of the providers file"""
+    transport_providers = read_json_file(TRANSPORT_PROVIDERS_FILE)
+    return _CONTEXT_HEADER + dumps_json(transport_providers, indent=False) + _CONTEXT_RUBRIC
+
+
+class AmbulanceAgent(BaseAgent):
+    """
+    Ambulance/Transport verification agent that assesses transport needs
+    and provider availability using Gemini API.
+    """
     
-    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse Gemini response"""
+    # Gemini generation settings; the SDK copies this per call
+    _GEN_CONFIG = {
+        "temperature": 0.1,
+        "max_output_tokens": 8192,
+        "response_mime_type": "application/json"
+    }
+    
+    def __init__(self, api_key: str = None):
+        super().__init__("Ambulance")
+        
+        # No model in offline mode; verify() goes straight to the rule-based checks
+        self.model = None
+        if not Config.OFFLINE_MODE:
+            if api_key:
+                configure(api_key)
+            self.model = get_model(Config.GEMINI_MODEL)
+        
+    def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Verify transport requirements and availability"""
+        self.start_timer()
+        
+        patient_data, transport_providers = self._load_inputs(patient_id)
+        
+        if self.model is None:
+            return self._fallback_verification(patient_data, transport_providers)
+        
+        # Build prompt for Gemini (static rubric + provider list is cached server-side)
+        static_context = self._build_static_context()
+        prompt = self._build_verification_prompt(patient_data)
+        
         try:
-            cleaned = response_text.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-            
-            result = json.loads(cleaned)
-            
-            issues = []
-            for issue_data in result.get("issues", []):
-                # Normalize severity
-                severity = issue_data.get("severity", "medium").lower()
-                if severity not in ["low", "medium", "high", "critical"]:
-                    severity = "medium"
-                
-                # Normalize evidence
-                evidence = issue_data.get("evidence", [])
-                if isinstance(evidence, dict):
-                    evidence = [f"{k}: {v}" for k, v in evidence.items()]
-                elif isinstance(evidence, str):
-                    evidence = [evidence]
-
-                issues.append(self.create_issue(
-                    code=issue_data["code"],
-                    title=issue_data["title"],
-                    severity=severity,
-                    message=issue_data["message"],
-                    suggested_action=issue_data["suggested_action"],
-                    evidence=evidence,
-                    data=issue_data.get("data", {})
-                ))
+            response_text = self._generate_content(
+                prompt,
+                self._GEN_CONFIG,
+                use_cache=kwargs.get("use_cache", True),
+                static_context=static_context,
+                validate=self._check_verification
+            )
+            return self._output_from_response(response_text, patient_data, transport_providers)
             
-            return {
-                "noc": result["noc"],
-                "confidence": result["confidence"],
-                "issues": issues,
-                "raw_data": result.get("raw_data", {})
-            }
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, transport_providers)
+    
+    async def averify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Async variant of verify() that awaits the Gemini call"""
+        self.start_timer()
+        
+        patient_data, transport_providers = await asyncio.to_thread(self._load_inputs, patient_id)
+        
+        if self.model is None:
+            return self._fallback_verification(patient_data, transport_providers)
+        
+        static_context = self._build_static_context()
+        prompt = self._build_verification_prompt(patient_data)
+        
+        try:
+            response_text = await self._agenerate_content(
+                prompt,
+                self._GEN_CONFIG,
+                use_cache=kwargs.get("use_cache", True),
+                static_context=static_context,
+                validate=self._check_verification
+            )
+            return self._output_from_response(response_text, patient_data, transport_providers)
             
         except Exception as e:
-            print(f"Error parsing Gemini response: {e}")
-            raise
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, transport_providers)
+    
+    def _load_inputs(self, patient_id: str) -> tuple:
+        """Load the patient record and transport providers for verification"""
+        # Transport providers are global resources, not per-patient
+        providers_future = self.submit_read(TRANSPORT_PROVIDERS_FILE)
+        patient_data = self.load_patient_data(patient_id)
+        transport_providers = providers_future.result()
+        
+        self.add_checked_field("mobility")
+        self.add_checked_field("discharge_disposition")
+        self.add_checked_field("transport_providers")
+        
+        return patient_data, transport_providers
+    
+    def _output_from_response(self, response_text: str, patient_data: Dict, transport_providers: Dict) -> AgentOutputSchema:
+        """Turn Gemini response text into agent output, falling back if it is empty"""
+        # Check if response has text
+        if not response_text:
+            logger.warning("Gemini API returned empty response; falling back to rule-based verification")
+            return self._fallback_verification(patient_data, transport_providers)
+        
+        logger.debug("Gemini API response received, parsing")
+        result = self._parse_gemini_response(response_text)
+        logger.info("Ambulance verification complete (NOC: %s)", result["noc"])
+        
+        return self.create_output(
+            noc=result["noc"],
+            confidence=result["confidence"],
+            issues=result["issues"],
+            raw_response=result.get("raw_data", {}),
+            validate=True
+        )
+    
+    def _build_static_context(self) -> str:
+        """Build the prompt context shared by every patient (rubric + providers)"""
+        return _static_context(get_mtime_ns(TRANSPORT_PROVIDERS_FILE))
+    
+    def _build_verification_prompt(self, patient_data: Dict) -> str:
+        """Build the per-patient part of the verification prompt"""
+        
+        # Extract relevant patient info
+        patient_info = patient_data.get("Patient Information", {})
+        diagnosis = patient_info.get("Current Diagnosis", "")
+        conditions = patient_info.get("Existing Conditions", "")
+        
+        return f"""PATIENT INFORMATION:
+- Diagnosis: {diagnosis}
+- Existing Conditions: {conditions}
+- Age: {patient_info.get("Age", "Unknown")}
+- Address: {patient_info.get("Address", "Unknown")}
+"""
+    
+    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
+        """Parse Gemini response"""
+        return self._parse_gemini_json(response_text)
     
     def _fallback_verification(self, patient_data: Dict, transport_providers: Dict) -> AgentOutputSchema:
         """Fallback rule-based verification"""
@@ -197,26 +224,32 @@ Set noc=false if transport required but no suitable provider available.
         diagnosis = patient_data.get("Patient Information", {}).get("Current Diagnosis", "").lower()
         age = int(patient_data.get("Patient Information", {}).get("Age", "0"))
         
-        transport_required = False
-        if "cancer" in diagnosis or "dialysis" in str(patient_data.get("Billing", {}).get("Items", [])).lower():
-            transport_required = True
+        items_text = " ".join(
+            item.get("Description", "") for item in patient_data.get("Billing", {}).get("Items", [])
+        ).lower()
+        transport_required = any(
+            keyword in diagnosis or keyword in items_text
+            for keyword in _TRANSPORT_TRIGGER_KEYWORDS
+        )
         
         if transport_required:
             # Check for available providers
             if transport_providers:
-                available_providers = []
-                for provider in transport_providers.get("providers", []):
-                    for vehicle_type, availability in provider.get("current_availability", {}).items():
-                        if availability.get("available") and availability.get("eta_minutes", 999) < 120:
-                            available_providers.append({
-                                "provider": provider.get("name"),
-                                "vehicle": vehicle_type,
-                                "eta": availability.get("eta_minutes"),
-                                "cost": availability.get("cost")
-                            })
+                # Single pass over provider vehicles; only the fastest one is needed
+                available_providers = (
+                    {
+                        "provider": provider.get("name"),
+                        "vehicle": vehicle_type,
+                        "eta": availability.get("eta_minutes"),
+                        "cost": availability.get("cost")
+                    }
+                    for provider in transport_providers.get("providers", [])
+                    for vehicle_type, availability in provider.get("current_availability", {}).items()
+                    if availability.get("available") and availability.get("eta_minutes", 999) < MAX_PROVIDER_ETA_MINUTES
+                )
+                best_provider = next(iter(heapq.nsmallest(1, available_providers, key=itemgetter("eta"))), None)
                 
-                if available_providers:
-                    best_provider = min(available_providers, key=lambda x: x["eta"])
+                if best_provider is not None:
                     issues.append(self.create_issue(
                         code="TRANSPORT_REQUIRED",
                         title="Ambulance Transport Recommended",
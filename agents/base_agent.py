@@ -1,10 +1,270 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
-from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+from datetime import timedelta
+import asyncio
+import concurrent.futures
+import contextvars
 import json
+import logging
+import os
+import re
+import threading
+import time
 
 from schemas.agent_schema import AgentOutputSchema, IssueSchema, AgentMetadata
-from utils.file_utils import read_json_file, format_evidence_path, calculate_elapsed_ms
+from utils.file_utils import read_json_file, read_json_file_cached, read_json_indexed, format_evidence_path, loads_json, dumps_json
+from utils.gemini_cache import prompt_key, get_cached_response, cache_response
+from utils.circuit_breaker import GEMINI_BREAKER
+from utils.gemini_client import async_slot
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# Server-side Gemini context caches, one per agent or coordinator:
+# owner -> (context key, model, expires_at, CachedContent)
+# A model of None records a failed creation, so it is not retried until expiry
+_CONTEXT_CACHES: Dict[str, tuple] = {}
+CONTEXT_CACHE_TTL = timedelta(hours=1)
+
+# Smallest context Gemini accepts for explicit caching (Gemini 2.5 Flash; some
+# models need more). Estimated at 4 characters per token, so smaller contexts
+# are sent inline without a create call that is bound to fail.
+CONTEXT_CACHE_MIN_TOKENS = 1024
+
+# One lock per owner so concurrent first calls create a single cache
+_CONTEXT_LOCKS: Dict[str, threading.Lock] = {}
+_CONTEXT_LOCKS_GUARD = threading.Lock()
+
+
+def _context_lock(owner: str) -> threading.Lock:
+    """Get the lock serializing context cache creation for an owner"""
+    with _CONTEXT_LOCKS_GUARD:
+        return _CONTEXT_LOCKS.setdefault(owner, threading.Lock())
+
+
+def get_context_model(owner: str, static_context: str) -> Optional[Any]:
+    """
+    Get a model bound to a server-side Gemini cache of a static prompt context.
+    
+    The cache is recreated when the static context changes or expires, and
+    the cache it replaces is deleted. Contexts below CONTEXT_CACHE_MIN_TOKENS
+    are never cached.
+    
+    Args:
+        owner: Agent (or coordinator) name the cache belongs to
+        static_context: Prompt text shared by every call of the owner
+        
+    Returns:
+        GenerativeModel using the cached context, or None if caching is unavailable
+    """
+    if len(static_context) // 4 < CONTEXT_CACHE_MIN_TOKENS:
+        return None
+    
+    key = prompt_key(static_context)
+    entry = _CONTEXT_CACHES.get(owner)
+    if entry and entry[0] == key and entry[2] > time.monotonic():
+        return entry[1]
+    
+    with _context_lock(owner):
+        # Another caller may have created the cache while this one waited
+        now = time.monotonic()
+        entry = _CONTEXT_CACHES.get(owner)
+        if entry and entry[0] == key and entry[2] > now:
+            return entry[1]
+        
+        model = None
+        cached_content = None
+        try:
+            # Imported lazily so offline runs never load the Gemini SDK
+            import google.generativeai as genai
+            from google.generativeai import caching
+            
+            cached_content = caching.CachedContent.create(
+                model=Config.GEMINI_MODEL,
+                display_name=f"{owner} prompt context",
+                contents=[static_context],
+                ttl=CONTEXT_CACHE_TTL
+            )
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+        except Exception as e:
+            logger.warning("Gemini context cache unavailable (%s): %s", owner, type(e).__name__)
+        
+        # Drop the replaced server-side cache (e.g. the providers file changed)
+        # instead of leaving it to run out its TTL
+        if entry and entry[3] is not None and entry[2] > now:
+            try:
+                entry[3].delete()
+            except Exception:
+                pass
+        
+        # Expire our handle slightly before the server-side cache does
+        _CONTEXT_CACHES[owner] = (key, model, now + CONTEXT_CACHE_TTL.total_seconds() - 60, cached_content)
+        return model
+
+
+# Start of the verification running in the current task or thread (perf_counter_ns).
+# Agents are shared by concurrent workflow runs, so the timer cannot live on the
+# instance; asyncio tasks and asyncio.to_thread each get their own copy.
+_START_NS: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("agent_start_ns", default=None)
+
+# Parsed patient data keyed by (path, mtime_ns) -> (data, {patient_id: record})
+_PATIENT_CACHE: Dict[tuple, tuple] = {}
+
+# Worker threads for overlapping independent reference-file reads
+_IO_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-io")
+
+
+class JsonBoundary:
+    """
+    Finds where the top-level JSON value ends in streamed text.
+    
+    Brace and bracket depth is tracked across chunks, ignoring anything inside
+    string literals, so a stream can stop as soon as the value is complete.
+    """
+    
+    # Characters that change nesting or string state
+    _TOKEN_RE = re.compile(r'[{}\[\]"\\]')
+    
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        # Absolute position of the character following a backslash in a string
+        self._escaped_pos = -1
+        self._offset = 0
+    
+    def feed(self, text: str) -> int:
+        """
+        Scan the next chunk of text.
+        
+        Args:
+            text: Chunk of the streamed response
+            
+        Returns:
+            Index just past the end of the top-level value within this chunk,
+            or -1 if the value has not closed yet
+        """
+        for match in self._TOKEN_RE.finditer(text):
+            pos = self._offset + match.start()
+            char = match.group()
+            if self.in_string:
+                if pos == self._escaped_pos:
+                    continue
+                if char == "\\":
+                    self._escaped_pos = pos + 1
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            elif char in "}]" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return match.end()
+        self._offset += len(text)
+        return -1
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Text of one streamed response chunk (the final chunk may carry no parts)"""
+    return chunk.text if chunk.parts else ""
+
+
+def _json_boundary(generation_config: Optional[Dict[str, Any]]) -> Optional[JsonBoundary]:
+    """Boundary tracker for JSON-mode responses (None for free-form text)"""
+    if generation_config and generation_config.get("response_mime_type") == "application/json":
+        return JsonBoundary()
+    return None
+
+
+def _append_chunk(chunks: List[str], chunk: Any, boundary: Optional[JsonBoundary]) -> bool:
+    """
+    Add a streamed chunk's text, cut at the end of the JSON value if it closes.
+    
+    Returns:
+        True once the response is complete and the rest of the stream can be skipped
+    """
+    text = _chunk_text(chunk)
+    end = boundary.feed(text) if boundary is not None else -1
+    if end < 0:
+        chunks.append(text)
+        return False
+    chunks.append(text[:end])
+    return True
+
+
+def stream_content(
+    model: Any,
+    contents: Any,
+    generation_config: Optional[Dict[str, Any]] = None,
+    request_options: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Stream a Gemini response and return its text, guarded by GEMINI_BREAKER.
+    
+    In JSON mode reading stops as soon as the top-level value closes.
+    
+    Args:
+        model: GenerativeModel to call
+        contents: Prompt contents
+        generation_config: Optional Gemini generation config
+        request_options: Optional request options (e.g. timeout)
+        
+    Returns:
+        Response text (empty string if Gemini returned nothing)
+        
+    Raises:
+        CircuitOpenError: If recent Gemini calls kept failing
+    """
+    GEMINI_BREAKER.check()
+    chunks = []
+    try:
+        stream = model.generate_content(
+            contents,
+            generation_config=generation_config,
+            request_options=request_options,
+            stream=True
+        )
+        boundary = _json_boundary(generation_config)
+        for chunk in stream:
+            if _append_chunk(chunks, chunk, boundary):
+                break
+    except Exception:
+        GEMINI_BREAKER.record_failure()
+        raise
+    GEMINI_BREAKER.record_success()
+    return "".join(chunks)
+
+
+async def astream_content(
+    model: Any,
+    contents: Any,
+    generation_config: Optional[Dict[str, Any]] = None,
+    request_options: Optional[Dict[str, Any]] = None
+) -> str:
+    """Async variant of stream_content() using generate_content_async under async_slot()"""
+    GEMINI_BREAKER.check()
+    chunks = []
+    try:
+        async with async_slot():
+            stream = await model.generate_content_async(
+                contents,
+                generation_config=generation_config,
+                request_options=request_options,
+                stream=True
+            )
+            boundary = _json_boundary(generation_config)
+            async for chunk in stream:
+                if _append_chunk(chunks, chunk, boundary):
+                    break
+    except Exception:
+        GEMINI_BREAKER.record_failure()
+        raise
+    GEMINI_BREAKER.record_success()
+    return "".join(chunks)
 
 
 class BaseAgent(ABC):
@@ -13,6 +273,12 @@ class BaseAgent(ABC):
     Provides common utilities and enforces standard output schema.
     """
     
+    # Markdown code fence around a JSON response: leading ```/```json and trailing ```
+    _FENCE_RE = re.compile(r"\A```(?:json)?|```\Z")
+    
+    # Severity levels accepted by IssueSchema
+    _VALID_SEVERITIES = frozenset({"low", "medium", "high", "critical"})
+    
     def __init__(self, agent_name: str):
         """
         Initialize the base agent.
@@ -21,23 +287,37 @@ class BaseAgent(ABC):
             agent_name: Name of the agent (e.g., "Insurance", "Pharmacy")
         """
         self.agent_name = agent_name
-        self.start_time = None
-        self.checked_fields = []
+        # Insertion-ordered set of checked fields (dict keys keep order)
+        self.checked_fields: Dict[str, None] = {}
+        
+    def start_timer(self, elapsed_ns: int = 0) -> int:
+        """
+        Start the execution timer for the current verification.
+        
+        The start is kept per asyncio task (or thread), so concurrent runs
+        sharing this agent each measure their own elapsed time.
         
-    def start_timer(self):
-        """Start the execution timer"""
-        self.start_time = datetime.now()
+        Args:
+            elapsed_ns: Time already spent on this verification (e.g. its share
+                of a batch), counted as if the timer had started that much earlier
+        
+        Returns:
+            Start time from time.perf_counter_ns()
+        """
+        start = time.perf_counter_ns() - elapsed_ns
+        _START_NS.set(start)
+        return start
         
     def get_elapsed_ms(self) -> float:
-        """Get elapsed time in milliseconds"""
-        if self.start_time is None:
+        """Get elapsed time in milliseconds since start_timer() in the current task"""
+        start = _START_NS.get()
+        if start is None:
             return 0.0
-        return calculate_elapsed_ms(self.start_time)
+        return (time.perf_counter_ns() - start) / 1_000_000
     
     def add_checked_field(self, field_name: str):
         """Add a field to the list of checked fields"""
-        if field_name not in self.checked_fields:
-            self.checked_fields.append(field_name)
+        self.checked_fields[field_name] = None
     
     def create_issue(
         self,
@@ -47,7 +327,8 @@ class BaseAgent(ABC):
         message: str,
         suggested_action: str,
         evidence: List[str] = None,
-        data: Dict[str, Any] = None
+        data: Dict[str, Any] = None,
+        validate: bool = False
     ) -> IssueSchema:
         """
         Create a standardized issue object.
@@ -60,11 +341,14 @@ class BaseAgent(ABC):
             suggested_action: What should be done
             evidence: List of evidence paths
             data: Supporting data
+            validate: Run pydantic validation; needed only for values taken from
+                a Gemini response, agent-built issues skip it
             
         Returns:
             IssueSchema object
         """
-        return IssueSchema(
+        schema = IssueSchema if validate else IssueSchema.model_construct
+        return schema(
             code=code,
             title=title,
             severity=severity,
@@ -79,7 +363,8 @@ class BaseAgent(ABC):
         noc: bool,
         confidence: float,
         issues: List[IssueSchema] = None,
-        raw_response: Dict[str, Any] = None
+        raw_response: Dict[str, Any] = None,
+        validate: bool = False
     ) -> AgentOutputSchema:
         """
         Create standardized agent output.
@@ -89,28 +374,318 @@ class BaseAgent(ABC):
             confidence: Confidence score (0.0 to 1.0)
             issues: List of issues found
             raw_response: Optional raw data
+            validate: Run pydantic validation (see create_issue)
             
         Returns:
             AgentOutputSchema object
         """
-        meta = AgentMetadata(
-            checked_fields=self.checked_fields,
+        meta = AgentMetadata.model_construct(
+            checked_fields=list(self.checked_fields),
             time_ms=self.get_elapsed_ms(),
             raw_response=raw_response or {}
         )
         
-        return AgentOutputSchema(
+        schema = AgentOutputSchema if validate else AgentOutputSchema.model_construct
+        return schema(
             agent=self.agent_name,
             noc=noc,
             confidence=confidence,
             issues=issues or [],
             meta=meta
         )
-    
+
+    def _get_context_model(self, static_context: str) -> Optional[Any]:
+        """Get a model bound to a server-side cache of this agent's static prompt context"""
+        return get_context_model(self.agent_name, static_context)
+
+    def _lookup_cached_response(self, full_prompt: str, use_cache: bool) -> tuple:
+        """
+        Check the response cache for a prompt.
+        
+        Args:
+            full_prompt: Complete prompt text (static context included)
+            use_cache: Whether caching is enabled for this call
+            
+        Returns:
+            Tuple of (cache key or None, cached response text or None)
+        """
+        if not use_cache:
+            return None, None
+        key = prompt_key(full_prompt)
+        cached = get_cached_response(key)
+        if cached is not None:
+            logger.info("Gemini cache hit (%s)", self.agent_name)
+        else:
+            logger.info("Gemini cache miss (%s), calling API", self.agent_name)
+        return key, cached
+
+    def _select_model(self, prompt: str, full_prompt: str, static_context: str = None) -> tuple:
+        """
+        Pick the model and contents to send, preferring a context-cached model.
+        
+        Returns:
+            Tuple of (model, contents)
+        """
+        if static_context and Config.GEMINI_CONTEXT_CACHE:
+            context_model = self._get_context_model(static_context)
+            if context_model is not None:
+                return context_model, prompt
+        return self.model, full_prompt
+
+    @classmethod
+    def _check_json_object(cls, response_text: str):
+        """
+        Default response check for JSON-mode calls.
+        
+        Raises:
+            ValueError: If the text does not decode to a JSON object
+        """
+        if not isinstance(cls._loads_tolerant(response_text), dict):
+            raise ValueError("Gemini response is not a JSON object")
+
+    @classmethod
+    def _check_verification(cls, response_text: str):
+        """
+        Response check for single-patient verification calls.
+        
+        Raises:
+            ValueError: If the text is not a JSON object carrying noc and confidence
+        """
+        result = cls._loads_tolerant(response_text)
+        if not isinstance(result, dict) or "noc" not in result or "confidence" not in result:
+            raise ValueError("Gemini response is missing noc or confidence")
+
+    def _store_response(
+        self,
+        key: Optional[str],
+        response_text: str,
+        validate: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """
+        Remember response text under the cache key.
+        
+        A response that fails validate (e.g. truncated or malformed JSON) is
+        returned to the caller but not cached, so a retry asks Gemini again.
+        """
+        if key and response_text:
+            if validate is not None:
+                try:
+                    validate(response_text)
+                except Exception:
+                    return response_text
+            cache_response(key, response_text)
+        return response_text
+
+    def _response_validator(
+        self,
+        generation_config: Dict[str, Any],
+        validate: Optional[Callable[[str], Any]]
+    ) -> Optional[Callable[[str], Any]]:
+        """The check a response must pass before it is cached (JSON-mode calls default to _check_json_object)"""
+        if validate is not None:
+            return validate
+        if generation_config.get("response_mime_type") == "application/json":
+            return self._check_json_object
+        return None
+
+    def _generate_content(
+        self,
+        prompt: str,
+        generation_config: Dict[str, Any],
+        use_cache: bool = True,
+        static_context: str = None,
+        validate: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """
+        Call Gemini for a prompt, reusing a recent response for an identical prompt.
+        
+        The response is streamed so text starts arriving before generation finishes;
+        in JSON mode reading stops as soon as the top-level value closes.
+
+        Args:
+            prompt: Per-call prompt text
+            generation_config: Gemini generation config
+            use_cache: Whether to consult and populate the response cache
+            static_context: Optional prompt prefix shared across calls; sent through
+                Gemini context caching when available, otherwise prepended to prompt
+            validate: Check that must pass (not raise) before the response is
+                cached; JSON-mode calls default to requiring a JSON object
+
+        Returns:
+            Raw response text (empty string if Gemini returned nothing)
+            
+        Raises:
+            CircuitOpenError: If recent Gemini calls kept failing; callers fall
+                back to rule-based verification without waiting on the API
+        """
+        full_prompt = f"{static_context}\n{prompt}" if static_context else prompt
+        key, cached = self._lookup_cached_response(full_prompt, use_cache)
+        if cached is not None:
+            return cached
+
+        # Checked before model selection too, so an open circuit skips context caching
+        GEMINI_BREAKER.check()
+        model, contents = self._select_model(prompt, full_prompt, static_context)
+        response_text = stream_content(model, contents, generation_config)
+        return self._store_response(key, response_text, self._response_validator(generation_config, validate))
+
+    async def _agenerate_content(
+        self,
+        prompt: str,
+        generation_config: Dict[str, Any],
+        use_cache: bool = True,
+        static_context: str = None,
+        validate: Optional[Callable[[str], Any]] = None
+    ) -> str:
+        """
+        Async variant of _generate_content() using generate_content_async.
+        
+        Context cache creation is a blocking SDK call and runs in a worker thread.
+        """
+        full_prompt = f"{static_context}\n{prompt}" if static_context else prompt
+        key, cached = self._lookup_cached_response(full_prompt, use_cache)
+        if cached is not None:
+            return cached
+
+        GEMINI_BREAKER.check()
+        model, contents = await asyncio.to_thread(
+            self._select_model, prompt, full_prompt, static_context
+        )
+        response_text = await astream_content(model, contents, generation_config)
+        return self._store_response(key, response_text, self._response_validator(generation_config, validate))
+
+    @classmethod
+    def _strip_fence(cls, response_text: str) -> str:
+        """Remove a markdown code fence around JSON text; fence-free text skips the regex"""
+        cleaned = response_text.strip()
+        if cleaned[:1] != "`":
+            return cleaned
+        return cls._FENCE_RE.sub("", cleaned).strip()
+
+    @classmethod
+    def _loads_tolerant(cls, response_text: str) -> Any:
+        """
+        Decode a Gemini JSON response, tolerating prose around the JSON object.
+        
+        The fence-stripped text is decoded directly first. If that fails, the
+        first balanced top-level {...} object is cut out and decoded instead.
+        
+        Args:
+            response_text: Raw response text, optionally fenced or wrapped in prose
+            
+        Returns:
+            Decoded JSON value
+            
+        Raises:
+            ValueError: If no decodable JSON object is found
+        """
+        cleaned = cls._strip_fence(response_text)
+        try:
+            return loads_json(cleaned)
+        except ValueError:
+            start = cleaned.find("{")
+            if start < 0:
+                raise
+            end = JsonBoundary().feed(cleaned[start:])
+            if end < 0:
+                raise
+            return loads_json(cleaned[start:start + end])
+
+    def _parse_gemini_json(self, response_text: str) -> Dict[str, Any]:
+        """
+        Parse a Gemini JSON verification response into NOC, confidence and issues.
+        
+        Args:
+            response_text: Raw response text, optionally wrapped in a code fence
+            
+        Returns:
+            Dict with noc, confidence, issues (IssueSchema list) and raw_data
+        """
+        try:
+            result = self._loads_tolerant(response_text)
+            
+            issues = []
+            for issue_data in result.get("issues", []):
+                # Normalize severity
+                severity = issue_data.get("severity", "medium").lower()
+                if severity not in self._VALID_SEVERITIES:
+                    severity = "medium"
+                
+                # Normalize evidence
+                evidence = issue_data.get("evidence", [])
+                if isinstance(evidence, dict):
+                    evidence = [f"{k}: {v}" for k, v in evidence.items()]
+                elif isinstance(evidence, str):
+                    evidence = [evidence]
+
+                issues.append(self.create_issue(
+                    code=issue_data["code"],
+                    title=issue_data["title"],
+                    severity=severity,
+                    message=issue_data["message"],
+                    suggested_action=issue_data["suggested_action"],
+                    evidence=evidence,
+                    data=issue_data.get("data", {}),
+                    validate=True
+                ))
+            
+            return {
+                "noc": result["noc"],
+                "confidence": result["confidence"],
+                "issues": issues,
+                "raw_data": result.get("raw_data", {})
+            }
+            
+        except Exception as e:
+            logger.error("Error parsing Gemini response: %s", e)
+            raise
+
+    @staticmethod
+    def _record_patient_id(patient: Dict[str, Any]) -> Optional[str]:
+        """Resolve a patient record's ID, checking the common locations in priority order"""
+        info = patient.get("Patient Information")
+        if info:
+            pid = info.get("Patient ID")
+            if pid:
+                return pid
+        return patient.get("patient_id") or patient.get("id")
+
+    @staticmethod
+    def _load_patient_index(path: str) -> tuple:
+        """
+        Parse the patient data file once per modification and index it by patient ID.
+        
+        Args:
+            path: Path to the patient data JSON file
+            
+        Returns:
+            Tuple of (parsed data, {patient_id: record})
+        """
+        key = (path, os.stat(path).st_mtime_ns)
+        cached = _PATIENT_CACHE.get(key)
+        if cached is not None:
+            return cached
+        
+        data = read_json_file(path)
+        index = {}
+        if isinstance(data, list):
+            for patient in data:
+                pid = BaseAgent._record_patient_id(patient)
+                if pid:
+                    # First record wins, matching a front-to-back scan
+                    index.setdefault(pid, patient)
+        
+        # Only the current version of the file is kept
+        _PATIENT_CACHE.clear()
+        _PATIENT_CACHE[key] = (data, index)
+        return data, index
+
     def load_patient_data(self, patient_id: str = None) -> Dict[str, Any]:
         """
         Load patient data from JSON file.
         
+        The parsed file is cached until its modification time changes.
+        
         Args:
             patient_id: Optional patient ID to filter for. If None, uses self.patient_id.
             
@@ -120,34 +695,40 @@ class BaseAgent(ABC):
         target_id = patient_id or getattr(self, 'patient_id', None)
         
         try:
-            data = read_json_file("patient_data.json")
-            
-            # Handle list of patients
-            if isinstance(data, list):
-                if not target_id:
-                    # If no ID specified and data is list, return first one or raise error
-                    # For safety, let's default to P00231 if we can't find one
-                    return data[0]
-                
-                # Find specific patient
-                for patient in data:
-                    # Check various common locations for ID
-                    pid = (patient.get("Patient Information", {}).get("Patient ID") or 
-                           patient.get("patient_id") or 
-                           patient.get("id"))
-                    
-                    if pid == target_id:
-                        return patient
-                
-                print(f"⚠️  Patient ID {target_id} not found in patient_data.json")
-                return {}
+            data, index = self._load_patient_index("patient_data.json")
             
-            return data
+            # A single-patient file is returned as-is
+            if not isinstance(data, list):
+                return data
+            
+            if not target_id:
+                # If no ID specified, default to the first patient in the file
+                return data[0]
+            
+            patient = index.get(target_id)
+            if patient is None:
+                logger.warning("Patient ID %s not found in patient_data.json", target_id)
+                return {}
+            return patient
             
         except Exception as e:
-            print(f"Error loading patient data: {e}")
+            logger.error("Error loading patient data: %s", e)
             return {}
 
+    def submit_read(self, file_path: str, cached: bool = False) -> concurrent.futures.Future:
+        """
+        Start reading a JSON file in the shared I/O pool.
+        
+        Args:
+            file_path: Path to the JSON file
+            cached: Reuse the parsed contents until the file changes (the result
+                is shared and must not be mutated)
+            
+        Returns:
+            Future resolving to the parsed file contents (None on failure)
+        """
+        return _IO_POOL.submit(read_json_file_cached if cached else read_json_file, file_path)
+
     def get_patient_record(self, data: List[Dict], patient_id: str, id_field: str = "patient_id") -> Dict[str, Any]:
         """
         Helper to find a specific patient's record in a list of records.
@@ -168,6 +749,34 @@ class BaseAgent(ABC):
                 return record
         return {}
     
+    def get_indexed_record(self, file_path: str, patient_id: str, id_field: str = "patient_id") -> Dict[str, Any]:
+        """
+        Look up a patient's record in a JSON reference file through a cached index.
+        
+        Files that are not a list of records are handled as in get_patient_record().
+        
+        Args:
+            file_path: Path to the JSON file
+            patient_id: ID to look for
+            id_field: Field name containing the ID (default: "patient_id")
+            
+        Returns:
+            Matching record or empty dict (shared; must not be mutated)
+        """
+        index = read_json_indexed(file_path, id_field)
+        if index is None:
+            return self.get_patient_record(read_json_file_cached(file_path), patient_id, id_field)
+        return index.get(patient_id, {})
+
+    def submit_record(self, file_path: str, patient_id: str) -> concurrent.futures.Future:
+        """
+        Start get_indexed_record() in the shared I/O pool.
+        
+        Returns:
+            Future resolving to the patient's record (empty dict if absent)
+        """
+        return _IO_POOL.submit(self.get_indexed_record, file_path, patient_id)
+    
     @abstractmethod
     def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
         """
@@ -182,6 +791,22 @@ class BaseAgent(ABC):
         """
         pass
 
+    async def averify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """
+        Async verification entry point so the orchestrator can run agents concurrently.
+        
+        The default runs verify() in a worker thread; agents override it to await
+        the Gemini call directly.
+        
+        Args:
+            patient_id: Patient identifier
+            **kwargs: Additional agent-specific parameters
+            
+        Returns:
+            AgentOutputSchema with verification results
+        """
+        return await asyncio.to_thread(self.verify, patient_id, **kwargs)
+
     def to_json(self, output: AgentOutputSchema) -> str:
         """Convert output to JSON string"""
         return output.model_dump_json(indent=2)
@@ -189,3 +814,137 @@ class BaseAgent(ABC):
     def to_dict(self, output: AgentOutputSchema) -> Dict[str, Any]:
         """Convert output to dictionary"""
         return output.model_dump()
+
+
+async def run_all_agents(agents: List[BaseAgent], patient_id: str, **kwargs) -> Dict[str, AgentOutputSchema]:
+    """
+    Run several agents' verifications concurrently.
+    
+    Wall-clock time becomes that of the slowest agent instead of the sum.
+    
+    Args:
+        agents: Agents to run
+        patient_id: Patient identifier
+        **kwargs: Passed to each agent's averify()
+        
+    Returns:
+        Dict mapping agent name to its output
+    """
+    outputs = await asyncio.gather(*(agent.averify(patient_id, **kwargs) for agent in agents))
+    return {agent.agent_name: output for agent, output in zip(agents, outputs)}
+
+
+class BatchedGeminiClient:
+    """
+    Collects verification prompts from several agents and answers them with a
+    single Gemini call.
+    
+    The orchestrator enqueues each agent's prompt and flushes once; agents then
+    read their own section of the combined JSON response with get_result().
+    """
+    
+    DEFAULT_GEN_CONFIG = {
+        "temperature": 0.1,
+        "max_output_tokens": 8192,
+        "response_mime_type": "application/json"
+    }
+    
+    DEFAULT_PREAMBLE = """The following sections are independent verification tasks for the same hospital discharge.
+Answer every section exactly as its own instructions require."""
+    
+    def __init__(self, model: Any, generation_config: Dict[str, Any] = None, preamble: str = None):
+        """
+        Initialize the batch.
+        
+        Args:
+            model: GenerativeModel used for the combined call
+            generation_config: Gemini generation config (must request JSON output)
+            preamble: Text leading the combined prompt, e.g. instructions shared
+                by every section (default: DEFAULT_PREAMBLE)
+        """
+        self.model = model
+        self.generation_config = generation_config or self.DEFAULT_GEN_CONFIG
+        self.preamble = preamble or self.DEFAULT_PREAMBLE
+        self._prompts: Dict[str, str] = {}
+        self._results: Optional[Dict[str, Any]] = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+    
+    def enqueue(self, agent_name: str, prompt: str):
+        """
+        Add an agent's prompt to the batch.
+        
+        Args:
+            agent_name: Agent name, used as the section key
+            prompt: The agent's full verification prompt
+        """
+        with self._lock:
+            if self._results is not None or self._error is not None:
+                raise RuntimeError("Cannot enqueue after the batch has been flushed")
+            self._prompts[agent_name] = prompt
+    
+    def has_request(self, agent_name: str) -> bool:
+        """Whether the agent's prompt is part of this batch"""
+        return agent_name in self._prompts
+    
+    def _build_batch_prompt(self) -> str:
+        """Combine the queued prompts into one sectioned prompt"""
+        sections = "\n\n".join(
+            f"=== SECTION: {agent_name} ===\n{prompt}"
+            for agent_name, prompt in self._prompts.items()
+        )
+        names = ", ".join(f'"{agent_name}"' for agent_name in self._prompts)
+        return f"""{self.preamble}
+
+{sections}
+
+=== OUTPUT ===
+Return ONLY valid JSON (no markdown) of the form:
+{{"sections": {{<section name>: <JSON answer for that section>}}}}
+with one entry for each of these section names: {names}
+"""
+    
+    def flush(self):
+        """
+        Send every queued prompt in one Gemini call. Safe to call more than once;
+        only the first call hits the API.
+        """
+        with self._lock:
+            if self._results is not None or self._error is not None or not self._prompts:
+                return
+            try:
+                GEMINI_BREAKER.check()
+                try:
+                    response = self.model.generate_content(
+                        self._build_batch_prompt(),
+                        generation_config=self.generation_config
+                    )
+                    text = response.text if response else ""
+                except Exception:
+                    GEMINI_BREAKER.record_failure()
+                    raise
+                GEMINI_BREAKER.record_success()
+                
+                cleaned = BaseAgent._strip_fence(text)
+                self._results = loads_json(cleaned).get("sections", {}) if cleaned else {}
+            except Exception as e:
+                self._error = e
+    
+    def get_result(self, agent_name: str) -> str:
+        """
+        Get one agent's section of the batched response, flushing if needed.
+        
+        Args:
+            agent_name: Agent name used when enqueueing
+            
+        Returns:
+            The section as JSON text (empty string if Gemini omitted it)
+            
+        Raises:
+            Exception: The error from the batched call, so agents can fall back
+        """
+        self.flush()
+        if self._error is not None:
+            raise self._error
+        section = self._results.get(agent_name)
+        return dumps_json(section, indent=False) if section else ""
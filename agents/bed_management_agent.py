@@ -1,88 +1,18 @@
 from typing import Dict, Any
+import asyncio
+import logging
 from agents.base_agent import BaseAgent
 from schemas.agent_schema import AgentOutputSchema
-from utils.file_utils import read_json_file, format_evidence_path
-import google.generativeai as genai
-import json
+from utils.file_utils import format_evidence_path, dumps_json
+from utils.gemini_client import configure, get_model
 from config import Config
 
-class BedManagementAgent(BaseAgent):
-    """
-    Bed Management verification agent that checks billing status,
-    deposit sufficiency, and housekeeping schedule using Gemini API.
-    """
-    
-    def __init__(self, api_key: str = None):
-        super().__init__("Bed Management")
-        
-        if api_key:
-            genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
-        
-    def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
-        """Verify bed and billing requirements"""
-        self.start_timer()
-        
-        # Load data files
-        patient_data = self.load_patient_data(patient_id)
-        
-        all_billing = read_json_file("data/billing_snapshot.json")
-        billing_snapshot = self.get_patient_record(all_billing, patient_id)
-        
-        all_housekeeping = read_json_file("data/housekeeping_schedule.json")
-        housekeeping_schedule = self.get_patient_record(all_housekeeping, patient_id)
-        
-        self.add_checked_field("billing_status")
-        self.add_checked_field("deposit_paid")
-        self.add_checked_field("housekeeping_schedule")
-        
-        # Build prompt for Gemini
-        prompt = self._build_verification_prompt(patient_data, billing_snapshot, housekeeping_schedule)
-        
-        try:
-            # print("  Calling Gemini API for bed management verification...")
-            
-            generation_config = {
-                "temperature": 0.1,
-                "max_output_tokens": 8192,
-                "response_mime_type": "application/json"
-            }
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-            
-            print("  Gemini API response received, parsing...")
-            result = self._parse_gemini_response(response.text)
-            print(f"  ✓ Bed management verification complete (NOC: {result['noc']})")
-            
-            return self.create_output(
-                noc=result["noc"],
-                confidence=result["confidence"],
-                issues=result["issues"],
-                raw_response=result.get("raw_data", {})
-            )
-            
-        except Exception as e:
-            print(f"  ✗ Gemini API error: {type(e).__name__}: {str(e)}")
-            print(f"  → Falling back to rule-based verification...")
-            return self._fallback_verification(patient_data, billing_snapshot, housekeeping_schedule)
-    
-    def _build_verification_prompt(self, patient_data: Dict, billing_snapshot: Dict, housekeeping_schedule: Dict) -> str:
-        """Build verification prompt for Gemini"""
-        
-        return f"""You are a Bed Management Verification Agent for hospital discharge.
-Verify billing completion, deposit sufficiency, and bed turnover readiness.
-
-PATIENT BILLING DATA:
-{json.dumps(patient_data.get("Billing", {}), indent=2)}
+logger = logging.getLogger(__name__)
 
-BILLING SNAPSHOT:
-{json.dumps(billing_snapshot, indent=2)}
-
-HOUSEKEEPING SCHEDULE:
-{json.dumps(housekeeping_schedule, indent=2)}
+# Prompt context shared by every patient; billing data is per-patient so only the rubric is static
+_STATIC_CONTEXT = """You are a Bed Management Verification Agent for hospital discharge.
+Verify billing completion, deposit sufficiency, and bed turnover readiness
+using the patient billing data, billing snapshot and housekeeping schedule provided.
 
 VERIFICATION TASKS:
 1. Check if final invoice is generated (invoice_generated should be true)
@@ -94,27 +24,27 @@ VERIFICATION TASKS:
 
 OUTPUT REQUIREMENTS:
 Return ONLY valid JSON (no markdown):
-{{
+{
   "noc": true or false,
   "confidence": 0.0 to 1.0,
   "issues": [
-    {{
+    {
       "code": "ISSUE_CODE",
       "title": "Short title",
       "severity": "low|medium|high|critical",
       "message": "Detailed explanation",
       "suggested_action": "What to do",
       "evidence": ["file_path#reference"],
-      "data": {{"key": "value"}}
-    }}
+      "data": {"key": "value"}
+    }
   ],
-  "raw_data": {{
+  "raw_data": {
     "invoice_generated": true or false,
     "deposit_sufficient": true or false,
     "housekeeping_scheduled": true or false,
     "shortfall_amount": 0
-  }}
-}}
+  }
+}
 
 ISSUE CODES:
 - BED_INVOICE_PENDING: Final invoice not generated
@@ -125,55 +55,137 @@ ISSUE CODES:
 Set noc=false if invoice not generated or significant deposit shortfall.
 Set noc=true if billing complete and deposit sufficient (or refund due).
 """
+
+
+class BedManagementAgent(BaseAgent):
+    """
+    Bed Management verification agent that checks billing status,
+    deposit sufficiency, and housekeeping schedule using Gemini API.
+    """
     
-    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse Gemini response"""
+    # Gemini generation settings; the SDK copies this per call
+    _GEN_CONFIG = {
+        "temperature": 0.1,
+        "max_output_tokens": 8192,
+        "response_mime_type": "application/json"
+    }
+    
+    def __init__(self, api_key: str = None):
+        super().__init__("Bed Management")
+        
+        # No model in offline mode; verify() goes straight to the rule-based checks
+        self.model = None
+        if not Config.OFFLINE_MODE:
+            if api_key:
+                configure(api_key)
+            self.model = get_model(Config.GEMINI_MODEL)
+        
+    def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Verify bed and billing requirements"""
+        self.start_timer()
+        
+        patient_data, billing_snapshot, housekeeping_schedule = self._load_inputs(patient_id)
+        
+        if self.model is None:
+            return self._fallback_verification(patient_data, billing_snapshot, housekeeping_schedule)
+        
+        # Build prompt for Gemini (static rubric is cached server-side)
+        static_context = self._build_static_context()
+        prompt = self._build_verification_prompt(patient_data, billing_snapshot, housekeeping_schedule)
+        
         try:
-            cleaned = response_text.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-            
-            result = json.loads(cleaned)
-            
-            issues = []
-            for issue_data in result.get("issues", []):
-                # Normalize severity
-                severity = issue_data.get("severity", "medium").lower()
-                if severity not in ["low", "medium", "high", "critical"]:
-                    severity = "medium"
-                
-                # Normalize evidence
-                evidence = issue_data.get("evidence", [])
-                if isinstance(evidence, dict):
-                    evidence = [f"{k}: {v}" for k, v in evidence.items()]
-                elif isinstance(evidence, str):
-                    evidence = [evidence]
-
-                issues.append(self.create_issue(
-                    code=issue_data["code"],
-                    title=issue_data["title"],
-                    severity=severity,
-                    message=issue_data["message"],
-                    suggested_action=issue_data["suggested_action"],
-                    evidence=evidence,
-                    data=issue_data.get("data", {})
-                ))
+            response_text = self._generate_content(
+                prompt,
+                self._GEN_CONFIG,
+                use_cache=kwargs.get("use_cache", True),
+                static_context=static_context,
+                validate=self._check_verification
+            )
+            return self._output_from_response(response_text)
             
-            return {
-                "noc": result["noc"],
-                "confidence": result["confidence"],
-                "issues": issues,
-                "raw_data": result.get("raw_data", {})
-            }
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, billing_snapshot, housekeeping_schedule)
+    
+    async def averify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Async variant of verify() that awaits the Gemini call"""
+        self.start_timer()
+        
+        patient_data, billing_snapshot, housekeeping_schedule = await asyncio.to_thread(
+            self._load_inputs, patient_id
+        )
+        
+        if self.model is None:
+            return self._fallback_verification(patient_data, billing_snapshot, housekeeping_schedule)
+        
+        static_context = self._build_static_context()
+        prompt = self._build_verification_prompt(patient_data, billing_snapshot, housekeeping_schedule)
+        
+        try:
+            response_text = await self._agenerate_content(
+                prompt,
+                self._GEN_CONFIG,
+                use_cache=kwargs.get("use_cache", True),
+                static_context=static_context,
+                validate=self._check_verification
+            )
+            return self._output_from_response(response_text)
             
         except Exception as e:
-            print(f"Error parsing Gemini response: {e}")
-            raise
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, billing_snapshot, housekeeping_schedule)
+    
+    def _load_inputs(self, patient_id: str) -> tuple:
+        """Load the patient record, billing snapshot and housekeeping schedule"""
+        # Reference files are parsed once per modification and read in the
+        # background while the patient record loads
+        billing_future = self.submit_record("data/billing_snapshot.json", patient_id)
+        housekeeping_future = self.submit_record("data/housekeeping_schedule.json", patient_id)
+        
+        patient_data = self.load_patient_data(patient_id)
+        billing_snapshot = billing_future.result()
+        housekeeping_schedule = housekeeping_future.result()
+        
+        self.add_checked_field("billing_status")
+        self.add_checked_field("deposit_paid")
+        self.add_checked_field("housekeeping_schedule")
+        
+        return patient_data, billing_snapshot, housekeeping_schedule
+    
+    def _output_from_response(self, response_text: str) -> AgentOutputSchema:
+        """Turn Gemini response text into agent output"""
+        logger.debug("Gemini API response received, parsing")
+        result = self._parse_gemini_response(response_text)
+        logger.info("Bed management verification complete (NOC: %s)", result["noc"])
+        
+        return self.create_output(
+            noc=result["noc"],
+            confidence=result["confidence"],
+            issues=result["issues"],
+            raw_response=result.get("raw_data", {}),
+            validate=True
+        )
+    
+    def _build_static_context(self) -> str:
+        """Build the prompt context shared by every patient (rubric only)"""
+        return _STATIC_CONTEXT
+    
+    def _build_verification_prompt(self, patient_data: Dict, billing_snapshot: Dict, housekeeping_schedule: Dict) -> str:
+        """Build the per-patient part of the verification prompt"""
+        
+        return f"""PATIENT BILLING DATA:
+{dumps_json(patient_data.get("Billing", {}), indent=False)}
+
+BILLING SNAPSHOT:
+{dumps_json(billing_snapshot, indent=False)}
+
+HOUSEKEEPING SCHEDULE:
+{dumps_json(housekeeping_schedule, indent=False)}
+"""
+    
+    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
+        """Parse Gemini response"""
+        return self._parse_gemini_json(response_text)
     
     def _fallback_verification(self, patient_data: Dict, billing_snapshot: Dict, housekeeping_schedule: Dict) -> AgentOutputSchema:
         """Fallback rule-based verification"""
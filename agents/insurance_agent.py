@@ -1,27 +1,142 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import asyncio
+import logging
 from agents.base_agent import BaseAgent
-from schemas.agent_schema import AgentOutputSchema
-from utils.file_utils import read_json_file, format_evidence_path
-import google.generativeai as genai
-import json
+from schemas.agent_schema import AgentOutputSchema, IssueSchema, InsuranceGeminiResponse
+from utils.file_utils import format_evidence_path, dumps_json
+from utils.gemini_client import configure, get_model
 import os
 
-
+from utils.rules import flatten_dict, apply_rules
 from config import Config
 
+logger = logging.getLogger(__name__)
+
+# Confidence of a rule-only decision; blocking rule hits at this level skip Gemini
+FAST_PATH_CONFIDENCE = 0.9
+
+# Verification prompt; filled per patient with str.format
+_PROMPT_TMPL = """Analyze this insurance verification case and provide your assessment in JSON format.
+
+Case features (JSON):
+{features}
+
+Based on this information, assess whether the patient can be discharged from an insurance perspective. Check:
+1. Is the policy currently active?
+2. If pre-authorization was required, has it been approved?
+3. Are the coverage limits sufficient for the total bill?
+4. What is the patient's financial responsibility?
+
+Provide your analysis as a JSON object with these fields:
+- noc: boolean (true if insurance clears discharge, false if there are blocking issues)
+- confidence: number between 0 and 1
+- issues: array of any problems found (each with code, title, severity, message, suggested_action, evidence)
+- raw_data: object with policy_status, preauth_status, coverage_sufficient
+
+Use these issue codes when needed: INS_POLICY_EXPIRED, INS_PREAUTH_MISSING, INS_LIMITS_EXCEEDED, INS_PARTIAL_COVERAGE
+"""
+
+
+def _patient_subtrees(patient_data: Dict) -> tuple:
+    """Return the (provider information, coverage details, billing) subtrees of a patient record"""
+    insurance_details = patient_data.get("Insurance Details", {})
+    return (
+        insurance_details.get("Provider Information", {}),
+        insurance_details.get("Coverage Details", {}),
+        patient_data.get("Billing", {}),
+    )
+
+
+def _extract_ins_features(patient_data: Dict, insurer_records: Dict) -> Dict[str, Any]:
+    """
+    Pick the flat set of fields the verification prompt needs.
+    
+    Only the first pre-authorization record is summarised; claims history,
+    exclusions and free-form notes are left out of the prompt.
+    
+    Args:
+        patient_data: Patient record
+        insurer_records: Patient's insurer record
+        
+    Returns:
+        Flat dict of insurance and billing fields
+    """
+    provider_info, coverage, billing = _patient_subtrees(patient_data)
+    policy = insurer_records.get("policy_details", {})
+    limits = insurer_records.get("coverage_limits", {})
+    preauths = insurer_records.get("pre_authorization_records") or [{}]
+    preauth = preauths[0]
+    
+    return {
+        "policy_number": provider_info.get("Policy Number", "N/A"),
+        "provider": provider_info.get("Provider", "N/A"),
+        "policy_status": policy.get("policy_status", "unknown"),
+        "policy_end_date": policy.get("policy_end_date"),
+        "coverage_type": coverage.get("Coverage Type", "N/A"),
+        "coverage_limit": coverage.get("Coverage Limit", "N/A"),
+        "preauth_required": coverage.get("Pre-authorization", "N/A"),
+        "preauth_status": preauth.get("status", "none"),
+        "preauth_approved_amount": preauth.get("approved_amount"),
+        "preauth_expiry": preauth.get("expiry_date"),
+        "annual_limit": limits.get("annual_limit"),
+        "remaining_limit": limits.get("remaining_limit"),
+        "total_cost": billing.get("Total Cost", "N/A"),
+        "insurance_covered": billing.get("Insurance Covered", "N/A"),
+        "patient_balance": billing.get("Patient Balance", "N/A"),
+    }
+
+
+# Fallback checks on the patient's insurer record, evaluated in order
+_FALLBACK_RULES = (
+    ("policy_details.policy_status", "ne", "active", "INS_POLICY_EXPIRED"),
+    ("pre_authorization_records.0.status", "ne", "approved", "INS_PREAUTH_MISSING"),
+)
+
+# Issue details for each fallback rule; {value} is the checked field's value
+_FALLBACK_ISSUES = {
+    "INS_POLICY_EXPIRED": {
+        "title": "Policy Not Active",
+        "severity": "critical",
+        "message": "Insurance policy status: {value}",
+        "suggested_action": "Contact insurance provider to reactivate policy",
+        "evidence": "policy_details.policy_status"
+    },
+    "INS_PREAUTH_MISSING": {
+        "title": "Pre-Authorization Missing",
+        "severity": "high",
+        "message": "No approved pre-authorization found for this admission",
+        "suggested_action": "Submit pre-authorization request to insurance",
+        "evidence": "pre_authorization_records"
+    },
+}
+
+
 class InsuranceAgent(BaseAgent):
     """
     Insurance verification agent that checks policy status, coverage, 
     pre-authorization, and limits using Gemini API.
     """
     
+    # Gemini generation settings; the SDK copies this per call
+    _GEN_CONFIG = {
+        "temperature": 0.1,
+        "top_p": 0.95,
+        "top_k": 40,
+        "max_output_tokens": 8192,
+        "response_mime_type": "application/json",
+        "response_schema": InsuranceGeminiResponse
+    }
+    
     def __init__(self, api_key: str = None):
         super().__init__("Insurance")
         
-        # Configure Gemini API
-        if api_key:
-            genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        # No model in offline mode; verify() goes straight to the rule-based checks
+        self.model = None
+        if not Config.OFFLINE_MODE:
+            # Configure Gemini API (shared model handle across agents)
+            if api_key:
+                configure(api_key)
+            self.model = get_model(Config.GEMINI_MODEL)
         
     def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
         """
@@ -36,168 +151,188 @@ class InsuranceAgent(BaseAgent):
         """
         self.start_timer()
         
-        # Load data files
-        # Load data files
-        patient_data = self.load_patient_data(patient_id)
-        all_insurer_records = read_json_file("data/insurer_records.json")
-        insurer_records = self.get_patient_record(all_insurer_records, patient_id)
+        patient_data, insurer_records = self._load_inputs(patient_id)
         
-        # Read insurance policy text
-        try:
-            with open("insurance_policy.txt", "r", encoding="utf-8") as f:
-                policy_text = f.read()
-        except:
-            policy_text = "Policy file not available"
+        # Clear-cut cases (inactive policy, missing pre-auth) need no Gemini call
+        quick = self._fast_rule_check(insurer_records)
+        if quick is not None:
+            return quick
         
-        self.add_checked_field("policy_number")
-        self.add_checked_field("coverage_limits")
-        self.add_checked_field("pre_authorization")
+        if self.model is None:
+            return self._fallback_verification(patient_data, insurer_records)
         
         # Build prompt for Gemini
-        prompt = self._build_verification_prompt(patient_data, insurer_records, policy_text)
+        prompt = self._build_verification_prompt(patient_data, insurer_records)
         
         # Try Gemini API
         try:
-            # print("  Calling Gemini API for insurance verification...")
-            
-            # Set generation config
-            generation_config = {
-                "temperature": 0.1,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-                "response_mime_type": "application/json"
-            }
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-            
-            print("  Gemini API response received, parsing...")
-            
-            # Debug: Print full response details
-            # print(f"  DEBUG - Response object: {response}")
-            # if hasattr(response, 'candidates') and response.candidates:
-            #     print(f"  DEBUG - Finish reason: {response.candidates[0].finish_reason}")
+            # Use the orchestrator's batched call when this agent is part of it
+            batch_client = kwargs.get("batch_client")
+            if batch_client is not None and batch_client.has_request(self.agent_name):
+                response_text = batch_client.get_result(self.agent_name)
+            else:
+                response_text = self._generate_content(prompt, self._GEN_CONFIG, validate=self._check_verification)
             
-            # Check if response has text
-            if not response or not response.text:
-                print("  ✗ Gemini API returned empty response")
-                print("  → Falling back to rule-based verification...")
-                return self._fallback_verification(patient_data, insurer_records)
+            return self._output_from_response(response_text, patient_data, insurer_records)
             
-            # print(f"  DEBUG - Response text: {response.text[:200]}...")
-            result = self._parse_gemini_response(response.text)
-            
-            print(f"  ✓ Insurance verification complete (NOC: {result['noc']})")
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, insurer_records)
+    
+    async def averify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Async variant of verify() that awaits the Gemini call"""
+        self.start_timer()
+        
+        patient_data, insurer_records = await asyncio.to_thread(self._load_inputs, patient_id)
+        quick = self._fast_rule_check(insurer_records)
+        if quick is not None:
+            return quick
+        
+        if self.model is None:
+            return self._fallback_verification(patient_data, insurer_records)
+        
+        prompt = self._build_verification_prompt(patient_data, insurer_records)
+        
+        try:
+            batch_client = kwargs.get("batch_client")
+            if batch_client is not None and batch_client.has_request(self.agent_name):
+                response_text = await asyncio.to_thread(batch_client.get_result, self.agent_name)
+            else:
+                response_text = await self._agenerate_content(prompt, self._GEN_CONFIG, validate=self._check_verification)
             
-            return self.create_output(
-                noc=result["noc"],
-                confidence=result["confidence"],
-                issues=result["issues"],
-                raw_response=result.get("raw_data", {})
-            )
+            return self._output_from_response(response_text, patient_data, insurer_records)
             
         except Exception as e:
-            print(f"  ✗ Gemini API error: {type(e).__name__}: {str(e)}")
-            print(f"  → Falling back to rule-based verification...")
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
             return self._fallback_verification(patient_data, insurer_records)
     
-    def _build_verification_prompt(self, patient_data: Dict, insurer_records: Dict, policy_text: str) -> str:
-        """Build the prompt for Gemini API"""
+    def _output_from_response(self, response_text: str, patient_data: Dict, insurer_records: Dict) -> AgentOutputSchema:
+        """Turn Gemini response text into agent output, falling back if it is empty"""
+        logger.debug("Gemini API response received, parsing")
         
-        insurance_details = patient_data.get("Insurance Details", {})
-        billing = patient_data.get("Billing", {})
+        # Check if response has text
+        if not response_text:
+            logger.warning("Gemini API returned empty response; falling back to rule-based verification")
+            return self._fallback_verification(patient_data, insurer_records)
         
-        return f"""Analyze this insurance verification case and provide your assessment in JSON format.
-
-Patient's Insurance Information:
-- Policy: {insurance_details.get("Provider Information", {}).get("Policy Number", "N/A")}
-- Provider: {insurance_details.get("Provider Information", {}).get("Provider", "N/A")}
-- Policy Status: {insurer_records.get("policy_details", {}).get("policy_status", "unknown")}
-- Coverage Type: {insurance_details.get("Coverage Details", {}).get("Coverage Type", "N/A")}
-- Annual Limit: {insurance_details.get("Coverage Details", {}).get("Coverage Limit", "N/A")}
-- Pre-authorization Required: {insurance_details.get("Coverage Details", {}).get("Pre-authorization", "N/A")}
-
-Financial Details:
-- Total Hospital Bill: {billing.get("Total Cost", "N/A")}
-- Amount Covered by Insurance: {billing.get("Insurance Covered", "N/A")}
-- Patient's Balance: {billing.get("Patient Balance", "N/A")}
-
-Pre-Authorization Records:
-{json.dumps(insurer_records.get("pre_authorization_records", []), indent=2)[:600]}
-
-Coverage Limits Available:
-{json.dumps(insurer_records.get("coverage_limits", {}), indent=2)[:400]}
-
-Based on this information, assess whether the patient can be discharged from an insurance perspective. Check:
-1. Is the policy currently active?
-2. If pre-authorization was required, has it been approved?
-3. Are the coverage limits sufficient for the total bill?
-4. What is the patient's financial responsibility?
-
-Provide your analysis as a JSON object with these fields:
-- noc: boolean (true if insurance clears discharge, false if there are blocking issues)
-- confidence: number between 0 and 1
-- issues: array of any problems found (each with code, title, severity, message, suggested_action, evidence, data)
-- raw_data: object with policy_status, preauth_status, coverage_sufficient
-
-Use these issue codes when needed: INS_POLICY_EXPIRED, INS_PREAUTH_MISSING, INS_LIMITS_EXCEEDED, INS_PARTIAL_COVERAGE
-"""
+        result = self._parse_gemini_response(response_text)
+        
+        logger.info("Insurance verification complete (NOC: %s)", result["noc"])
+        
+        return self.create_output(
+            noc=result["noc"],
+            confidence=result["confidence"],
+            issues=result["issues"],
+            raw_response=result.get("raw_data", {}),
+            validate=True
+        )
+    
+    def build_prompt(self, patient_id: str) -> Optional[str]:
+        """
+        Build the Gemini prompt for a patient without calling the API.
+        
+        Used by the orchestrator to enqueue this agent into a BatchedGeminiClient.
+        
+        Args:
+            patient_id: Patient identifier
+            
+        Returns:
+            Verification prompt text, or None if a blocking rule already decides
+            (verify() then answers without Gemini)
+        """
+        patient_data, insurer_records = self._load_inputs(patient_id)
+        if insurer_records and self._rule_issues(insurer_records):
+            return None
+        return self._build_verification_prompt(patient_data, insurer_records)
+    
+    def _load_inputs(self, patient_id: str) -> tuple:
+        """Load the patient record and insurer records"""
+        # Read insurer records in the I/O pool while the patient record loads
+        insurer_future = self.submit_record("data/insurer_records.json", patient_id)
+        patient_data = self.load_patient_data(patient_id)
+        insurer_records = insurer_future.result()
+        
+        self.add_checked_field("policy_number")
+        self.add_checked_field("coverage_limits")
+        self.add_checked_field("pre_authorization")
+        
+        return patient_data, insurer_records
+    
+    def _build_verification_prompt(self, patient_data: Dict, insurer_records: Dict) -> str:
+        """Build the prompt for Gemini API"""
+        features = _extract_ins_features(patient_data, insurer_records)
+        return _PROMPT_TMPL.format(features=dumps_json(features, indent=False))
     
     def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse Gemini API response"""
+        """Parse Gemini response against the structured output schema"""
         try:
-            # Remove markdown code blocks if present
-            cleaned = response_text.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
+            result = InsuranceGeminiResponse.model_validate_json(self._strip_fence(response_text))
             
-            result = json.loads(cleaned)
-            
-            # Convert issues to IssueSchema objects
-            issues = []
-            for issue_data in result.get("issues", []):
-                # Normalize severity
-                severity = issue_data.get("severity", "medium").lower()
-                if severity not in ["low", "medium", "high", "critical"]:
-                    severity = "medium"
-                
-                # Normalize evidence
-                evidence = issue_data.get("evidence", [])
-                if isinstance(evidence, dict):
-                    evidence = [f"{k}: {v}" for k, v in evidence.items()]
-                elif isinstance(evidence, str):
-                    evidence = [evidence]
-                
-                issues.append(self.create_issue(
-                    code=issue_data["code"],
-                    title=issue_data["title"],
-                    severity=severity,
-                    message=issue_data["message"],
-                    suggested_action=issue_data["suggested_action"],
-                    evidence=evidence,
-                    data=issue_data.get("data", {})
-                ))
+            # Severity and evidence shapes are already enforced by the schema
+            issues = [
+                self.create_issue(
+                    code=issue.code,
+                    title=issue.title,
+                    severity=issue.severity.value,
+                    message=issue.message,
+                    suggested_action=issue.suggested_action,
+                    evidence=issue.evidence
+                )
+                for issue in result.issues
+            ]
             
             return {
-                "noc": result["noc"],
-                "confidence": result["confidence"],
+                "noc": result.noc,
+                "confidence": result.confidence,
                 "issues": issues,
-                "raw_data": result.get("raw_data", {})
+                "raw_data": result.raw_data.model_dump()
             }
             
         except Exception as e:
-            print(f"Error parsing Gemini response: {e}")
-            print(f"Response: {response_text}")
+            logger.error("Error parsing Gemini response: %s", e)
+            logger.debug("Response: %s", response_text)
             raise
     
+    def _rule_issues(self, insurer_records: Dict) -> List[IssueSchema]:
+        """Issues for every fallback rule that matches the insurer record"""
+        issues = []
+        for code, value in apply_rules(flatten_dict(insurer_records), _FALLBACK_RULES):
+            spec = _FALLBACK_ISSUES[code]
+            issues.append(self.create_issue(
+                code=code,
+                title=spec["title"],
+                severity=spec["severity"],
+                message=spec["message"].format(value=value),
+                suggested_action=spec["suggested_action"],
+                evidence=[format_evidence_path("data/insurer_records.json", spec["evidence"])]
+            ))
+        return issues
+    
+    def _fast_rule_check(self, insurer_records: Dict) -> Optional[AgentOutputSchema]:
+        """
+        Decide without Gemini when a blocking rule matches the insurer record.
+        
+        Args:
+            insurer_records: Patient's insurer record
+            
+        Returns:
+            Output with NOC false at FAST_PATH_CONFIDENCE, or None if Gemini is needed
+        """
+        if not insurer_records:
+            return None
+        
+        issues = self._rule_issues(insurer_records)
+        if not issues:
+            return None
+        
+        logger.info("Insurance decided by rules (%d blocking issues); skipping Gemini", len(issues))
+        return self.create_output(
+            noc=False,
+            confidence=FAST_PATH_CONFIDENCE,
+            issues=issues,
+            raw_response={"fast_path": True}
+        )
+    
     def _fallback_verification(self, patient_data: Dict, insurer_records: Dict) -> AgentOutputSchema:
         """Fallback rule-based verification if Gemini fails"""
         issues = []
@@ -214,31 +349,8 @@ Use these issue codes when needed: INS_POLICY_EXPIRED, INS_PREAUTH_MISSING, INS_
             ))
             noc = False
         else:
-            # Check policy status
-            policy_status = insurer_records.get("policy_details", {}).get("policy_status")
-            if policy_status != "active":
-                issues.append(self.create_issue(
-                    code="INS_POLICY_EXPIRED",
-                    title="Policy Not Active",
-                    severity="critical",
-                    message=f"Insurance policy status: {policy_status}",
-                    suggested_action="Contact insurance provider to reactivate policy",
-                    evidence=[format_evidence_path("data/insurer_records.json", "policy_details.policy_status")]
-                ))
-                noc = False
-            
-            # Check pre-authorization
-            preauth_records = insurer_records.get("pre_authorization_records", [])
-            if not preauth_records or preauth_records[0].get("status") != "approved":
-                issues.append(self.create_issue(
-                    code="INS_PREAUTH_MISSING",
-                    title="Pre-Authorization Missing",
-                    severity="high",
-                    message="No approved pre-authorization found for this admission",
-                    suggested_action="Submit pre-authorization request to insurance",
-                    evidence=[format_evidence_path("data/insurer_records.json", "pre_authorization_records")]
-                ))
-                noc = False
+            issues = self._rule_issues(insurer_records)
+            noc = not issues
         
         return self.create_output(
             noc=noc,
@@ -1,87 +1,30 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+import asyncio
+import logging
+import time
 from agents.base_agent import BaseAgent
-from schemas.agent_schema import AgentOutputSchema
-from utils.file_utils import read_json_file, format_evidence_path
-import google.generativeai as genai
-import json
+from schemas.agent_schema import AgentOutputSchema, LabGeminiResponse
+from utils.file_utils import format_evidence_path, dumps_json
+from utils.gemini_client import configure, get_model
 from config import Config
 
-class LabAgent(BaseAgent):
-    """
-    Lab verification agent that confirms test completion and
-    checks for critical values using Gemini API.
-    """
-    
-    def __init__(self, api_key: str = None):
-        super().__init__("Lab")
-        
-        if api_key:
-            genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
-        
-    def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
-        """Verify lab test completion and results"""
-        self.start_timer()
-        
-        # Load data files
-        patient_data = self.load_patient_data(patient_id)
-        all_lab_results = read_json_file("data/lab_results.json")
-        lab_results = self.get_patient_record(all_lab_results, patient_id)
-        
-        self.add_checked_field("lab_tests")
-        self.add_checked_field("test_results")
-        self.add_checked_field("critical_values")
-        
-        # Build prompt for Gemini
-        prompt = self._build_verification_prompt(patient_data, lab_results)
-        
-        try:
-            # print("  Calling Gemini API for lab verification...")
-            
-            generation_config = {
-                "temperature": 0.1,
-                "max_output_tokens": 8192,
-                "response_mime_type": "application/json"
-            }
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-            
-            # Check if response has text
-            if not response or not response.text:
-                print("  ✗ Gemini API returned empty response")
-                print("  → Falling back to rule-based verification...")
-                return self._fallback_verification(patient_data, lab_results)
-            
-            print("  Gemini API response received, parsing...")
-            result = self._parse_gemini_response(response.text)
-            print(f"  ✓ Lab verification complete (NOC: {result['noc']})")
-            
-            return self.create_output(
-                noc=result["noc"],
-                confidence=result["confidence"],
-                issues=result["issues"],
-                raw_response=result.get("raw_data", {})
-            )
-            
-        except Exception as e:
-            print(f"  ✗ Gemini API error: {type(e).__name__}: {str(e)}")
-            print(f"  → Falling back to rule-based verification...")
-            return self._fallback_verification(patient_data, lab_results)
-    
-    def _build_verification_prompt(self, patient_data: Dict, lab_results: Dict) -> str:
-        """Build verification prompt for Gemini"""
-        
-        return f"""You are a Lab Verification Agent for hospital discharge.
+# Optional vectorized threshold checks for verify_batch(); plain Python is used without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Verification prompt; filled per patient with str.format (literal braces are doubled)
+_PROMPT_TMPL = """You are a Lab Verification Agent for hospital discharge.
 Verify all required lab tests are completed and results are within safe ranges.
 
 PATIENT LAB TESTS (from patient record):
-{json.dumps(patient_data.get("Lab Tests & Results", {}), indent=2)}
+{patient_lab_tests}
 
 LAB RESULTS DATABASE:
-{json.dumps(lab_results, indent=2)}
+{lab_results}
 
 VERIFICATION TASKS:
 1. Check all required tests are completed (status = "completed")
@@ -127,58 +70,286 @@ ISSUE CODES:
 Set noc=false if any tests pending or critical values found.
 Set noc=true if all tests complete and values acceptable for discharge.
 """
+
+# General critical value thresholds as (low, high) bounds, matching the prompt above
+_CRITICAL_THRESHOLDS = {
+    "Hemoglobin": (7.0, None),
+    "RBC": (3.0, None),
+    "Platelets": (50, 450),
+    "WBC": (2, 20),
+}
+
+
+def _exceeds_critical_threshold(component: Dict) -> bool:
+    """Whether a lab component's value falls outside its general critical threshold"""
+    bounds = _CRITICAL_THRESHOLDS.get(component.get("name"))
+    value = component.get("value")
+    if bounds is None or not isinstance(value, (int, float)):
+        return False
+    low, high = bounds
+    return (low is not None and value < low) or (high is not None and value > high)
+
+
+def _critical_mask(components: List[Dict]) -> List[bool]:
+    """
+    Threshold check for many lab components at once.
     
-    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse Gemini response"""
+    With NumPy installed, values and bounds are compared in one vectorized pass;
+    missing bounds and non-numeric values are NaN and never match.
+    
+    Args:
+        components: Lab result components
+        
+    Returns:
+        _exceeds_critical_threshold() for each component, in order
+    """
+    if np is None or not components:
+        return [_exceeds_critical_threshold(component) for component in components]
+    
+    nan = float("nan")
+    values = np.empty(len(components), dtype=np.float64)
+    low = np.full(len(components), nan)
+    high = np.full(len(components), nan)
+    for i, component in enumerate(components):
+        value = component.get("value")
+        values[i] = value if isinstance(value, (int, float)) else nan
+        bounds = _CRITICAL_THRESHOLDS.get(component.get("name"))
+        if bounds is not None:
+            if bounds[0] is not None:
+                low[i] = bounds[0]
+            if bounds[1] is not None:
+                high[i] = bounds[1]
+    return ((values < low) | (values > high)).tolist()
+
+
+def _index_results(lab_results: Dict) -> Dict[str, Dict]:
+    """Index a patient's lab results by test name; the first result for a name wins"""
+    results_by_name = {}
+    for result in lab_results.get("results", []):
+        results_by_name.setdefault(result.get("test_name"), result)
+    return results_by_name
+
+
+def _completed_components(lab_results: Dict) -> Iterator[Dict]:
+    """Yield the components of completed required tests, in the order the fallback checks them"""
+    results_by_name = _index_results(lab_results)
+    for required_test in lab_results.get("required_tests", []):
+        result = results_by_name.get(required_test)
+        if result and result.get("status") != "pending":
+            yield from result.get("components", [])
+
+
+class LabAgent(BaseAgent):
+    """
+    Lab verification agent that confirms test completion and
+    checks for critical values using Gemini API.
+    """
+    
+    # Gemini generation settings; the SDK copies this per call
+    _GEN_CONFIG = {
+        "temperature": 0.1,
+        "max_output_tokens": 8192,
+        "response_mime_type": "application/json",
+        "response_schema": LabGeminiResponse
+    }
+    
+    def __init__(self, api_key: str = None):
+        super().__init__("Lab")
+        
+        # No model in offline mode; verify() goes straight to the rule-based checks
+        self.model = None
+        if not Config.OFFLINE_MODE:
+            if api_key:
+                configure(api_key)
+            self.model = get_model(Config.GEMINI_MODEL)
+        
+    def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Verify lab test completion and results"""
+        self.start_timer()
+        
+        patient_data, lab_results = self._load_inputs(patient_id)
+        
+        if self.model is None:
+            return self._fallback_verification(patient_data, lab_results)
+        
+        # Build prompt for Gemini
+        prompt = self._build_verification_prompt(patient_data, lab_results)
+        
         try:
-            cleaned = response_text.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
+            # Use the orchestrator's batched call when this agent is part of it
+            batch_client = kwargs.get("batch_client")
+            if batch_client is not None and batch_client.has_request(self.agent_name):
+                response_text = batch_client.get_result(self.agent_name)
+            else:
+                response_text = self._generate_content(prompt, self._GEN_CONFIG, validate=self._check_verification)
             
-            result = json.loads(cleaned)
+            return self._output_from_response(response_text, patient_data, lab_results)
             
-            issues = []
-            for issue_data in result.get("issues", []):
-                # Normalize severity
-                severity = issue_data.get("severity", "medium").lower()
-                if severity not in ["low", "medium", "high", "critical"]:
-                    severity = "medium"
-                
-                # Normalize evidence
-                evidence = issue_data.get("evidence", [])
-                if isinstance(evidence, dict):
-                    evidence = [f"{k}: {v}" for k, v in evidence.items()]
-                elif isinstance(evidence, str):
-                    evidence = [evidence]
-
-                issues.append(self.create_issue(
-                    code=issue_data["code"],
-                    title=issue_data["title"],
-                    severity=severity,
-                    message=issue_data["message"],
-                    suggested_action=issue_data["suggested_action"],
-                    evidence=evidence,
-                    data=issue_data.get("data", {})
-                ))
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, lab_results)
+    
+    async def averify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Async variant of verify() that awaits the Gemini call"""
+        self.start_timer()
+        
+        patient_data, lab_results = await asyncio.to_thread(self._load_inputs, patient_id)
+        
+        if self.model is None:
+            return self._fallback_verification(patient_data, lab_results)
+        
+        prompt = self._build_verification_prompt(patient_data, lab_results)
+        
+        try:
+            batch_client = kwargs.get("batch_client")
+            if batch_client is not None and batch_client.has_request(self.agent_name):
+                response_text = await asyncio.to_thread(batch_client.get_result, self.agent_name)
+            else:
+                response_text = await self._agenerate_content(prompt, self._GEN_CONFIG, validate=self._check_verification)
+            
+            return self._output_from_response(response_text, patient_data, lab_results)
+            
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, lab_results)
+    
+    def _output_from_response(self, response_text: str, patient_data: Dict, lab_results: Dict) -> AgentOutputSchema:
+        """Turn Gemini response text into agent output, falling back if it is empty"""
+        # Check if response has text
+        if not response_text:
+            logger.warning("Gemini API returned empty response; falling back to rule-based verification")
+            return self._fallback_verification(patient_data, lab_results)
+        
+        logger.debug("Gemini API response received, parsing")
+        result = self._parse_gemini_response(response_text)
+        logger.info("Lab verification complete (NOC: %s)", result["noc"])
+        
+        return self.create_output(
+            noc=result["noc"],
+            confidence=result["confidence"],
+            issues=result["issues"],
+            raw_response=result.get("raw_data", {}),
+            validate=True
+        )
+    
+    def build_prompt(self, patient_id: str) -> str:
+        """
+        Build the Gemini prompt for a patient without calling the API.
+        
+        Used by the orchestrator to enqueue this agent into a BatchedGeminiClient.
+        
+        Args:
+            patient_id: Patient identifier
+            
+        Returns:
+            Verification prompt text
+        """
+        return self._build_verification_prompt(*self._load_inputs(patient_id))
+    
+    def _load_inputs(self, patient_id: str) -> tuple:
+        """Load the patient record and lab results for verification"""
+        # Read lab results in the I/O pool while the patient record loads
+        lab_future = self.submit_record("data/lab_results.json", patient_id)
+        patient_data = self.load_patient_data(patient_id)
+        lab_results = lab_future.result()
+        
+        self.add_checked_field("lab_tests")
+        self.add_checked_field("test_results")
+        self.add_checked_field("critical_values")
+        
+        return patient_data, lab_results
+    
+    def _build_verification_prompt(self, patient_data: Dict, lab_results: Dict) -> str:
+        """Build verification prompt for Gemini"""
+        
+        return _PROMPT_TMPL.format(
+            patient_lab_tests=dumps_json(patient_data.get("Lab Tests & Results", {}), indent=False),
+            lab_results=dumps_json(lab_results, indent=False)
+        )
+    
+    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
+        """Parse Gemini response against the structured output schema"""
+        try:
+            result = LabGeminiResponse.model_validate_json(self._strip_fence(response_text))
+            
+            # Severity and evidence shapes are already enforced by the schema
+            issues = [
+                self.create_issue(
+                    code=issue.code,
+                    title=issue.title,
+                    severity=issue.severity.value,
+                    message=issue.message,
+                    suggested_action=issue.suggested_action,
+                    evidence=issue.evidence
+                )
+                for issue in result.issues
+            ]
             
             return {
-                "noc": result["noc"],
-                "confidence": result["confidence"],
+                "noc": result.noc,
+                "confidence": result.confidence,
                 "issues": issues,
-                "raw_data": result.get("raw_data", {})
+                "raw_data": result.raw_data.model_dump()
             }
             
         except Exception as e:
-            print(f"Error parsing Gemini response: {e}")
+            logger.error("Error parsing Gemini response: %s", e)
             raise
     
-    def _fallback_verification(self, patient_data: Dict, lab_results: Dict) -> AgentOutputSchema:
-        """Fallback rule-based verification"""
+    def verify_batch(self, patient_ids: List[str]) -> Dict[str, AgentOutputSchema]:
+        """
+        Rule-based lab verification for many patients at once (no Gemini calls).
+        
+        Critical-value thresholds for every patient's components are checked in
+        a single vectorized pass before per-patient outputs are built. Each
+        output's time_ms covers that patient's reads and checks plus the shared
+        pass, not the other patients' work.
+        
+        Args:
+            patient_ids: Patient identifiers
+            
+        Returns:
+            Dict mapping patient ID to its AgentOutputSchema
+        """
+        self.add_checked_field("lab_tests")
+        self.add_checked_field("test_results")
+        self.add_checked_field("critical_values")
+        
+        inputs = []
+        components = []
+        for patient_id in patient_ids:
+            start = time.perf_counter_ns()
+            lab_results = self.get_indexed_record("data/lab_results.json", patient_id)
+            patient_data = self.load_patient_data(patient_id)
+            components.extend(_completed_components(lab_results))
+            inputs.append((patient_id, patient_data, lab_results, time.perf_counter_ns() - start))
+        
+        start = time.perf_counter_ns()
+        # Each fallback consumes its own patient's flags, in the same order
+        critical_flags = iter(_critical_mask(components))
+        mask_ns = time.perf_counter_ns() - start
+        
+        outputs = {}
+        for patient_id, patient_data, lab_results, load_ns in inputs:
+            self.start_timer(elapsed_ns=load_ns + mask_ns)
+            outputs[patient_id] = self._fallback_verification(patient_data, lab_results, critical_flags)
+        return outputs
+    
+    def _fallback_verification(
+        self,
+        patient_data: Dict,
+        lab_results: Dict,
+        critical_flags: Optional[Iterator[bool]] = None
+    ) -> AgentOutputSchema:
+        """
+        Fallback rule-based verification.
+        
+        Args:
+            patient_data: Patient record
+            lab_results: Patient's lab results
+            critical_flags: Precomputed threshold checks for _completed_components(),
+                in order (computed per component when omitted)
+        """
         issues = []
         noc = True
         
@@ -195,15 +366,11 @@ Set noc=true if all tests complete and values acceptable for discharge.
         else:
             # Check each required test
             required_tests = lab_results.get("required_tests", [])
-            results = lab_results.get("results", [])
+            
+            results_by_name = _index_results(lab_results)
             
             for required_test in required_tests:
-                # Find matching result
-                matching_result = None
-                for result in results:
-                    if result.get("test_name") == required_test:
-                        matching_result = result
-                        break
+                matching_result = results_by_name.get(required_test)
                 
                 if not matching_result:
                     issues.append(self.create_issue(
@@ -229,7 +396,11 @@ Set noc=true if all tests complete and values acceptable for discharge.
                 else:
                     # Check for critical values in components
                     for component in matching_result.get("components", []):
-                        if component.get("flag") == "critical":
+                        if critical_flags is not None:
+                            exceeds = next(critical_flags)
+                        else:
+                            exceeds = _exceeds_critical_threshold(component)
+                        if component.get("flag") == "critical" or exceeds:
                             issues.append(self.create_issue(
                                 code="LAB_CRITICAL_VALUE",
                                 title=f"Critical Value: {component.get('name')}",
@@ -1,140 +1,354 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import asyncio
+import logging
+import functools
+import re
+import time
 from agents.base_agent import BaseAgent
 from schemas.agent_schema import AgentOutputSchema
-from utils.file_utils import read_json_file, format_evidence_path
-import google.generativeai as genai
-import json
+from utils.file_utils import format_evidence_path, dumps_json
+from utils.gemini_client import configure, get_model
 from config import Config
 
+logger = logging.getLogger(__name__)
+
+# Confidence of a rule-only decision; blocking rule hits skip Gemini
+FAST_PATH_CONFIDENCE = 0.9
+
+# Issue codes that set NOC false in _fallback_verification; payment due does not block
+_BLOCKING_CODES = frozenset({"PHARM_ORDER_PENDING", "PHARM_ALLERGY_CONFLICT"})
+
+# Patients per batched Gemini call; keeps the combined prompt well inside the context window
+MAX_BATCH_PATIENTS = 10
+
+# Verification prompt; filled per patient with str.format
+_PROMPT_TMPL = """Review this patient's medication status for hospital discharge clearance.
+
+Current Medications:
+{medications}
+
+Known Allergies: {allergies}
+
+Pharmacy Order Status:
+{active_orders}
+
+Discharge Prescriptions:
+{discharge_medications}
+
+Please verify:
+1. Have all medication orders been filled and dispensed?
+2. Are there any conflicts between medications and patient allergies?
+3. Are there duplicate medications prescribed?
+4. Is payment cleared for discharge medications?
+
+Respond with a JSON assessment containing:
+- noc: true if pharmacy clears discharge, false if issues block it
+- confidence: your confidence level (0-1)
+- issues: list any problems (with code, title, severity, message, suggested_action)
+- raw_data: summary with pending_orders, allergy_conflicts, interactions_found arrays
+
+Common issue codes: PHARM_ORDER_PENDING, PHARM_ALLERGY_CONFLICT, PHARM_PAYMENT_PENDING, PHARM_DUPLICATE
+"""
+
+# Wrapper for several patients' prompts answered in one call
+_BATCH_PROMPT_TMPL = """The following blocks are independent pharmacy discharge reviews, one per patient.
+Answer every block exactly as its own instructions require.
+
+{blocks}
+
+=== OUTPUT ===
+Return ONLY valid JSON (no markdown) of the form:
+{{"results": [{{"patient_id": <patient ID>, "noc": ..., "confidence": ..., "issues": [...], "raw_data": {{...}}}}]}}
+with one entry for each of these patient IDs: {patient_ids}
+"""
+
+
+def _summarize_medications(medications: List[Dict]) -> List[Dict]:
+    """Keep the fields of the patient's active medications that the review checks"""
+    return [
+        {"name": m.get("Name"), "dosage": m.get("Dosage"), "frequency": m.get("Frequency"), "status": m.get("Status")}
+        for m in medications
+    ]
+
+
+def _summarize_orders(orders: List[Dict]) -> List[Dict]:
+    """Keep each pharmacy order's ID, medication and dispense status"""
+    return [
+        {"id": o.get("order_id"), "name": o.get("medication_name"), "status": o.get("status")}
+        for o in orders
+    ]
+
+
+def _summarize_discharge_meds(discharge_meds: List[Dict]) -> List[Dict]:
+    """Keep each discharge prescription's medication, dosage and payment status"""
+    return [
+        {"name": m.get("medication_name"), "dosage": m.get("dosage"), "payment_status": m.get("payment_status")}
+        for m in discharge_meds
+    ]
+
+
+@functools.lru_cache(maxsize=32)
+def _drug_pattern(drugs: tuple) -> Optional[re.Pattern]:
+    """
+    Compile contraindicated drug names into one case-folded alternation.
+    
+    Args:
+        drugs: Drug names from a contraindication rule
+        
+    Returns:
+        Pattern matching any of the names inside a lowercased medication name,
+        or None if there are no names
+    """
+    if not drugs:
+        return None
+    return re.compile("|".join(re.escape(drug.lower()) for drug in drugs))
+
+
 class PharmacyAgent(BaseAgent):
     """
     Pharmacy verification agent that checks medication reconciliation,
     pending orders, drug interactions, and allergies using Gemini API.
     """
     
+    # Gemini generation settings; the SDK copies this per call
+    _GEN_CONFIG = {
+        "temperature": 0.1,
+        "max_output_tokens": 8192,
+        "response_mime_type": "application/json"
+    }
+    
     def __init__(self, api_key: str = None):
         super().__init__("Pharmacy")
         
-        if api_key:
-            genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        # No model in offline mode; verify() goes straight to the rule-based checks
+        self.model = None
+        if not Config.OFFLINE_MODE:
+            # Shared SDK configuration and model handle (re-configuring would drop open connections)
+            if api_key:
+                configure(api_key)
+            self.model = get_model(Config.GEMINI_MODEL)
         
     def verify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
         """Verify pharmacy requirements for discharge"""
         self.start_timer()
         
-        # Load data files
-        patient_data = self.load_patient_data(patient_id)
-        all_pharmacy_inventory = read_json_file("data/pharmacy_inventory.json")
-        pharmacy_inventory = self.get_patient_record(all_pharmacy_inventory, patient_id)
+        patient_data, pharmacy_inventory, drug_interactions = self._load_inputs(patient_id)
         
-        drug_interactions = read_json_file("data/drug_interaction_rules.json")
+        # A pending order or allergy conflict blocks discharge whatever Gemini says
+        rules = self._fallback_verification(patient_data, pharmacy_inventory, drug_interactions)
+        quick = self._fast_rule_check(rules)
+        if quick is not None:
+            return quick
         
-        self.add_checked_field("medications")
-        self.add_checked_field("allergies")
-        self.add_checked_field("active_orders")
-        self.add_checked_field("drug_interactions")
+        if self.model is None:
+            return rules
         
         # Build prompt for Gemini
         prompt = self._build_verification_prompt(patient_data, pharmacy_inventory, drug_interactions)
         
         try:
-            # print("  Calling Gemini API for pharmacy verification...")
+            # Identical prompts within the cache TTL reuse the earlier response
+            response_text = self._generate_content(prompt, self._GEN_CONFIG, validate=self._check_verification)
             
-            generation_config = {
-                "temperature": 0.1,
-                "max_output_tokens": 8192,
-                "response_mime_type": "application/json"
-            }
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-            
-            # print("  Gemini API response received, parsing...")
-            
-            # Debug response
-            # print(f"  DEBUG - Response: {response}")
-            # if hasattr(response, 'candidates') and response.candidates:
-            #     print(f"  DEBUG - Finish reason: {response.candidates[0].finish_reason}")
+            return self._output_from_response(response_text, patient_data, pharmacy_inventory, drug_interactions)
             
-            # Check if response has text
-            if not response or not response.text:
-                print("  ✗ Gemini API returned empty response")
-                print("  → Falling back to rule-based verification...")
-                return self._fallback_verification(patient_data, pharmacy_inventory, drug_interactions)
-            
-            # print(f"  DEBUG - Response text: {response.text[:200]}...")
-            result = self._parse_gemini_response(response.text)
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, pharmacy_inventory, drug_interactions)
+    
+    async def averify(self, patient_id: str, **kwargs) -> AgentOutputSchema:
+        """Async variant of verify() that awaits the Gemini call"""
+        self.start_timer()
+        
+        patient_data, pharmacy_inventory, drug_interactions = await self._aload_inputs(patient_id)
+        rules = self._fallback_verification(patient_data, pharmacy_inventory, drug_interactions)
+        quick = self._fast_rule_check(rules)
+        if quick is not None:
+            return quick
+        
+        if self.model is None:
+            return rules
+        
+        prompt = self._build_verification_prompt(patient_data, pharmacy_inventory, drug_interactions)
+        
+        try:
+            response_text = await self._agenerate_content(prompt, self._GEN_CONFIG, validate=self._check_verification)
+            return self._output_from_response(response_text, patient_data, pharmacy_inventory, drug_interactions)
             
-            print(f"  ✓ Pharmacy verification complete (NOC: {result['noc']})")
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); falling back to rule-based verification", type(e).__name__, e)
+            return self._fallback_verification(patient_data, pharmacy_inventory, drug_interactions)
+    
+    def verify_batch(self, patient_ids: List[str]) -> Dict[str, AgentOutputSchema]:
+        """
+        Verify several patients with one Gemini call per MAX_BATCH_PATIENTS.
+        
+        Patients blocked by the rule checks are decided without Gemini. A patient
+        whose entry is missing or unparseable is verified on its own with verify();
+        if the batched call fails, the batch falls back to rule-based verification.
+        
+        Each output's time_ms covers that patient's own reads and checks plus the
+        batched Gemini call it waited on, not the other patients' work.
+        
+        Args:
+            patient_ids: Patient identifiers
             
-            return self.create_output(
-                noc=result["noc"],
-                confidence=result["confidence"],
-                issues=result["issues"],
-                raw_response=result.get("raw_data", {})
+        Returns:
+            Dict mapping patient ID to its AgentOutputSchema
+        """
+        outputs = {}
+        pending = {}
+        for patient_id in dict.fromkeys(patient_ids):
+            start = self.start_timer()
+            inputs = self._load_inputs(patient_id)
+            rules = self._fallback_verification(*inputs)
+            quick = self._fast_rule_check(rules)
+            if quick is not None:
+                outputs[patient_id] = quick
+            elif self.model is None:
+                outputs[patient_id] = rules
+            else:
+                pending[patient_id] = (inputs, time.perf_counter_ns() - start)
+        
+        pending_ids = list(pending)
+        for start in range(0, len(pending_ids), MAX_BATCH_PATIENTS):
+            batch = {patient_id: pending[patient_id] for patient_id in pending_ids[start:start + MAX_BATCH_PATIENTS]}
+            outputs.update(self._verify_chunk(batch))
+        return outputs
+    
+    def _verify_chunk(self, batch: Dict[str, tuple]) -> Dict[str, AgentOutputSchema]:
+        """
+        Answer up to MAX_BATCH_PATIENTS patients' prompts with one Gemini call.
+        
+        Args:
+            batch: Patient ID -> (verification inputs, time spent on them so far in ns)
+        """
+        start = time.perf_counter_ns()
+        blocks = "\n\n".join(
+            f"=== PATIENT: {patient_id} ===\n{self._build_verification_prompt(*inputs)}"
+            for patient_id, (inputs, _) in batch.items()
+        )
+        prompt = _BATCH_PROMPT_TMPL.format(
+            blocks=blocks,
+            patient_ids=", ".join(f'"{patient_id}"' for patient_id in batch)
+        )
+        
+        by_id = None
+        try:
+            response_text = self._generate_content(prompt, self._GEN_CONFIG)
+            results = self._loads_tolerant(response_text).get("results", []) if response_text else []
+            by_id = {entry.get("patient_id"): entry for entry in results if isinstance(entry, dict)}
+        except Exception as e:
+            logger.warning(
+                "Gemini batch error (%s: %s); falling back to rule-based verification for %d patients",
+                type(e).__name__, e, len(batch)
             )
+        call_ns = time.perf_counter_ns() - start
+        
+        outputs = {}
+        for patient_id, (inputs, prepared_ns) in batch.items():
+            # Restart the timer per patient; verify() below starts its own
+            self.start_timer(elapsed_ns=prepared_ns + call_ns)
+            if by_id is None:
+                outputs[patient_id] = self._fallback_verification(*inputs)
+                continue
             
-        except Exception as e:
-            print(f"  ✗ Gemini API error: {type(e).__name__}: {str(e)}")
-            print(f"  → Falling back to rule-based verification...")
+            entry = by_id.get(patient_id)
+            output = None
+            if entry is not None:
+                try:
+                    output = self._output_from_response(dumps_json(entry, indent=False), *inputs)
+                except Exception:
+                    output = None
+            if output is None:
+                # Omitted or malformed in the batch: ask again for this patient alone
+                output = self.verify(patient_id)
+            outputs[patient_id] = output
+        return outputs
+    
+    def _load_inputs(self, patient_id: str) -> tuple:
+        """Load the patient record, pharmacy inventory and drug interaction rules"""
+        # Reference files are parsed once per modification and read in the
+        # background while the patient record loads
+        inventory_future = self.submit_record("data/pharmacy_inventory.json", patient_id)
+        interactions_future = self.submit_read("data/drug_interaction_rules.json", cached=True)
+        
+        patient_data = self.load_patient_data(patient_id)
+        pharmacy_inventory = inventory_future.result()
+        drug_interactions = interactions_future.result()
+        
+        self._add_checked_fields()
+        
+        return patient_data, pharmacy_inventory, drug_interactions
+    
+    async def _aload_inputs(self, patient_id: str) -> tuple:
+        """Async variant of _load_inputs() that awaits all three reads together without blocking the event loop"""
+        patient_data, pharmacy_inventory, drug_interactions = await asyncio.gather(
+            asyncio.to_thread(self.load_patient_data, patient_id),
+            asyncio.wrap_future(self.submit_record("data/pharmacy_inventory.json", patient_id)),
+            asyncio.wrap_future(self.submit_read("data/drug_interaction_rules.json", cached=True))
+        )
+        
+        self._add_checked_fields()
+        
+        return patient_data, pharmacy_inventory, drug_interactions
+    
+    def _add_checked_fields(self):
+        """Record the fields every Pharmacy verification checks"""
+        self.add_checked_field("medications")
+        self.add_checked_field("allergies")
+        self.add_checked_field("active_orders")
+        self.add_checked_field("drug_interactions")
+    
+    def _output_from_response(
+        self,
+        response_text: str,
+        patient_data: Dict,
+        pharmacy_inventory: Dict,
+        drug_interactions: Dict
+    ) -> AgentOutputSchema:
+        """Turn Gemini response text into agent output, falling back if it is empty"""
+        # Check if response has text
+        if not response_text:
+            logger.warning("Gemini API returned empty response; falling back to rule-based verification")
             return self._fallback_verification(patient_data, pharmacy_inventory, drug_interactions)
+        
+        result = self._parse_gemini_response(response_text)
+        
+        logger.info("Pharmacy verification complete (NOC: %s)", result["noc"])
+        
+        return self.create_output(
+            noc=result["noc"],
+            confidence=result["confidence"],
+            issues=result["issues"],
+            raw_response=result.get("raw_data", {}),
+            validate=True
+        )
     
     def _build_verification_prompt(self, patient_data: Dict, pharmacy_inventory: Dict, drug_interactions: Dict) -> str:
         """Build verification prompt for Gemini"""
-        
         medications = patient_data.get("Medications", {}).get("Active Medications", [])
         allergies = patient_data.get("Patient Information", {}).get("Allergies", "None")
         
-        return f"""Review this patient's medication status for hospital discharge clearance.
-
-Current Medications:
-{json.dumps(medications, indent=2)[:700]}
-
-Known Allergies: {allergies}
-
-Pharmacy Order Status:
-{json.dumps(pharmacy_inventory.get("active_orders", []), indent=2)[:700]}
-
-Discharge Prescriptions:
-{json.dumps(pharmacy_inventory.get("discharge_medications", []), indent=2)[:500]}
-
-Please verify:
-1. Have all medication orders been filled and dispensed?
-2. Are there any conflicts between medications and patient allergies?
-3. Are there duplicate medications prescribed?
-4. Is payment cleared for discharge medications?
-
-Respond with a JSON assessment containing:
-- noc: true if pharmacy clears discharge, false if issues block it
-- confidence: your confidence level (0-1)
-- issues: list any problems (with code, title, severity, message, suggested_action)
-- raw_data: summary with pending_orders, allergy_conflicts, interactions_found arrays
-
-Common issue codes: PHARM_ORDER_PENDING, PHARM_ALLERGY_CONFLICT, PHARM_PAYMENT_PENDING, PHARM_DUPLICATE
-"""
+        return _PROMPT_TMPL.format(
+            medications=dumps_json(_summarize_medications(medications), indent=False),
+            allergies=allergies,
+            active_orders=dumps_json(_summarize_orders(pharmacy_inventory.get("active_orders", [])), indent=False),
+            discharge_medications=dumps_json(
+                _summarize_discharge_meds(pharmacy_inventory.get("discharge_medications", [])), indent=False
+            )
+        )
     
     def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
         """Parse Gemini response"""
         try:
-            cleaned = response_text.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-            
-            result = json.loads(cleaned)
+            result = self._loads_tolerant(response_text)
             
             issues = []
             for issue_data in result.get("issues", []):
                 # Normalize severity
                 severity = issue_data.get("severity", "medium").lower()
-                if severity not in ["low", "medium", "high", "critical"]:
+                if severity not in self._VALID_SEVERITIES:
                     severity = "medium"
                 
                 # Normalize evidence
@@ -151,7 +365,8 @@ Common issue codes: PHARM_ORDER_PENDING, PHARM_ALLERGY_CONFLICT, PHARM_PAYMENT_P
                     message=issue_data["message"],
                     suggested_action=issue_data["suggested_action"],
                     evidence=evidence,
-                    data=issue_data.get("data", {})
+                    data=issue_data.get("data", {}),
+                    validate=True
                 ))
             
             return {
@@ -162,9 +377,31 @@ Common issue codes: PHARM_ORDER_PENDING, PHARM_ALLERGY_CONFLICT, PHARM_PAYMENT_P
             }
             
         except Exception as e:
-            print(f"Error parsing Gemini response: {e}")
+            logger.error("Error parsing Gemini response: %s", e)
             raise
     
+    def _fast_rule_check(self, rules: AgentOutputSchema) -> Optional[AgentOutputSchema]:
+        """
+        Decide without Gemini when the fallback rules find a blocking issue.
+        
+        Args:
+            rules: Output of _fallback_verification for the patient
+            
+        Returns:
+            Output with NOC false at FAST_PATH_CONFIDENCE, or None if Gemini is needed
+        """
+        if rules.noc:
+            return None
+        
+        blocking = sum(1 for issue in rules.issues if issue.code in _BLOCKING_CODES)
+        logger.info("Pharmacy decided by rules (%d blocking issues); skipping Gemini", blocking)
+        return self.create_output(
+            noc=False,
+            confidence=FAST_PATH_CONFIDENCE,
+            issues=rules.issues,
+            raw_response={"fast_path": True}
+        )
+    
     def _fallback_verification(self, patient_data: Dict, pharmacy_inventory: Dict, drug_interactions: Dict) -> AgentOutputSchema:
         """Fallback rule-based verification"""
         issues = []
@@ -201,20 +438,27 @@ Common issue codes: PHARM_ORDER_PENDING, PHARM_ALLERGY_CONFLICT, PHARM_PAYMENT_P
         # Check allergy conflicts
         allergies = patient_data.get("Patient Information", {}).get("Allergies", "").lower()
         if "liver" in allergies and drug_interactions:
+            # Medication names as parallel columns, built once per check
+            active_meds = patient_data.get("Medications", {}).get("Active Medications", [])
+            med_names = [med.get("Name") for med in active_meds]
+            med_names_lower = [med.get("Name", "").lower() for med in active_meds]
             for contraindication in drug_interactions.get("allergy_contraindications", []):
                 if "liver" in contraindication.get("allergy", "").lower():
                     # Check if patient is on contraindicated drugs
-                    for med in patient_data.get("Medications", {}).get("Active Medications", []):
-                        med_name = med.get("Name", "").lower()
-                        if any(drug.lower() in med_name for drug in contraindication.get("contraindicated_drugs", [])):
+                    pattern = _drug_pattern(tuple(contraindication.get("contraindicated_drugs", [])))
+                    if pattern is None:
+                        continue
+                    for i, med_name_lower in enumerate(med_names_lower):
+                        if pattern.search(med_name_lower):
+                            med_name = med_names[i]
                             issues.append(self.create_issue(
                                 code="PHARM_ALLERGY_CONFLICT",
                                 title="Allergy-Medication Conflict",
                                 severity="critical",
-                                message=f"Patient has liver complaint but is on {med.get('Name')} which may be contraindicated",
+                                message=f"Patient has liver complaint but is on {med_name} which may be contraindicated",
                                 suggested_action="Consult physician for alternative medication",
                                 evidence=[format_evidence_path("patient_data.json", "Medications.Active Medications")],
-                                data={"medication": med.get("Name"), "allergy": allergies}
+                                data={"medication": med_name, "allergy": allergies}
                             ))
                             noc = False
         
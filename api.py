@@ -1,26 +1,113 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel, Field
-from typing import Dict, Any, List, Optional
-import uvicorn
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
 import os
+from collections import Counter
 import json
 from pathlib import Path
 
+from cachetools import TTLCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from config import Config
-from coordinator.workflow import DischargeWorkflow
-from coordinator.escalation_manager import EscalationManager
+from coordinator.escalation_manager import department_for
+from coordinator.state_manager import StateManager
+from utils.gemini_client import configure, warmup
+from utils.file_utils import get_file_version
+from utils.logging_utils import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# The workflow pulls in LangGraph, so it is imported on first use rather than with the app
+if TYPE_CHECKING:
+    from coordinator.workflow import DischargeWorkflow
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Patient Discharge Automation API",
     description="API for verifying patient discharge readiness using multi-agent AI system",
-    version="1.0.0"
+    version="1.0.0",
+    # Responses are rendered with orjson when it is installed (same bytes, faster)
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
+)
+
+# Workflow shared by all requests; agents and the Gemini model are built once.
+# Requests may run concurrently on the event loop, so per-run state (inputs,
+# batch client, agent timers) is kept out of the shared agents.
+_workflow: Optional["DischargeWorkflow"] = None
+
+
+# Worker processes for /verify when Config.API_PROCESS_WORKERS is set
+_executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+
+# Every input a verification reads; a change to any of them invalidates cached responses
+_DATA_FILES = (
+    Config.PATIENT_DATA_FILE,
+    Config.LAB_RESULTS_FILE,
+    Config.PHARMACY_INVENTORY_FILE,
+    Config.TRANSPORT_PROVIDERS_FILE,
+    Config.BILLING_SNAPSHOT_FILE,
+    Config.HOUSEKEEPING_SCHEDULE_FILE,
+    Config.INSURER_RECORDS_FILE,
+    Config.DRUG_INTERACTION_RULES_FILE,
 )
 
-# Initialize workflow components
-# We initialize these lazily or globally depending on requirements
-# For now, we'll create a new workflow instance per request to ensure clean state
-# but we could cache the model configuration
+# /verify results keyed by (patient_id, data version), so polling an unchanged
+# patient skips the workflow: (response, audited issues, next steps).
+# Only touched from the event loop.
+_RESPONSE_CACHE = TTLCache(maxsize=1024, ttl=60)
+
+# Records cached decisions in the patients' audit logs
+_state_manager: Optional[StateManager] = None
+
+
+def _data_version() -> tuple:
+    """
+    Version of every verification input file, as get_file_version() tuples.
+    
+    Any change to a file, including restoring an older copy, changes the version.
+    """
+    return tuple(get_file_version(str(path)) for path in _DATA_FILES)
+
+
+def get_state_manager() -> StateManager:
+    """Get the state manager used to audit cached decisions, creating it on first use"""
+    global _state_manager
+    if _state_manager is None:
+        _state_manager = StateManager()
+    return _state_manager
+
+
+def get_workflow() -> "DischargeWorkflow":
+    """Get the process-wide discharge workflow, creating it on first use"""
+    global _workflow
+    if _workflow is None:
+        from coordinator.workflow import DischargeWorkflow
+        _workflow = DischargeWorkflow(api_key=Config.GEMINI_API_KEY)
+    return _workflow
+
+
+def _init_worker():
+    """Configure Gemini and build the workflow once in each worker process"""
+    configure_logging()
+    if not Config.OFFLINE_MODE:
+        configure(Config.GEMINI_API_KEY)
+    get_workflow()
+
+
+def _run_workflow(patient_id: str) -> Dict[str, Any]:
+    """Run the discharge workflow for one patient inside a worker process"""
+    return asyncio.run(get_workflow().arun(patient_id))
 
 class DischargeRequest(BaseModel):
     patient_id: str = Field(..., description="Patient identifier to verify")
@@ -40,6 +127,9 @@ class EscalationSummary(BaseModel):
     insurance: int = 0
     general: int = 0
 
+class BatchDischargeRequest(BaseModel):
+    patient_ids: List[str] = Field(..., min_length=1, description="Patient identifiers to verify")
+
 class DischargeResponse(BaseModel):
     patient_id: str
     status: str
@@ -50,92 +140,183 @@ class DischargeResponse(BaseModel):
     escalations: Dict[str, int]
     details: Dict[str, Any]
 
+class BatchDischargeResponse(BaseModel):
+    results: List[DischargeResponse]
+
+def build_discharge_response(patient_id: str, final_state: Dict[str, Any]) -> DischargeResponse:
+    """Summarize a final workflow state as an API response"""
+    # Calculate alert counts from aggregated issues
+    issues = final_state.get("aggregated_issues", [])
+    
+    # Count severities and departments in one pass over the issues
+    severity_counts = Counter()
+    department_counts = Counter()
+    for issue in issues:
+        severity_counts[issue.get("severity")] += 1
+        department_counts[department_for(issue.get("code", ""))] += 1
+    
+    alerts_count = AlertsCount(
+        total=len(issues),
+        critical=severity_counts["critical"],
+        high=severity_counts["high"],
+        medium=severity_counts["medium"],
+        low=severity_counts["low"]
+    )
+    
+    # Simplify escalation keys for API response
+    simple_escalations = {
+        "lab": department_counts["Lab Portal"],
+        "pharmacy": department_counts["Pharmacy Portal"],
+        "billing": department_counts["Billing Portal"],
+        "transport": department_counts["Transport Services"],
+        "insurance": department_counts["Insurance Desk"],
+        "general": department_counts["General Operations"]
+    }
+    
+    # Construct response
+    return DischargeResponse(
+        patient_id=patient_id,
+        status=final_state["final_decision"],
+        approved=final_state["approved"],
+        timestamp=final_state["timestamp"],
+        summary=final_state["discharge_summary"].get("plain_text", "No summary available"),
+        alerts_count=alerts_count,
+        escalations=simple_escalations,
+        details={
+            "approved_by": final_state["approved_by"],
+            "blocked_by": final_state["blocked_by"],
+            "suggested_auto_resolutions": final_state["suggested_auto_resolutions"]
+        }
+    )
+
 @app.on_event("startup")
 async def startup_event():
     """Validate configuration on startup"""
+    configure_logging()
     try:
         Config.validate()
-        print("✅ Configuration validated")
+        logger.info("Configuration validated")
+        
+        # Open the Gemini connection before the first request arrives
+        if not Config.OFFLINE_MODE:
+            configure(Config.GEMINI_API_KEY)
+            warmup(Config.GEMINI_MODEL)
+        
+        get_workflow()
     except ValueError as e:
-        print(f"❌ Configuration error: {e}")
+        logger.error("Configuration error: %s", e)
         # In a real app we might want to exit, but for dev we'll just log
         pass
+    
+    # Spawned rather than forked: gRPC channels do not survive a fork
+    global _executor
+    if Config.API_PROCESS_WORKERS > 0:
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=Config.API_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+        logger.info("Running verifications in %d worker processes", Config.API_PROCESS_WORKERS)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the verification worker processes"""
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
 
 @app.post("/api/v1/discharge/verify", response_model=DischargeResponse)
-async def verify_discharge(request: DischargeRequest):
+async def verify_discharge(request: DischargeRequest, bypass_cache: bool = False):
     """
     Trigger discharge verification workflow for a patient.
+    
+    Repeat requests within a minute are answered from cache while the input
+    files are unchanged; pass ?bypass_cache=true to force a fresh run. A cached
+    decision is still appended to the patient's audit log, marked
+    served_from_cache. The state and escalation files written by the run that
+    produced it are left as they are, since the inputs have not changed.
     """
     patient_id = request.patient_id
-    print(f"🔍 Received discharge verification request for Patient ID: {patient_id}")
+    logger.info("Received discharge verification request for patient %s", patient_id)
+    
+    cache_key = (patient_id, _data_version())
+    if not bypass_cache:
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            response, issues, next_steps = cached
+            logger.info("Serving cached %s decision for patient %s", response.status, patient_id)
+            await asyncio.to_thread(
+                get_state_manager().append_audit_log,
+                patient_id,
+                response.status,
+                issues,
+                next_steps,
+                served_from_cache=True
+            )
+            return response
     
     try:
-        # Initialize workflow
-        workflow = DischargeWorkflow(api_key=Config.GEMINI_API_KEY)
+        if _executor is not None:
+            # Each worker runs one patient at a time, so patients run in parallel
+            final_state = await asyncio.get_running_loop().run_in_executor(_executor, _run_workflow, patient_id)
+        else:
+            # Run workflow; agents verify concurrently without blocking the event loop
+            final_state = await get_workflow().arun(patient_id)
         
-        # Run workflow (synchronous for now, could be made async with background tasks for long running)
-        final_state = workflow.run(patient_id)
-        
-        # Calculate alert counts from aggregated issues
-        issues = final_state.get("aggregated_issues", [])
-        
-        alerts_count = {
-            "total": len(issues),
-            "critical": len([i for i in issues if i.get("severity") == "critical"]),
-            "high": len([i for i in issues if i.get("severity") == "high"]),
-            "medium": len([i for i in issues if i.get("severity") == "medium"]),
-            "low": len([i for i in issues if i.get("severity") == "low"])
-        }
-        
-        # Calculate escalations by department
-        # We can reuse EscalationManager logic or just count based on prefixes
-        escalation_manager = EscalationManager()
-        escalations = {
-            "Lab Portal": 0,
-            "Pharmacy Portal": 0,
-            "Billing Portal": 0,
-            "Transport Services": 0,
-            "Insurance Desk": 0,
-            "General Operations": 0
-        }
+        response = build_discharge_response(patient_id, final_state)
+        _RESPONSE_CACHE[cache_key] = (
+            response,
+            final_state["aggregated_issues"],
+            [res.get("action", "") for res in final_state["suggested_auto_resolutions"]]
+        )
+        return response
         
-        for issue in issues:
-            dept = escalation_manager._map_issue_to_department(issue.get("code", ""))
-            if dept in escalations:
-                escalations[dept] += 1
-            else:
-                escalations["General Operations"] += 1
-                
-        # Simplify escalation keys for API response
-        simple_escalations = {
-            "lab": escalations.get("Lab Portal", 0),
-            "pharmacy": escalations.get("Pharmacy Portal", 0),
-            "billing": escalations.get("Billing Portal", 0),
-            "transport": escalations.get("Transport Services", 0),
-            "insurance": escalations.get("Insurance Desk", 0),
-            "general": escalations.get("General Operations", 0)
-        }
+    except Exception as e:
+        logger.exception("Workflow failed for patient %s", patient_id)
+        raise HTTPException(status_code=500, detail=f"Workflow execution failed: {str(e)}")
+
+@app.post("/api/v1/discharge/verify_batch", response_model=BatchDischargeResponse)
+async def verify_discharge_batch(request: BatchDischargeRequest):
+    """
+    Trigger discharge verification for several patients.
+    
+    The Pharmacy reviews for all patients share batched Gemini calls. In
+    offline mode the Lab checks for all patients also run as one vectorized
+    pass. The patients' workflows then run concurrently, with the other
+    agents verifying per patient as in /verify.
+    """
+    patient_ids = list(dict.fromkeys(request.patient_ids))
+    logger.info("Received batch discharge verification request for %d patients", len(patient_ids))
+    
+    try:
+        workflow = get_workflow()
+        batch_agents = [workflow.pharmacy_agent]
+        # Without a Gemini model the Lab agent is rule-based either way
+        if workflow.lab_agent.model is None:
+            batch_agents.append(workflow.lab_agent)
+        batch_outputs = await asyncio.gather(
+            *(asyncio.to_thread(agent.verify_batch, patient_ids) for agent in batch_agents)
+        )
         
-        # Construct response
-        return DischargeResponse(
-            patient_id=patient_id,
-            status=final_state["final_decision"],
-            approved=final_state["approved"],
-            timestamp=final_state["timestamp"],
-            summary=final_state["discharge_summary"].get("plain_text", "No summary available"),
-            alerts_count=AlertsCount(**alerts_count),
-            escalations=simple_escalations,
-            details={
-                "approved_by": final_state["approved_by"],
-                "blocked_by": final_state["blocked_by"],
-                "suggested_auto_resolutions": final_state["suggested_auto_resolutions"]
+        # The per-patient workflows run concurrently, like parallel /verify calls
+        final_states = await workflow.arun_batch(
+            patient_ids,
+            precomputed={
+                patient_id: {
+                    agent.agent_name: outputs[patient_id]
+                    for agent, outputs in zip(batch_agents, batch_outputs)
+                }
+                for patient_id in patient_ids
             }
         )
+        return BatchDischargeResponse(results=[
+            build_discharge_response(patient_id, final_state)
+            for patient_id, final_state in zip(patient_ids, final_states)
+        ])
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Batch workflow failed for patients %s", ", ".join(patient_ids))
         raise HTTPException(status_code=500, detail=f"Workflow execution failed: {str(e)}")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
@@ -12,6 +12,31 @@ class Config:
     # API Configuration
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    # Connections: the SDK is configured once per process (utils.gemini_client.configure)
+    # and keeps its gRPC channels open; set GRPC_TRACE=connectivity_state and
+    # GRPC_VERBOSITY=debug to confirm the channel is reused across calls
+    
+    # Cache static prompt context server-side (Gemini CachedContent); contexts below
+    # Gemini's minimum cacheable size are sent inline (base_agent.CONTEXT_CACHE_MIN_TOKENS)
+    GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "true").lower() == "true"
+    
+    # Answer the Insurance and Lab prompts with one batched Gemini call per patient, and
+    # the discharge summaries of a coordinate_batch() run with combined calls
+    GEMINI_BATCH_CALLS = os.getenv("GEMINI_BATCH_CALLS", "false").lower() == "true"
+    
+    # Most async Gemini calls in flight at once per event loop, across all agents
+    GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+    
+    # Skip Gemini entirely: agents use rule-based verification and the coordinator
+    # its template summary, so the SDK is never imported and no API key is needed
+    OFFLINE_MODE = os.getenv("OFFLINE_MODE", "false").lower() == "true"
+    
+    # Level for agent, coordinator and API log output (progress messages are INFO,
+    # Gemini fallbacks WARNING); set WARNING to hide progress
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    
+    # Run each API verification in one of this many worker processes (0 = in the server process)
+    API_PROCESS_WORKERS = int(os.getenv("API_PROCESS_WORKERS", "0"))
     
     # File Paths
     BASE_DIR = Path(__file__).parent
@@ -41,7 +66,7 @@ class Config:
     @classmethod
     def validate(cls):
         """Validate configuration"""
-        if not cls.GEMINI_API_KEY:
+        if not cls.GEMINI_API_KEY and not cls.OFFLINE_MODE:
             raise ValueError(
                 "GEMINI_API_KEY not found in environment. "
                 "Please set it in .env file or environment variables."
@@ -1,14 +1,98 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from collections import Counter
 from datetime import datetime
-import google.generativeai as genai
-import json
+import asyncio
+import logging
 
 from schemas.agent_schema import CoordinatorDecisionSchema
 from coordinator.state_manager import StateManager
 from coordinator.escalation_manager import EscalationManager
-from utils.file_utils import get_iso_timestamp
+from utils.file_utils import get_iso_timestamp, dumps_json, loads_json
+from utils.rules import first_match
+from utils.gemini_cache import prompt_key, get_cached_response, cache_response
+from utils.gemini_client import configure, get_model
+from agents.base_agent import BaseAgent, BatchedGeminiClient, get_context_model, stream_content, astream_content
 from config import Config
 
+logger = logging.getLogger(__name__)
+
+
+# Decision rules in priority order, as utils.rules tables: (fact, op, value, decision).
+# The first matching rule decides; with none matching the discharge is
+# PENDING_AUTO_RESOLUTION (only medium/low issues remain).
+_DECISION_RULES = (
+    ("critical", "gt", 0, "HOLD"),       # Rule 1: Any critical issue -> HOLD
+    ("high", "gt", 0, "HOLD"),           # Rule 2: Any high severity issue -> HOLD
+    ("all_noc", "eq", True, "APPROVE"),  # Rule 3: All agents granted NOC -> APPROVE
+)
+
+# Instructions shared by every discharge summary call. They lead the prompt so
+# Gemini can reuse them from its context cache (explicitly when
+# GEMINI_CONTEXT_CACHE is on, otherwise through implicit prefix caching).
+_SUMMARY_INSTRUCTIONS = """You are a Discharge Coordinator. Generate a discharge summary based on agent verifications.
+
+Generate TWO summaries:
+
+1. PLAIN TEXT (for patient/family):
+   - Simple, non-technical language
+   - If APPROVED: explain discharge is ready, next steps
+   - If HOLD: explain what's blocking and what needs to happen
+   - If PENDING: explain minor issues being resolved
+
+2. FOR MEDICAL RECORD (for clinicians):
+   - Professional medical summary
+   - Include key findings from each agent
+   - List any pending items or follow-up required
+   - Reference specific issue codes
+
+Return ONLY valid JSON (no markdown):
+{
+  "plain_text": "Patient-friendly summary paragraph",
+  "for_medical_record": "Professional clinical summary"
+}
+
+The patient's verification results follow.
+"""
+
+# JSON mode lets the streamed summary stop as soon as its object closes
+_SUMMARY_GEN_CONFIG = {"response_mime_type": "application/json"}
+
+# Per-request timeout for a single summary call, in seconds
+_SUMMARY_TIMEOUT_S = 30
+
+# Combined prompt for batched summaries: the shared instructions once, then one section per patient
+_BATCH_SUMMARY_PREAMBLE = f"""{_SUMMARY_INSTRUCTIONS}
+Each section below holds a different patient's verification results.
+Answer every section independently with the JSON object described above."""
+
+# Most patients per batched summary call, keeping the combined answer within max_output_tokens
+_SUMMARY_BATCH_SIZE = 10
+
+
+def _compact_for_prompt(obj: Any, max_items: int = 5, max_str: int = 120) -> Any:
+    """
+    Clip a JSON-like value to a bounded size before it is serialized into a prompt.
+    
+    Args:
+        obj: Dicts, lists and scalars as produced by the agents
+        max_items: Longest list kept; the rest is replaced by a "... N more" marker
+        max_str: Longest string kept; longer strings end in "..."
+        
+    Returns:
+        A clipped copy of obj
+    """
+    if isinstance(obj, dict):
+        return {key: _compact_for_prompt(value, max_items, max_str) for key, value in obj.items()}
+    if isinstance(obj, list):
+        items = [_compact_for_prompt(value, max_items, max_str) for value in obj[:max_items]]
+        if len(obj) > max_items:
+            items.append(f"... {len(obj) - max_items} more")
+        return items
+    if isinstance(obj, str) and len(obj) > max_str:
+        return obj[:max_str] + "..."
+    return obj
+
+
 class CoordinatorAgent:
     """
     Coordinator agent that orchestrates all 5 agents and makes final discharge decision.
@@ -22,9 +106,12 @@ class CoordinatorAgent:
         Args:
             api_key: Gemini API key
         """
-        if api_key:
-            genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        # No model in offline mode; every summary uses _fallback_summary()
+        self.model = None
+        if not Config.OFFLINE_MODE:
+            if api_key:
+                configure(api_key)
+            self.model = get_model(Config.GEMINI_MODEL)
         self.state_manager = StateManager()
         self.escalation_manager = EscalationManager()
     
@@ -50,31 +137,200 @@ class CoordinatorAgent:
         Returns:
             CoordinatorDecisionSchema with final decision
         """
-        # Aggregate all issues
+        all_issues, approved_by, blocked_by, severity_counts = self._aggregate(agent_outputs)
+        
+        # Apply decision rules
+        final_decision, approved = self._apply_decision_rules(severity_counts, agent_outputs)
+        
+        # Generate discharge summary
+        discharge_summary = self._generate_discharge_summary(
+            patient_id, agent_outputs, all_issues, final_decision
+        )
+        
+        return self._finalize(
+            patient_id, agent_outputs, all_issues, approved_by, blocked_by,
+            final_decision, approved, discharge_summary
+        )
+    
+    async def acoordinate(
+        self,
+        patient_id: str,
+        agent_outputs: Dict[str, Dict[str, Any]]
+    ) -> CoordinatorDecisionSchema:
+        """
+        Async variant of coordinate() that awaits the Gemini summary call.
+        
+        State, audit and escalation files are written in a worker thread so the
+        event loop is never blocked on disk I/O.
+        """
+        all_issues, approved_by, blocked_by, severity_counts = self._aggregate(agent_outputs)
+        final_decision, approved = self._apply_decision_rules(severity_counts, agent_outputs)
+        discharge_summary = await self._agenerate_discharge_summary(
+            patient_id, agent_outputs, all_issues, final_decision
+        )
+        return await asyncio.to_thread(
+            self._finalize, patient_id, agent_outputs, all_issues, approved_by, blocked_by,
+            final_decision, approved, discharge_summary
+        )
+    
+    async def coordinate_batch(
+        self,
+        outputs_by_patient: Dict[str, Dict[str, Dict[str, Any]]]
+    ) -> Dict[str, CoordinatorDecisionSchema]:
+        """
+        Coordinate several patients concurrently.
+        
+        With GEMINI_BATCH_CALLS on, every summary not already cached is
+        requested through combined Gemini calls of up to _SUMMARY_BATCH_SIZE
+        patients each. Patients missing from a combined answer (or all of them,
+        if the call fails) get individual summary calls. At most
+        Config.GEMINI_CONCURRENCY patients are coordinated at once.
+        
+        Args:
+            outputs_by_patient: Agent outputs (as passed to coordinate()) keyed by patient ID
+            
+        Returns:
+            Coordinator decisions keyed by patient ID
+        """
+        prepared = {}
+        for patient_id, agent_outputs in outputs_by_patient.items():
+            all_issues, approved_by, blocked_by, severity_counts = self._aggregate(agent_outputs)
+            final_decision, approved = self._apply_decision_rules(severity_counts, agent_outputs)
+            prepared[patient_id] = (all_issues, approved_by, blocked_by, final_decision, approved)
+        
+        summaries = {}
+        if Config.GEMINI_BATCH_CALLS and self.model is not None and len(outputs_by_patient) > 1:
+            summaries = await self._abatch_summaries(outputs_by_patient, prepared)
+        
+        semaphore = asyncio.Semaphore(Config.GEMINI_CONCURRENCY)
+        
+        async def _one(patient_id: str, agent_outputs: Dict[str, Dict[str, Any]]) -> CoordinatorDecisionSchema:
+            all_issues, approved_by, blocked_by, final_decision, approved = prepared[patient_id]
+            async with semaphore:
+                discharge_summary = summaries.get(patient_id)
+                if discharge_summary is None:
+                    discharge_summary = await self._agenerate_discharge_summary(
+                        patient_id, agent_outputs, all_issues, final_decision
+                    )
+                return await asyncio.to_thread(
+                    self._finalize, patient_id, agent_outputs, all_issues, approved_by, blocked_by,
+                    final_decision, approved, discharge_summary
+                )
+        
+        decisions = await asyncio.gather(
+            *(_one(patient_id, outputs) for patient_id, outputs in outputs_by_patient.items())
+        )
+        return dict(zip(outputs_by_patient, decisions))
+    
+    async def _abatch_summaries(
+        self,
+        outputs_by_patient: Dict[str, Dict[str, Dict[str, Any]]],
+        prepared: Dict[str, tuple]
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Generate discharge summaries for several patients with combined Gemini calls.
+        
+        Args:
+            outputs_by_patient: Agent outputs keyed by patient ID
+            prepared: (all_issues, approved_by, blocked_by, final_decision, approved) keyed by patient ID
+            
+        Returns:
+            Summaries keyed by patient ID, for the patients that were cached or
+            answered by a combined call
+        """
+        summaries = {}
+        keys = {}
+        batches = []
+        for patient_id, agent_outputs in outputs_by_patient.items():
+            all_issues, _, _, final_decision, _ = prepared[patient_id]
+            if self._is_trivial_summary(final_decision, all_issues):
+                summaries[patient_id] = self._fallback_summary(final_decision, all_issues)
+                continue
+            key = self._summary_key(patient_id, agent_outputs, all_issues, final_decision)
+            cached = self._cached_summary(key)
+            if cached is not None:
+                summaries[patient_id] = cached
+                continue
+            
+            if not batches or len(batches[-1][1]) >= _SUMMARY_BATCH_SIZE:
+                batches.append((BatchedGeminiClient(self.model, preamble=_BATCH_SUMMARY_PREAMBLE), []))
+            batch, patient_ids = batches[-1]
+            batch.enqueue(
+                patient_id,
+                self._build_summary_prompt(patient_id, agent_outputs, all_issues, final_decision)
+            )
+            patient_ids.append(patient_id)
+            keys[patient_id] = key
+        
+        if not batches:
+            return summaries
+        
+        logger.info("Generating %d discharge summaries with %d batched Gemini call(s)", len(keys), len(batches))
+        await asyncio.gather(*(asyncio.to_thread(batch.flush) for batch, _ in batches))
+        
+        for batch, patient_ids in batches:
+            for patient_id in patient_ids:
+                try:
+                    response_text = batch.get_result(patient_id)
+                    if not response_text:
+                        continue
+                    summary = self._parse_summary(response_text)
+                except Exception as e:
+                    logger.warning("Batched summary unavailable for %s (%s: %s)", patient_id, type(e).__name__, e)
+                    continue
+                cache_response(keys[patient_id], dumps_json(summary, indent=False))
+                summaries[patient_id] = summary
+        return summaries
+    
+    def _aggregate(self, agent_outputs: Dict[str, Dict[str, Any]]) -> tuple:
+        """
+        Collect every agent's issues and which agents approved or blocked, in one pass.
+        
+        Returns:
+            Tuple of (all_issues, approved_by, blocked_by, severity_counts)
+        """
         all_issues = []
         approved_by = []
         blocked_by = []
+        severity_counts = Counter()
         
         for agent_name, output in agent_outputs.items():
             if output.get("noc"):
                 approved_by.append(agent_name)
             
+            blocking = False
             for issue in output.get("issues", []):
+                # Copy rather than tag in place: agent outputs are saved to state as-is.
+                # dict.copy() measured ~2x faster than a {**issue, "agent": ...} merge
                 issue_with_agent = issue.copy()
                 issue_with_agent["agent"] = agent_name
                 all_issues.append(issue_with_agent)
                 
-                # Track blocking agents
-                if issue.get("severity") in ["high", "critical"] and agent_name not in blocked_by:
-                    blocked_by.append(agent_name)
-        
-        # Apply decision rules
-        final_decision, approved = self._apply_decision_rules(all_issues, agent_outputs)
+                severity = issue.get("severity")
+                severity_counts[severity] += 1
+                if severity in ("high", "critical"):
+                    blocking = True
+            
+            # Track blocking agents
+            if blocking:
+                blocked_by.append(agent_name)
         
-        # Generate discharge summary
-        discharge_summary = self._generate_discharge_summary(
-            patient_id, agent_outputs, all_issues, final_decision
-        )
+        return all_issues, approved_by, blocked_by, severity_counts
+    
+    def _finalize(
+        self,
+        patient_id: str,
+        agent_outputs: Dict[str, Dict[str, Any]],
+        all_issues: List[Dict[str, Any]],
+        approved_by: List[str],
+        blocked_by: List[str],
+        final_decision: str,
+        approved: bool,
+        discharge_summary: Dict[str, str]
+    ) -> CoordinatorDecisionSchema:
+        """Suggest resolutions, write state, audit and escalation files, and build the decision"""
+        # One timestamp for the decision and every file it writes
+        now = get_iso_timestamp()
         
         # Generate auto-resolution suggestions
         suggested_auto_resolutions = self._generate_auto_resolutions(all_issues, final_decision)
@@ -90,7 +346,8 @@ class CoordinatorAgent:
             issues=all_issues,
             final_decision=final_decision,
             approved_by=approved_by,
-            blocked_by=blocked_by
+            blocked_by=blocked_by,
+            now=now
         )
         files_written.append(state_file)
         
@@ -100,22 +357,26 @@ class CoordinatorAgent:
             patient_id=patient_id,
             final_decision=final_decision,
             issues=all_issues,
-            recommended_next_steps=next_steps
+            recommended_next_steps=next_steps,
+            now=now
         )
         files_written.append(audit_file)
         
         # Generate escalation alerts for departments
-        print("  Generating escalation alerts for departments...")
+        logger.info("Generating escalation alerts for departments")
         escalation_files = self.escalation_manager.create_escalations(
             patient_id=patient_id,
             issues=all_issues,
-            final_decision=final_decision
+            final_decision=final_decision,
+            now=now
         )
         files_written.extend(escalation_files)
-        print(f"  ✓ Generated {len(escalation_files)} escalation alert files")
+        logger.info("Generated %d escalation alert files", len(escalation_files))
         
-        # Create coordinator decision
-        return CoordinatorDecisionSchema(
+        # Create coordinator decision without validation (which re-walks the issue lists).
+        # The fields come from the agents' schema-built outputs and this module; the
+        # Gemini discharge summary was shape-checked by _parse_summary()
+        return CoordinatorDecisionSchema.model_construct(
             patient_id=patient_id,
             final_decision=final_decision,
             approved=approved,
@@ -125,37 +386,34 @@ class CoordinatorAgent:
             suggested_auto_resolutions=suggested_auto_resolutions,
             discharge_summary=discharge_summary,
             files_written=files_written,
-            timestamp=get_iso_timestamp()
+            timestamp=now
         )
     
     def _apply_decision_rules(
         self,
-        all_issues: List[Dict[str, Any]],
+        severity_counts: Counter,
         agent_outputs: Dict[str, Dict[str, Any]]
     ) -> tuple[str, bool]:
         """
         Apply decision rules to determine final decision.
         
+        Args:
+            severity_counts: Number of issues per severity, from _aggregate()
+            agent_outputs: Dictionary of agent outputs
+        
         Returns:
             Tuple of (final_decision, approved)
         """
-        # Rule 1: Any critical issue -> HOLD
-        critical_issues = [i for i in all_issues if i.get("severity") == "critical"]
-        if critical_issues:
-            return ("HOLD", False)
-        
-        # Rule 2: Any high severity issue -> HOLD
-        high_issues = [i for i in all_issues if i.get("severity") == "high"]
-        if high_issues:
-            return ("HOLD", False)
-        
-        # Rule 3: All agents granted NOC -> APPROVE
-        all_noc = all(output.get("noc", False) for output in agent_outputs.values())
-        if all_noc:
-            return ("APPROVE", True)
-        
-        # Rule 4: Only medium/low issues -> PENDING_AUTO_RESOLUTION
-        return ("PENDING_AUTO_RESOLUTION", False)
+        facts = {
+            "critical": severity_counts["critical"],
+            "high": severity_counts["high"],
+            "all_noc": all(output.get("noc", False) for output in agent_outputs.values())
+        }
+        match = first_match(facts, _DECISION_RULES)
+        if match is None:
+            return ("PENDING_AUTO_RESOLUTION", False)
+        final_decision = match[0]
+        return (final_decision, final_decision == "APPROVE")
     
     def _generate_discharge_summary(
         self,
@@ -165,62 +423,170 @@ class CoordinatorAgent:
         final_decision: str
     ) -> Dict[str, str]:
         """Generate discharge summary using Gemini API"""
+        if self.model is None or self._is_trivial_summary(final_decision, all_issues):
+            return self._fallback_summary(final_decision, all_issues)
         
-        prompt = f"""You are a Discharge Coordinator. Generate a discharge summary based on agent verifications.
-
-PATIENT ID: {patient_id}
+        key = self._summary_key(patient_id, agent_outputs, all_issues, final_decision)
+        cached = self._cached_summary(key)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_summary_prompt(patient_id, agent_outputs, all_issues, final_decision)
+        
+        try:
+            logger.info("Generating discharge summary with Gemini API")
+            model, contents = self._select_summary_model(prompt)
+            response_text = stream_content(
+                model,
+                contents,
+                generation_config=_SUMMARY_GEN_CONFIG,
+                request_options={"timeout": _SUMMARY_TIMEOUT_S}
+            )
+            summary = self._parse_summary(response_text)
+            cache_response(key, dumps_json(summary, indent=False))
+            return summary
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); using fallback summary", type(e).__name__, e)
+            return self._fallback_summary(final_decision, all_issues)
+    
+    async def _agenerate_discharge_summary(
+        self,
+        patient_id: str,
+        agent_outputs: Dict[str, Dict[str, Any]],
+        all_issues: List[Dict[str, Any]],
+        final_decision: str
+    ) -> Dict[str, str]:
+        """Async variant of _generate_discharge_summary() using astream_content()"""
+        if self.model is None or self._is_trivial_summary(final_decision, all_issues):
+            return self._fallback_summary(final_decision, all_issues)
+        
+        key = self._summary_key(patient_id, agent_outputs, all_issues, final_decision)
+        cached = self._cached_summary(key)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_summary_prompt(patient_id, agent_outputs, all_issues, final_decision)
+        
+        try:
+            logger.info("Generating discharge summary with Gemini API")
+            model, contents = await asyncio.to_thread(self._select_summary_model, prompt)
+            response_text = await astream_content(
+                model,
+                contents,
+                generation_config=_SUMMARY_GEN_CONFIG,
+                request_options={"timeout": _SUMMARY_TIMEOUT_S}
+            )
+            summary = self._parse_summary(response_text)
+            cache_response(key, dumps_json(summary, indent=False))
+            return summary
+        except Exception as e:
+            logger.warning("Gemini API error (%s: %s); using fallback summary", type(e).__name__, e)
+            return self._fallback_summary(final_decision, all_issues)
+    
+    @staticmethod
+    def _is_trivial_summary(final_decision: str, all_issues: List[Dict[str, Any]]) -> bool:
+        """
+        Whether the standard fallback summary fully describes the outcome.
+        
+        An approval with no issues at all has nothing patient-specific for
+        Gemini to summarize, so no API call is made for it.
+        """
+        return final_decision == "APPROVE" and not all_issues
+    
+    def _summary_key(
+        self,
+        patient_id: str,
+        agent_outputs: Dict[str, Dict[str, Any]],
+        all_issues: List[Dict[str, Any]],
+        final_decision: str
+    ) -> str:
+        """
+        Cache key for a discharge summary, built from the decision signature.
+        
+        Re-coordinating a patient with the same decision, issue codes and
+        severities, and approving agents (e.g. on a retry) reuses the summary.
+        """
+        # Key order is fixed by the literal, so the signature is stable without sort_keys
+        signature = dumps_json({
+            "p": patient_id,
+            "d": final_decision,
+            "i": sorted((i.get("agent", ""), i.get("code", ""), i.get("severity", "")) for i in all_issues),
+            "noc": sorted(name for name, output in agent_outputs.items() if output.get("noc"))
+        }, indent=False)
+        return prompt_key(f"discharge-summary:{signature}")
+    
+    def _cached_summary(self, key: str) -> Optional[Dict[str, str]]:
+        """Previously generated summary for a key, or None"""
+        cached = get_cached_response(key)
+        if cached is None:
+            return None
+        logger.info("Discharge summary reused from cache")
+        return loads_json(cached)
+    
+    def _build_summary_prompt(
+        self,
+        patient_id: str,
+        agent_outputs: Dict[str, Dict[str, Any]],
+        all_issues: List[Dict[str, Any]],
+        final_decision: str
+    ) -> str:
+        """Build the per-patient part of the discharge summary prompt (follows _SUMMARY_INSTRUCTIONS)"""
+        # Issues are listed once under ALL ISSUES, so agents contribute their verdicts
+        # and raw findings (e.g. transport provider, shortfall amount, critical values);
+        # everything is clipped to a bounded size
+        verdicts = {
+            name: {
+                "noc": output.get("noc"),
+                "confidence": output.get("confidence"),
+                "raw_data": _compact_for_prompt(output.get("meta", {}).get("raw_response", {}))
+            }
+            for name, output in agent_outputs.items()
+        }
+        issues = [_compact_for_prompt(issue) for issue in all_issues]
+        
+        return f"""PATIENT ID: {patient_id}
 
 AGENT OUTPUTS:
-{json.dumps(agent_outputs, indent=2)[:1000]}
+{dumps_json(verdicts, indent=False)}
 
 ALL ISSUES:
-{json.dumps(all_issues, indent=2)[:1000]}
+{dumps_json(issues, indent=False)}
 
 FINAL DECISION: {final_decision}
-
-Generate TWO summaries:
-
-1. PLAIN TEXT (for patient/family):
-   - Simple, non-technical language
-   - If APPROVED: explain discharge is ready, next steps
-   - If HOLD: explain what's blocking and what needs to happen
-   - If PENDING: explain minor issues being resolved
-
-2. FOR MEDICAL RECORD (for clinicians):
-   - Professional medical summary
-   - Include key findings from each agent
-   - List any pending items or follow-up required
-   - Reference specific issue codes
-
-Return ONLY valid JSON (no markdown):
-{{
-  "plain_text": "Patient-friendly summary paragraph",
-  "for_medical_record": "Professional clinical summary"
-}}
 """
+    
+    def _select_summary_model(self, prompt: str) -> tuple:
+        """
+        Pick the model and contents for a summary call, preferring a model bound
+        to a server-side cache of _SUMMARY_INSTRUCTIONS.
         
-        try:
-            print("  Generating discharge summary with Gemini API...")
-            response = self.model.generate_content(
-                prompt,
-                request_options={"timeout": 30}
-            )
-            cleaned = response.text.strip()
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-            
-            summary = json.loads(cleaned)
-            print("  ✓ Discharge summary generated")
-            return summary
-        except Exception as e:
-            print(f"  ✗ Gemini API error: {type(e).__name__}: {str(e)}")
-            print(f"  → Using fallback summary generation...")
-            return self._fallback_summary(final_decision, all_issues)
+        Returns:
+            Tuple of (model, contents)
+        """
+        if Config.GEMINI_CONTEXT_CACHE:
+            context_model = get_context_model("Coordinator", _SUMMARY_INSTRUCTIONS)
+            if context_model is not None:
+                return context_model, prompt
+        return self.model, f"{_SUMMARY_INSTRUCTIONS}\n{prompt}"
+    
+    def _parse_summary(self, response_text: str) -> Dict[str, str]:
+        """
+        Parse the discharge summary JSON from Gemini response text.
+        
+        Raises:
+            ValueError: If the response is not an object with string plain_text
+                and for_medical_record fields, so callers use _fallback_summary()
+        """
+        # Shared with the agents: one precompiled fence regex, then a balanced-object fallback
+        summary = BaseAgent._loads_tolerant(response_text)
+        if not (
+            isinstance(summary, dict)
+            and isinstance(summary.get("plain_text"), str)
+            and isinstance(summary.get("for_medical_record"), str)
+        ):
+            raise ValueError("Discharge summary is missing plain_text or for_medical_record")
+        logger.info("Discharge summary generated")
+        return summary
     
     def _fallback_summary(self, final_decision: str, all_issues: List[Dict[str, Any]]) -> Dict[str, str]:
         """Fallback summary generation"""
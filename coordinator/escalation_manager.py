@@ -1,13 +1,42 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+import functools
 import json
 import os
 from pathlib import Path
 
+from pydantic import TypeAdapter
+
 from schemas.agent_schema import EscalationAlert
 from utils.file_utils import get_iso_timestamp, write_json_file
 
 
+# Serializes a whole alert list in one pydantic-core call
+_ALERT_LIST = TypeAdapter(List[EscalationAlert])
+
+# Alert priorities, most urgent first
+_PRIORITY_RANK = {"urgent": 0, "high": 1, "normal": 2, "low": 3}
+
+
+@functools.lru_cache(maxsize=256)
+def department_for(issue_code: str) -> str:
+    """
+    Map an issue code to the department that handles it.
+    
+    Issue codes come from a small fixed set, so each code is resolved once.
+    
+    Args:
+        issue_code: Issue code (e.g., "PHARM_ALLERGY_CONFLICT")
+        
+    Returns:
+        Department name, "General Operations" if no prefix matches
+    """
+    head, sep, _ = issue_code.partition("_")
+    if not sep:
+        return "General Operations"
+    return _PREFIX_DEPARTMENTS.get(head, "General Operations")
+
+
 class EscalationManager:
     """
     Manages escalation alerts for different departments based on discharge issues.
@@ -46,7 +75,8 @@ class EscalationManager:
         self,
         patient_id: str,
         issues: List[Dict[str, Any]],
-        final_decision: str
+        final_decision: str,
+        now: Optional[str] = None
     ) -> List[str]:
         """
         Create escalation alerts for all issues.
@@ -55,6 +85,7 @@ class EscalationManager:
             patient_id: Patient identifier
             issues: List of issues from all agents
             final_decision: Final discharge decision
+            now: ISO timestamp stamped on every alert and file (default: current time)
             
         Returns:
             List of file paths written
@@ -62,9 +93,10 @@ class EscalationManager:
         if not issues:
             return []
         
-        # Create patient-specific directory
+        now = now or get_iso_timestamp()
+        
+        # Patient-specific directory; write_json_file creates it on the first write
         patient_dir = os.path.join(self.escalations_dir, f"patient_{patient_id}")
-        os.makedirs(patient_dir, exist_ok=True)
         
         # Group issues by department
         department_alerts = {}
@@ -72,7 +104,7 @@ class EscalationManager:
         
         for issue in issues:
             # Create alert
-            alert = self._create_alert(patient_id, issue)
+            alert = self._create_alert(patient_id, issue, now)
             
             # Add to department group
             dept = alert.department
@@ -88,23 +120,23 @@ class EscalationManager:
         files_written = []
         
         for department, alerts in department_alerts.items():
-            file_path = self._write_department_alerts(patient_dir, department, alerts)
+            file_path = self._write_department_alerts(patient_dir, department, alerts, now)
             files_written.append(file_path)
         
         # Write patient notifications
         if patient_notifications:
-            file_path = self._write_patient_notifications(patient_dir, patient_notifications)
+            file_path = self._write_patient_notifications(patient_dir, patient_notifications, now)
             files_written.append(file_path)
         
         # Write escalation summary
         summary_path = self._write_escalation_summary(
-            patient_dir, patient_id, department_alerts, final_decision
+            patient_dir, patient_id, department_alerts, final_decision, now
         )
         files_written.append(summary_path)
         
         return files_written
     
-    def _create_alert(self, patient_id: str, issue: Dict[str, Any]) -> EscalationAlert:
+    def _create_alert(self, patient_id: str, issue: Dict[str, Any], now: str) -> EscalationAlert:
         """Create an escalation alert from an issue."""
         self.alert_counter += 1
         
@@ -128,22 +160,20 @@ class EscalationManager:
             suggested_action=issue.get("suggested_action", ""),
             evidence=issue.get("evidence", []),
             data=issue.get("data", {}),
-            escalated_at=get_iso_timestamp(),
+            escalated_at=now,
             status="pending"
         )
     
     def _map_issue_to_department(self, issue_code: str) -> str:
         """Map issue code to department."""
-        for prefix, department in self.DEPARTMENT_MAPPING.items():
-            if issue_code.startswith(prefix):
-                return department
-        return "General Operations"
+        return department_for(issue_code)
     
     def _write_department_alerts(
         self,
         patient_dir: str,
         department: str,
-        alerts: List[EscalationAlert]
+        alerts: List[EscalationAlert],
+        now: str
     ) -> str:
         """Write department-specific alert file."""
         # Create filename from department name
@@ -151,20 +181,16 @@ class EscalationManager:
         file_path = os.path.join(patient_dir, filename)
         
         # Get highest priority
-        priority_order = ["urgent", "high", "normal", "low"]
-        highest_priority = min(
-            [alert.priority for alert in alerts],
-            key=lambda p: priority_order.index(p)
-        )
+        highest_priority = min((alert.priority for alert in alerts), key=_PRIORITY_RANK.__getitem__)
         
         # Create department alert structure
         department_data = {
             "department": department,
             "patient_id": alerts[0].patient_id,
-            "alerts": [alert.model_dump() for alert in alerts],
+            "alerts": _ALERT_LIST.dump_python(alerts),
             "total_alerts": len(alerts),
             "highest_priority": highest_priority,
-            "generated_at": get_iso_timestamp()
+            "generated_at": now
         }
         
         write_json_file(file_path, department_data)
@@ -173,7 +199,8 @@ class EscalationManager:
     def _write_patient_notifications(
         self,
         patient_dir: str,
-        alerts: List[EscalationAlert]
+        alerts: List[EscalationAlert],
+        now: str
     ) -> str:
         """Write patient notification file."""
         file_path = os.path.join(patient_dir, "patient_notifications.json")
@@ -193,7 +220,7 @@ class EscalationManager:
             "patient_id": alerts[0].patient_id,
             "notifications": notifications,
             "total_notifications": len(notifications),
-            "generated_at": get_iso_timestamp()
+            "generated_at": now
         }
         
         write_json_file(file_path, notification_data)
@@ -218,7 +245,8 @@ class EscalationManager:
         patient_dir: str,
         patient_id: str,
         department_alerts: Dict[str, List[EscalationAlert]],
-        final_decision: str
+        final_decision: str,
+        now: str
     ) -> str:
         """Write escalation summary file."""
         file_path = os.path.join(patient_dir, f"escalation_summary_{patient_id}.json")
@@ -241,8 +269,17 @@ class EscalationManager:
             "department_summary": {
                 dept: len(alerts) for dept, alerts in department_alerts.items()
             },
-            "generated_at": get_iso_timestamp()
+            "generated_at": now
         }
         
         write_json_file(file_path, summary_data)
         return file_path
+
+
+# DEPARTMENT_MAPPING keyed by prefix without its trailing underscore, for
+# department_for()'s single dict lookup on the text before the first "_".
+# Relies on every prefix being one word followed by "_".
+_PREFIX_DEPARTMENTS = {
+    prefix.rstrip("_"): department
+    for prefix, department in EscalationManager.DEPARTMENT_MAPPING.items()
+}
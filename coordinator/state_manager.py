@@ -1,8 +1,10 @@
-import json
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from utils.file_utils import write_json_file, append_to_json_log, get_iso_timestamp
+import logging
+from utils.file_utils import write_json_file, append_jsonl, read_jsonl, migrate_json_log, get_iso_timestamp, loads_json
+
+logger = logging.getLogger(__name__)
 
 
 class StateManager:
@@ -20,6 +22,8 @@ class StateManager:
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Patients whose legacy JSON audit log has already been checked for
+        self._migrated = set()
     
     def save_discharge_state(
         self,
@@ -29,7 +33,8 @@ class StateManager:
         issues: List[Dict[str, Any]],
         final_decision: str,
         approved_by: List[str],
-        blocked_by: List[str]
+        blocked_by: List[str],
+        now: Optional[str] = None
     ) -> str:
         """
         Save discharge workflow state to file.
@@ -42,16 +47,17 @@ class StateManager:
             final_decision: Final decision
             approved_by: List of agents that approved
             blocked_by: List of agents that blocked
+            now: ISO timestamp to record (default: current time)
             
         Returns:
             Path to the saved state file
         """
-        timestamp = get_iso_timestamp()
+        timestamp = now or get_iso_timestamp()
         
         # Calculate expiration (6 hours from now if approved)
         expires_at = None
         if status == "approved":
-            expiry_time = datetime.now() + timedelta(hours=6)
+            expiry_time = datetime.fromisoformat(timestamp) + timedelta(hours=6)
             expires_at = expiry_time.isoformat()
         
         state = {
@@ -81,7 +87,9 @@ class StateManager:
         patient_id: str,
         final_decision: str,
         issues: List[Dict[str, Any]],
-        recommended_next_steps: List[str]
+        recommended_next_steps: List[str],
+        now: Optional[str] = None,
+        served_from_cache: bool = False
     ) -> str:
         """
         Append entry to audit log.
@@ -91,11 +99,14 @@ class StateManager:
             final_decision: Final decision made
             issues: List of issues
             recommended_next_steps: Suggested actions
+            now: ISO timestamp to record (default: current time)
+            served_from_cache: The decision was returned from the API response
+                cache rather than a new workflow run
             
         Returns:
             Path to the audit log file
         """
-        timestamp = get_iso_timestamp()
+        timestamp = now or get_iso_timestamp()
         
         entry = {
             "timestamp": timestamp,
@@ -105,12 +116,42 @@ class StateManager:
             "critical_issues": [i for i in issues if i.get("severity") == "critical"],
             "recommended_next_steps": recommended_next_steps
         }
+        if served_from_cache:
+            entry["served_from_cache"] = True
         
-        file_path = self.output_dir / f"discharge_audit_log_{patient_id}.json"
-        append_to_json_log(str(file_path), entry)
+        file_path = self._audit_log_path(patient_id)
+        append_jsonl(str(file_path), entry)
         
         return str(file_path)
     
+    def load_audit_log(self, patient_id: str) -> List[Dict[str, Any]]:
+        """
+        Load every audit log entry for a patient, oldest first.
+        
+        Args:
+            patient_id: Patient identifier
+            
+        Returns:
+            List of audit entries (empty if none were logged)
+        """
+        return read_jsonl(str(self._audit_log_path(patient_id)))
+    
+    def _audit_log_path(self, patient_id: str) -> Path:
+        """
+        Get the JSON Lines audit log path for a patient.
+        
+        An audit log from older versions (a JSON array in
+        discharge_audit_log_<patient_id>.json) is migrated into it the first
+        time the patient's log is touched.
+        """
+        file_path = self.output_dir / f"discharge_audit_log_{patient_id}.jsonl"
+        if patient_id not in self._migrated:
+            legacy_path = file_path.with_suffix(".json")
+            if legacy_path.exists():
+                migrate_json_log(str(legacy_path), str(file_path))
+            self._migrated.add(patient_id)
+        return file_path
+    
     def load_discharge_state(self, patient_id: str) -> Dict[str, Any]:
         """
         Load discharge state from file.
@@ -127,10 +168,9 @@ class StateManager:
             return None
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return loads_json(file_path.read_bytes())
         except Exception as e:
-            print(f"Error loading state: {e}")
+            logger.error("Error loading state: %s", e)
             return None
     
     def is_state_expired(self, patient_id: str) -> bool:
@@ -1,5 +1,9 @@
-from langgraph.graph import StateGraph, END
-from typing import Dict, Any
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import StateGraph, START, END
+from typing import Dict, Any, List
+import asyncio
+import functools
+import logging
 
 from coordinator.workflow_state import DischargeState, create_initial_state
 from agents.insurance_agent import InsuranceAgent
@@ -7,7 +11,54 @@ from agents.pharmacy_agent import PharmacyAgent
 from agents.ambulance_agent import AmbulanceAgent
 from agents.bed_management_agent import BedManagementAgent
 from agents.lab_agent import LabAgent
+from agents.base_agent import BatchedGeminiClient, run_all_agents
 from coordinator.coordinator_agent import CoordinatorAgent
+from schemas.agent_schema import CoordinatorDecisionSchema
+from config import Config
+
+
+logger = logging.getLogger(__name__)
+
+# (agent name, state key holding its output), in DischargeWorkflow.agents order
+_AGENT_STATE_KEYS = (
+    ("Insurance", "insurance_output"),
+    ("Pharmacy", "pharmacy_output"),
+    ("Ambulance", "ambulance_output"),
+    ("Bed Management", "bed_output"),
+    ("Lab", "lab_output"),
+)
+
+
+async def _agents_node(state: DischargeState, config: RunnableConfig) -> Dict[str, Any]:
+    """Graph node: verify with every agent of the run's workflow"""
+    return await config["configurable"]["workflow"]._run_agents(state, config)
+
+
+async def _coordinator_node(state: DischargeState, config: RunnableConfig) -> Dict[str, Any]:
+    """Graph node: decide with the run's workflow coordinator"""
+    return await config["configurable"]["workflow"]._run_coordinator(state)
+
+
+@functools.lru_cache(maxsize=1)
+def _compiled_graph():
+    """
+    Build and compile the LangGraph workflow once per process.
+    
+    The nodes hold no workflow state; each run passes its DischargeWorkflow
+    in the "workflow" configurable, so one compiled graph serves every instance.
+    """
+    workflow = StateGraph(DischargeState)
+    
+    # One node verifies with all five agents concurrently (their Gemini calls
+    # are awaited together), then the coordinator decides on their outputs
+    workflow.add_node("agents", _agents_node)
+    workflow.add_node("coordinator", _coordinator_node)
+    
+    workflow.add_edge(START, "agents")
+    workflow.add_edge("agents", "coordinator")
+    workflow.add_edge("coordinator", END)
+    
+    return workflow.compile()
 
 
 class DischargeWorkflow:
@@ -32,91 +83,53 @@ class DischargeWorkflow:
         self.bed_agent = BedManagementAgent(api_key)
         self.lab_agent = LabAgent(api_key)
         self.coordinator = CoordinatorAgent(api_key)
+        self.agents = (
+            self.insurance_agent,
+            self.pharmacy_agent,
+            self.ambulance_agent,
+            self.bed_agent,
+            self.lab_agent
+        )
         
-        # Build workflow graph
-        self.workflow = self._build_workflow()
+        # Compiled graph, shared by every workflow instance
+        self.workflow = _compiled_graph()
     
-    def _build_workflow(self) -> StateGraph:
-        """Build the LangGraph workflow"""
-        
-        # Create workflow graph
-        workflow = StateGraph(DischargeState)
-        
-        # Add agent nodes
-        workflow.add_node("insurance", self._run_insurance_agent)
-        workflow.add_node("pharmacy", self._run_pharmacy_agent)
-        workflow.add_node("ambulance", self._run_ambulance_agent)
-        workflow.add_node("bed", self._run_bed_agent)
-        workflow.add_node("lab", self._run_lab_agent)
-        workflow.add_node("coordinator", self._run_coordinator)
-        
-        # Set entry point (all agents run in parallel)
-        workflow.set_entry_point("insurance")
-        workflow.add_edge("insurance", "pharmacy")
-        workflow.add_edge("pharmacy", "ambulance")
-        workflow.add_edge("ambulance", "bed")
-        workflow.add_edge("bed", "lab")
-        workflow.add_edge("lab", "coordinator")
-        workflow.add_edge("coordinator", END)
-        
-        return workflow.compile()
-    
-    def _run_insurance_agent(self, state: DischargeState) -> Dict[str, Any]:
-        """Run insurance verification agent"""
-        print("🏥 Running Insurance Agent...")
-        output = self.insurance_agent.verify(state["patient_id"])
-        return {
-            "insurance_output": self.insurance_agent.to_dict(output)
-        }
-    
-    def _run_pharmacy_agent(self, state: DischargeState) -> Dict[str, Any]:
-        """Run pharmacy verification agent"""
-        print("💊 Running Pharmacy Agent...")
-        output = self.pharmacy_agent.verify(state["patient_id"])
-        return {
-            "pharmacy_output": self.pharmacy_agent.to_dict(output)
-        }
-    
-    def _run_ambulance_agent(self, state: DischargeState) -> Dict[str, Any]:
-        """Run ambulance verification agent"""
-        print("🚑 Running Ambulance Agent...")
-        output = self.ambulance_agent.verify(state["patient_id"])
-        return {
-            "ambulance_output": self.ambulance_agent.to_dict(output)
-        }
-    
-    def _run_bed_agent(self, state: DischargeState) -> Dict[str, Any]:
-        """Run bed management verification agent"""
-        print("🛏️  Running Bed Management Agent...")
-        output = self.bed_agent.verify(state["patient_id"])
-        return {
-            "bed_output": self.bed_agent.to_dict(output)
-        }
-    
-    def _run_lab_agent(self, state: DischargeState) -> Dict[str, Any]:
-        """Run lab verification agent"""
-        print("🔬 Running Lab Agent...")
-        output = self.lab_agent.verify(state["patient_id"])
+    async def _run_agents(self, state: DischargeState, config: RunnableConfig) -> Dict[str, Any]:
+        """
+        Run every verification agent concurrently.
+        
+        Agents with an output in the run's "precomputed" configurable are skipped;
+        the Insurance and Lab agents read from its "batch_client" when set.
+        """
+        patient_id = state["patient_id"]
+        configurable = config.get("configurable", {})
+        
+        outputs = dict(configurable.get("precomputed") or {})
+        pending = [agent for agent in self.agents if agent.agent_name not in outputs]
+        logger.info("Running %d agents concurrently for patient %s", len(pending), patient_id)
+        outputs.update(await run_all_agents(
+            pending, patient_id, batch_client=configurable.get("batch_client")
+        ))
         return {
-            "lab_output": self.lab_agent.to_dict(output)
+            key: agent.to_dict(outputs[agent.agent_name])
+            for agent, (_, key) in zip(self.agents, _AGENT_STATE_KEYS)
         }
     
-    def _run_coordinator(self, state: DischargeState) -> Dict[str, Any]:
+    async def _run_coordinator(self, state: DischargeState) -> Dict[str, Any]:
         """Run coordinator to make final decision"""
-        print("🎯 Running Coordinator Agent...")
-        
-        # Gather all agent outputs
-        agent_outputs = {
-            "Insurance": state["insurance_output"],
-            "Pharmacy": state["pharmacy_output"],
-            "Ambulance": state["ambulance_output"],
-            "Bed Management": state["bed_output"],
-            "Lab": state["lab_output"]
-        }
+        logger.info("Running coordinator for patient %s", state["patient_id"])
         
         # Coordinate and make decision
-        decision = self.coordinator.coordinate(state["patient_id"], agent_outputs)
+        decision = await self.coordinator.acoordinate(state["patient_id"], self._agent_outputs(state))
         
+        return self._decision_update(decision)
+    
+    def _agent_outputs(self, state: DischargeState) -> Dict[str, Dict[str, Any]]:
+        """Gather all agent outputs from the state, keyed by agent name"""
+        return {name: state[key] for name, key in _AGENT_STATE_KEYS}
+    
+    def _decision_update(self, decision: CoordinatorDecisionSchema) -> Dict[str, Any]:
+        """State fields set from the coordinator's decision"""
         return {
             "all_agents_complete": True,
             "final_decision": decision.final_decision,
@@ -130,38 +143,133 @@ class DischargeWorkflow:
             "files_written": decision.files_written
         }
     
+    def _prepare_batch(self, patient_id: str) -> BatchedGeminiClient:
+        """
+        Send the Insurance and Lab prompts to Gemini as one batched request.
+        
+        An agent whose rule checks already decide (build_prompt() returns None)
+        is left out, so no tokens are spent on an answer it would discard.
+        
+        Args:
+            patient_id: Patient identifier
+            
+        Returns:
+            Flushed batch client the agents read their results from
+        """
+        batch_client = BatchedGeminiClient(self.insurance_agent.model)
+        for agent in (self.insurance_agent, self.lab_agent):
+            prompt = agent.build_prompt(patient_id)
+            if prompt is not None:
+                batch_client.enqueue(agent.agent_name, prompt)
+        batch_client.flush()
+        return batch_client
+    
     def run(self, patient_id: str) -> DischargeState:
         """
         Execute the discharge workflow for a patient.
         
+        Synchronous wrapper around arun(); must not be called from a running event loop.
+        
         Args:
             patient_id: Patient identifier
             
         Returns:
             Final workflow state
         """
-        print(f"\n{'='*60}")
-        print(f"🏥 PATIENT DISCHARGE VERIFICATION WORKFLOW")
-        print(f"{'='*60}")
-        print(f"Patient ID: {patient_id}\n")
-        
-        # Create initial state
-        initial_state = create_initial_state(patient_id)
-        
-        # Run workflow
-        final_state = self.workflow.invoke(initial_state)
-        
-        print(f"\n{'='*60}")
-        print(f"✅ WORKFLOW COMPLETE")
-        print(f"{'='*60}")
-        print(f"Final Decision: {final_state['final_decision']}")
-        print(f"Approved: {final_state['approved']}")
-        print(f"Approved By: {', '.join(final_state['approved_by'])}")
-        if final_state['blocked_by']:
-            print(f"Blocked By: {', '.join(final_state['blocked_by'])}")
-        print(f"\nFiles Written:")
-        for file in final_state['files_written']:
-            print(f"  - {file}")
-        print(f"{'='*60}\n")
+        return asyncio.run(self.arun(patient_id))
+    
+    async def arun(self, patient_id: str, precomputed: Dict[str, Any] = None) -> DischargeState:
+        """
+        Execute the discharge workflow with all agents verifying concurrently.
+        
+        The agents' Gemini calls are awaited together, so the agent phase takes
+        as long as the slowest agent rather than the sum. The coordinator then
+        runs on the combined outputs.
+        
+        Args:
+            patient_id: Patient identifier
+            precomputed: Outputs already produced for this patient, keyed by agent
+                name (e.g., from a batched verification); those agents are skipped
+            
+        Returns:
+            Final workflow state
+        """
+        logger.info("Starting discharge verification workflow for patient %s", patient_id)
+        
+        batch_client = None
+        if Config.GEMINI_BATCH_CALLS and self.insurance_agent.model is not None:
+            batch_client = await asyncio.to_thread(self._prepare_batch, patient_id)
+        
+        # Per-run inputs travel in the run config rather than on the workflow,
+        # which is shared between concurrent runs
+        final_state = await self.workflow.ainvoke(
+            create_initial_state(patient_id),
+            config={"configurable": {
+                "workflow": self,
+                "precomputed": precomputed,
+                "batch_client": batch_client
+            }}
+        )
+        
+        self._log_summary(final_state)
         
         return final_state
+    
+    def run_batch(self, patient_ids: List[str], concurrency: int = None) -> List[DischargeState]:
+        """
+        Execute the discharge workflow for several patients.
+        
+        Synchronous wrapper around arun_batch(); must not be called from a running event loop.
+        
+        Args:
+            patient_ids: Patient identifiers
+            concurrency: Most workflows in flight at once (default: Config.GEMINI_CONCURRENCY)
+            
+        Returns:
+            Final workflow states, in patient_ids order
+        """
+        return asyncio.run(self.arun_batch(patient_ids, concurrency))
+    
+    async def arun_batch(
+        self,
+        patient_ids: List[str],
+        concurrency: int = None,
+        precomputed: Dict[str, Dict[str, Any]] = None
+    ) -> List[DischargeState]:
+        """
+        Execute the discharge workflow for several patients concurrently.
+        
+        Each patient runs through arun(); at most `concurrency` workflows are in
+        flight at once, and their Gemini calls share the process-wide limit of
+        utils.gemini_client.async_slot().
+        
+        Args:
+            patient_ids: Patient identifiers
+            concurrency: Most workflows in flight at once (default: Config.GEMINI_CONCURRENCY)
+            precomputed: Per patient ID, outputs already produced for that patient
+                keyed by agent name (passed to arun())
+            
+        Returns:
+            Final workflow states, in patient_ids order
+        """
+        semaphore = asyncio.Semaphore(concurrency or Config.GEMINI_CONCURRENCY)
+        precomputed = precomputed or {}
+        
+        async def _one(patient_id: str) -> DischargeState:
+            async with semaphore:
+                return await self.arun(patient_id, precomputed=precomputed.get(patient_id))
+        
+        return list(await asyncio.gather(*(_one(patient_id) for patient_id in patient_ids)))
+    
+    def _log_summary(self, final_state: DischargeState):
+        """Log the final decision of a workflow run as one record, so concurrent runs never interleave"""
+        logger.info(
+            "Workflow complete for patient %s: %s (approved: %s; approved by: %s; blocked by: %s; %d files written)",
+            final_state["patient_id"],
+            final_state["final_decision"],
+            final_state["approved"],
+            ", ".join(final_state["approved_by"]) or "none",
+            ", ".join(final_state["blocked_by"]) or "none",
+            len(final_state["files_written"])
+        )
+        logger.debug("Files written: %s", ", ".join(final_state["files_written"]))
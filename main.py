@@ -5,11 +5,45 @@ Main entry point for the multi-agent discharge verification workflow.
 """
 
 import sys
-import json
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from config import Config
 from coordinator.workflow import DischargeWorkflow
+from utils.gemini_client import configure, warmup
+from utils.file_utils import loads_json, write_json_file
+from utils.logging_utils import configure_logging
+
+
+logger = logging.getLogger(__name__)
+
+# Issue sections printed in the decision summary: (severity, icon, show message)
+_SEVERITY_SECTIONS = (
+    ("critical", "🔴", True),
+    ("high", "🟠", True),
+    ("medium", "🟡", False),
+    ("low", "🟢", False),
+)
+
+# Escalation alert priority icons
+_PRIORITY_ICONS = {
+    "urgent": "🔴",
+    "high": "🟠",
+    "normal": "🟡",
+    "low": "🟢"
+}
+
+# Escalation department icons
+_DEPT_ICONS = {
+    "Lab Portal": "🔬",
+    "Pharmacy Portal": "💊",
+    "Billing Portal": "💰",
+    "Transport Services": "🚑",
+    "Insurance Desk": "📋",
+    "General Operations": "⚙️"
+}
 
 
 def print_banner():
@@ -23,113 +57,84 @@ def print_banner():
 
 def print_decision_summary(final_state):
     """Print formatted decision summary"""
-    print("\n" + "="*70)
-    print("📋 DISCHARGE DECISION SUMMARY")
-    print("="*70)
+    # Collected and printed with one write instead of one per line
+    lines = []
+    lines.append("\n" + "="*70)
+    lines.append("📋 DISCHARGE DECISION SUMMARY")
+    lines.append("="*70)
     
-    print(f"\n🆔 Patient ID: {final_state['patient_id']}")
-    print(f"⏰ Timestamp: {final_state['timestamp']}")
+    lines.append(f"\n🆔 Patient ID: {final_state['patient_id']}")
+    lines.append(f"⏰ Timestamp: {final_state['timestamp']}")
     
-    print(f"\n🎯 Final Decision: {final_state['final_decision']}")
-    print(f"✅ Approved: {'YES' if final_state['approved'] else 'NO'}")
+    lines.append(f"\n🎯 Final Decision: {final_state['final_decision']}")
+    lines.append(f"✅ Approved: {'YES' if final_state['approved'] else 'NO'}")
     
     if final_state['approved_by']:
-        print(f"\n✓ Approved By:")
+        lines.append(f"\n✓ Approved By:")
         for agent in final_state['approved_by']:
-            print(f"  • {agent}")
+            lines.append(f"  • {agent}")
     
     if final_state['blocked_by']:
-        print(f"\n✗ Blocked By:")
+        lines.append(f"\n✗ Blocked By:")
         for agent in final_state['blocked_by']:
-            print(f"  • {agent}")
+            lines.append(f"  • {agent}")
     
     # Print issues
     if final_state['aggregated_issues']:
-        print(f"\n⚠️  Issues Found ({len(final_state['aggregated_issues'])}):")
-        
-        # Group by severity
-        critical = [i for i in final_state['aggregated_issues'] if i.get('severity') == 'critical']
-        high = [i for i in final_state['aggregated_issues'] if i.get('severity') == 'high']
-        medium = [i for i in final_state['aggregated_issues'] if i.get('severity') == 'medium']
-        low = [i for i in final_state['aggregated_issues'] if i.get('severity') == 'low']
-        
-        if critical:
-            print(f"\n  🔴 CRITICAL ({len(critical)}):")
-            for issue in critical:
-                print(f"    • [{issue.get('agent')}] {issue.get('title')}")
-                print(f"      {issue.get('message')}")
+        lines.append(f"\n⚠️  Issues Found ({len(final_state['aggregated_issues'])}):")
         
-        if high:
-            print(f"\n  🟠 HIGH ({len(high)}):")
-            for issue in high:
-                print(f"    • [{issue.get('agent')}] {issue.get('title')}")
-                print(f"      {issue.get('message')}")
+        # Group by severity in one pass
+        by_severity = defaultdict(list)
+        for issue in final_state['aggregated_issues']:
+            by_severity[issue.get('severity')].append(issue)
         
-        if medium:
-            print(f"\n  🟡 MEDIUM ({len(medium)}):")
-            for issue in medium:
-                print(f"    • [{issue.get('agent')}] {issue.get('title')}")
-        
-        if low:
-            print(f"\n  🟢 LOW ({len(low)}):")
-            for issue in low:
-                print(f"    • [{issue.get('agent')}] {issue.get('title')}")
+        for severity, icon, show_message in _SEVERITY_SECTIONS:
+            issues = by_severity.get(severity)
+            if not issues:
+                continue
+            lines.append(f"\n  {icon} {severity.upper()} ({len(issues)}):")
+            for issue in issues:
+                lines.append(f"    • [{issue.get('agent')}] {issue.get('title')}")
+                if show_message:
+                    lines.append(f"      {issue.get('message')}")
     
     # Print discharge summary
     if final_state.get('discharge_summary'):
-        print(f"\n📄 Discharge Summary:")
-        print(f"\n  Patient/Family Summary:")
-        print(f"  {final_state['discharge_summary'].get('plain_text', 'N/A')}")
+        lines.append(f"\n📄 Discharge Summary:")
+        lines.append(f"\n  Patient/Family Summary:")
+        lines.append(f"  {final_state['discharge_summary'].get('plain_text', 'N/A')}")
         
-        print(f"\n  Medical Record Summary:")
-        print(f"  {final_state['discharge_summary'].get('for_medical_record', 'N/A')}")
+        lines.append(f"\n  Medical Record Summary:")
+        lines.append(f"  {final_state['discharge_summary'].get('for_medical_record', 'N/A')}")
     
     # Print auto-resolutions
     if final_state.get('suggested_auto_resolutions'):
-        print(f"\n🔧 Suggested Auto-Resolutions ({len(final_state['suggested_auto_resolutions'])}):")
+        lines.append(f"\n🔧 Suggested Auto-Resolutions ({len(final_state['suggested_auto_resolutions'])}):")
         for i, resolution in enumerate(final_state['suggested_auto_resolutions'], 1):
-            print(f"  {i}. {resolution.get('action')}")
+            lines.append(f"  {i}. {resolution.get('action')}")
     
     # Print output files
     if final_state.get('files_written'):
-        print(f"\n💾 Output Files:")
+        lines.append(f"\n💾 Output Files:")
         for file in final_state['files_written']:
-            print(f"  • {file}")
+            lines.append(f"  • {file}")
     
-    print("\n" + "="*70 + "\n")
+    lines.append("\n" + "="*70 + "\n")
+    print("\n".join(lines))
 
 
 def print_escalations(patient_id):
     """Print escalation alerts in a beautiful format"""
-    import os
-    from pathlib import Path
-    
+    # Collected and printed with one write instead of one per line
+    lines = []
     escalations_dir = Path("escalations") / f"patient_{patient_id}"
     
     if not escalations_dir.exists():
         return
     
-    print("\n" + "="*70)
-    print("🚨 DEPARTMENT ESCALATION ALERTS")
-    print("="*70)
-    
-    # Priority icons
-    priority_icons = {
-        "urgent": "🔴",
-        "high": "🟠",
-        "normal": "🟡",
-        "low": "🟢"
-    }
-    
-    # Department icons
-    dept_icons = {
-        "Lab Portal": "🔬",
-        "Pharmacy Portal": "💊",
-        "Billing Portal": "💰",
-        "Transport Services": "🚑",
-        "Insurance Desk": "📋",
-        "General Operations": "⚙️"
-    }
+    lines.append("\n" + "="*70)
+    lines.append("🚨 DEPARTMENT ESCALATION ALERTS")
+    lines.append("="*70)
     
     # Read and display each department alert file
     alert_files = sorted(escalations_dir.glob("*.json"))
@@ -142,8 +147,7 @@ def print_escalations(patient_id):
             continue  # Skip patient notifications for now
         
         try:
-            with open(alert_file, 'r', encoding='utf-8') as f:
-                dept_data = json.load(f)
+            dept_data = loads_json(alert_file.read_bytes())
             
             department = dept_data.get("department", "Unknown")
             alerts = dept_data.get("alerts", [])
@@ -154,13 +158,13 @@ def print_escalations(patient_id):
                 continue
             
             # Print department header
-            dept_icon = dept_icons.get(department, "📌")
-            priority_icon = priority_icons.get(highest_priority, "⚪")
+            dept_icon = _DEPT_ICONS.get(department, "📌")
+            priority_icon = _PRIORITY_ICONS.get(highest_priority, "⚪")
             
-            print(f"\n{dept_icon} {department.upper()} {priority_icon}")
-            print("─" * 70)
-            print(f"Total Alerts: {total} | Highest Priority: {highest_priority.upper()}")
-            print()
+            lines.append(f"\n{dept_icon} {department.upper()} {priority_icon}")
+            lines.append("─" * 70)
+            lines.append(f"Total Alerts: {total} | Highest Priority: {highest_priority.upper()}")
+            lines.append("")
             
             # Print each alert
             for i, alert in enumerate(alerts, 1):
@@ -170,86 +174,83 @@ def print_escalations(patient_id):
                 action = alert.get("suggested_action", "")
                 alert_id = alert.get("alert_id", "")
                 
-                print(f"  {priority_icons.get(priority, '⚪')} Alert #{i}: {title}")
-                print(f"     ID: {alert_id}")
-                print(f"     Priority: {priority.upper()}")
+                lines.append(f"  {_PRIORITY_ICONS.get(priority, '⚪')} Alert #{i}: {title}")
+                lines.append(f"     ID: {alert_id}")
+                lines.append(f"     Priority: {priority.upper()}")
                 
-                # Wrap message to fit terminal width
                 if message:
-                    import textwrap
-                    wrapped_msg = textwrap.fill(message, width=65, initial_indent="     ", subsequent_indent="     ")
-                    print(f"     Issue: {message[:100]}{'...' if len(message) > 100 else ''}")
+                    lines.append(f"     Issue: {message[:100]}{'...' if len(message) > 100 else ''}")
                 
                 if action:
-                    print(f"     ✓ Action: {action[:80]}{'...' if len(action) > 80 else ''}")
+                    lines.append(f"     ✓ Action: {action[:80]}{'...' if len(action) > 80 else ''}")
                 
-                print()
+                lines.append("")
         
         except Exception as e:
-            print(f"  ⚠️  Error reading {alert_file.name}: {e}")
+            lines.append(f"  ⚠️  Error reading {alert_file.name}: {e}")
     
     # Print patient notifications if they exist
     patient_notif_file = escalations_dir / "patient_notifications.json"
     if patient_notif_file.exists():
         try:
-            with open(patient_notif_file, 'r', encoding='utf-8') as f:
-                notif_data = json.load(f)
+            notif_data = loads_json(patient_notif_file.read_bytes())
             
             notifications = notif_data.get("notifications", [])
             
             if notifications:
-                print(f"\n👤 PATIENT/FAMILY NOTIFICATIONS")
-                print("─" * 70)
-                print(f"Total Notifications: {len(notifications)}")
-                print()
+                lines.append(f"\n👤 PATIENT/FAMILY NOTIFICATIONS")
+                lines.append("─" * 70)
+                lines.append(f"Total Notifications: {len(notifications)}")
+                lines.append("")
                 
                 for i, notif in enumerate(notifications, 1):
                     priority = notif.get("priority", "normal")
                     title = notif.get("title", "")
                     message = notif.get("message", "")
                     
-                    print(f"  {priority_icons.get(priority, '⚪')} Notification #{i}: {title}")
-                    print(f"     {message}")
-                    print()
+                    lines.append(f"  {_PRIORITY_ICONS.get(priority, '⚪')} Notification #{i}: {title}")
+                    lines.append(f"     {message}")
+                    lines.append("")
         
         except Exception as e:
-            print(f"  ⚠️  Error reading patient notifications: {e}")
+            lines.append(f"  ⚠️  Error reading patient notifications: {e}")
     
     # Print escalation summary
     summary_file = escalations_dir / f"escalation_summary_{patient_id}.json"
     if summary_file.exists():
         try:
-            with open(summary_file, 'r', encoding='utf-8') as f:
-                summary = json.load(f)
+            summary = loads_json(summary_file.read_bytes())
             
-            print(f"\n📊 ESCALATION SUMMARY")
-            print("─" * 70)
-            print(f"Total Alerts: {summary.get('total_alerts', 0)}")
-            print(f"Departments Involved: {', '.join(summary.get('departments_involved', []))}")
+            lines.append(f"\n📊 ESCALATION SUMMARY")
+            lines.append("─" * 70)
+            lines.append(f"Total Alerts: {summary.get('total_alerts', 0)}")
+            lines.append(f"Departments Involved: {', '.join(summary.get('departments_involved', []))}")
             
             alerts_by_priority = summary.get('alerts_by_priority', {})
             if alerts_by_priority:
-                print(f"\nAlerts by Priority:")
+                lines.append(f"\nAlerts by Priority:")
                 for priority in ["urgent", "high", "normal", "low"]:
                     count = alerts_by_priority.get(priority, 0)
                     if count > 0:
-                        print(f"  {priority_icons.get(priority, '⚪')} {priority.upper()}: {count}")
+                        lines.append(f"  {_PRIORITY_ICONS.get(priority, '⚪')} {priority.upper()}: {count}")
             
             dept_summary = summary.get('department_summary', {})
             if dept_summary:
-                print(f"\nAlerts by Department:")
+                lines.append(f"\nAlerts by Department:")
                 for dept, count in dept_summary.items():
-                    dept_icon = dept_icons.get(dept, "📌")
-                    print(f"  {dept_icon} {dept}: {count}")
+                    dept_icon = _DEPT_ICONS.get(dept, "📌")
+                    lines.append(f"  {dept_icon} {dept}: {count}")
         
         except Exception as e:
-            print(f"  ⚠️  Error reading escalation summary: {e}")
+            lines.append(f"  ⚠️  Error reading escalation summary: {e}")
     
-    print("\n" + "="*70 + "\n")
+    lines.append("\n" + "="*70 + "\n")
+    print("\n".join(lines))
 
 
 def main():
     """Main application entry point"""
+    configure_logging("  %(levelname)s %(name)s: %(message)s")
     print_banner()
     
     # Validate configuration
@@ -262,6 +263,11 @@ def main():
         print("GEMINI_API_KEY=your_api_key_here")
         sys.exit(1)
     
+    # Open the Gemini connection while the workflow is set up
+    if not Config.OFFLINE_MODE:
+        configure(Config.GEMINI_API_KEY)
+        warmup(Config.GEMINI_MODEL)
+    
     # Get patient ID (default to P00231 from patient_data.json)
     patient_id = sys.argv[1] if len(sys.argv) > 1 else "P00231"
     
@@ -275,23 +281,25 @@ def main():
         # Run workflow
         final_state = workflow.run(patient_id)
         
-        # Print summary
-        print_decision_summary(final_state)
-        
-        # Print escalation alerts
-        print_escalations(patient_id)
-        
-        # Save final state to JSON for easy viewing
+        # Save final state to JSON for easy viewing, in the background while
+        # the summary and escalations print
         output_file = Path("output") / f"final_decision_{patient_id}.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # Convert to serializable format
-            serializable_state = {
-                k: v for k, v in final_state.items()
-                if k not in ['__pydantic_extra__', '__pydantic_fields_set__']
-            }
-            json.dump(serializable_state, f, indent=2, ensure_ascii=False)
-        
-        print(f"💾 Full decision saved to: {output_file}")
+        # Convert to serializable format
+        serializable_state = {
+            k: v for k, v in final_state.items()
+            if k not in ['__pydantic_extra__', '__pydantic_fields_set__']
+        }
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            saved = executor.submit(write_json_file, output_file, serializable_state)
+            
+            # Print summary
+            print_decision_summary(final_state)
+            
+            # Print escalation alerts
+            print_escalations(patient_id)
+            
+            if saved.result():
+                print(f"💾 Full decision saved to: {output_file}")
         
         # Exit code based on decision
         if final_state['approved']:
@@ -303,8 +311,7 @@ def main():
             
     except Exception as e:
         print(f"\n❌ Error during workflow execution: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Workflow failed for patient %s", patient_id)
         sys.exit(1)
 
 
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional, Literal
 from datetime import datetime
+from enum import Enum
 
 
 class IssueSchema(BaseModel):
@@ -58,3 +59,52 @@ class EscalationAlert(BaseModel):
     data: Dict[str, Any] = Field(default_factory=dict, description="Additional data for the issue")
     escalated_at: str = Field(..., description="ISO8601 timestamp when escalated")
     status: Literal["pending", "acknowledged", "in_progress", "resolved"] = Field(default="pending", description="Current status of the alert")
+
+
+class Severity(str, Enum):
+    """Issue severity levels, as an enum so Gemini response schemas can constrain them"""
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+    CRITICAL = "critical"
+
+
+class GeminiIssue(BaseModel):
+    """Issue as returned by Gemini (structured output schema, so no defaults or free-form dicts)"""
+    code: str = Field(..., description="Issue code from the prompt's list of issue codes")
+    title: str = Field(..., description="Short title of the issue")
+    severity: Severity = Field(..., description="Issue severity level")
+    message: str = Field(..., description="Human-readable explanation of the issue")
+    suggested_action: str = Field(..., description="What the coordinator/staff should do")
+    evidence: List[str] = Field(..., description="File paths or snippets supporting the issue")
+
+
+class GeminiVerificationResponse(BaseModel):
+    """Base Gemini response schema for agent verification; subclasses add a typed raw_data"""
+    noc: bool = Field(..., description="Whether the agent grants its No Objection Certificate")
+    confidence: float = Field(..., description="Confidence score from 0.0 to 1.0")
+    issues: List[GeminiIssue] = Field(..., description="List of issues found")
+
+
+class InsuranceRawData(BaseModel):
+    """Insurance findings returned alongside the verdict"""
+    policy_status: str = Field(..., description="Policy status from the insurer records")
+    preauth_status: str = Field(..., description="Status of the pre-authorization for this admission")
+    coverage_sufficient: bool = Field(..., description="Whether remaining coverage covers the bill")
+
+
+class InsuranceGeminiResponse(GeminiVerificationResponse):
+    """Gemini response schema for the Insurance agent"""
+    raw_data: InsuranceRawData = Field(..., description="Insurance verification details")
+
+
+class LabRawData(BaseModel):
+    """Lab findings returned alongside the verdict"""
+    pending_tests: List[str] = Field(..., description="Required tests not yet completed")
+    critical_values: List[str] = Field(..., description="Components with critical values")
+    all_tests_complete: bool = Field(..., description="Whether every required test is complete")
+
+
+class LabGeminiResponse(GeminiVerificationResponse):
+    """Gemini response schema for the Lab agent"""
+    raw_data: LabRawData = Field(..., description="Lab verification details")
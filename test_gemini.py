@@ -3,7 +3,6 @@
 Simple test to verify Gemini API is working
 """
 
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 
@@ -17,6 +16,9 @@ if not api_key:
     print("ERROR: No API key found")
     exit(1)
 
+# Imported after the key check so a missing key is reported without loading the SDK
+import google.generativeai as genai
+
 genai.configure(api_key=api_key)
 model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
@@ -0,0 +1,112 @@
+"""Tests for the JSON Lines audit log and its migration from JSON array logs."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from coordinator.state_manager import StateManager
+from utils.file_utils import append_to_json_log, migrate_json_log, read_jsonl
+
+
+def _write_text(path: str, text: str):
+    """Write a fixture file"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+class _TempDirTest(unittest.TestCase):
+    
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = self._tmp.name
+        self.json_path = os.path.join(self.tmp, "log.json")
+        self.jsonl_path = os.path.join(self.tmp, "log.jsonl")
+
+
+class MigrateJsonLogTest(_TempDirTest):
+    
+    LEGACY = [{"n": 1, "note": "ü"}, {"n": 2}]
+    
+    def test_legacy_entries_go_before_existing_ones(self):
+        _write_text(self.json_path, json.dumps(self.LEGACY))
+        _write_text(self.jsonl_path, '{"n": 3}\n')
+        
+        self.assertTrue(migrate_json_log(self.json_path, self.jsonl_path))
+        self.assertEqual(read_jsonl(self.jsonl_path), self.LEGACY + [{"n": 3}])
+    
+    def test_legacy_file_is_removed_without_leftovers(self):
+        _write_text(self.json_path, json.dumps(self.LEGACY))
+        
+        migrate_json_log(self.json_path, self.jsonl_path)
+        
+        self.assertEqual(os.listdir(self.tmp), ["log.jsonl"])
+    
+    def test_missing_legacy_file_is_not_migrated(self):
+        self.assertFalse(migrate_json_log(self.json_path, self.jsonl_path))
+        self.assertFalse(os.path.exists(self.jsonl_path))
+    
+    def test_unreadable_legacy_file_is_kept(self):
+        _write_text(self.json_path, '[{"n": 1}, {"n"')
+        _write_text(self.jsonl_path, '{"n": 3}\n')
+        
+        with self.assertLogs("utils.file_utils", "WARNING"):
+            self.assertFalse(migrate_json_log(self.json_path, self.jsonl_path))
+        
+        self.assertTrue(os.path.exists(self.json_path))
+        self.assertEqual(read_jsonl(self.jsonl_path), [{"n": 3}])
+
+
+class ReadJsonlTest(_TempDirTest):
+    
+    def test_blank_and_malformed_lines_are_skipped(self):
+        _write_text(self.jsonl_path, '{"n": 1}\n\n   \n{"n": 2, "cut\n{"n": 3}\n')
+        self.assertEqual(read_jsonl(self.jsonl_path), [{"n": 1}, {"n": 3}])
+    
+    def test_missing_log_reads_as_empty(self):
+        self.assertEqual(read_jsonl(self.jsonl_path), [])
+
+
+class AppendToJsonLogTest(_TempDirTest):
+    
+    def test_jsonl_path_appends_one_line_per_entry(self):
+        self.assertTrue(append_to_json_log(self.jsonl_path, {"n": 1}))
+        self.assertTrue(append_to_json_log(self.jsonl_path, {"n": 2}))
+        
+        with open(self.jsonl_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{"n": 1}, {"n": 2}])
+    
+    def test_json_path_keeps_a_json_array(self):
+        append_to_json_log(self.json_path, {"n": 1})
+        append_to_json_log(self.json_path, {"n": 2})
+        
+        with open(self.json_path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), [{"n": 1}, {"n": 2}])
+
+
+class StateManagerAuditLogTest(_TempDirTest):
+    
+    def test_legacy_audit_log_survives_first_append(self):
+        old_entry = {"timestamp": "2024-01-01T00:00:00", "patient_id": "P1", "final_decision": "HOLD"}
+        _write_text(os.path.join(self.tmp, "discharge_audit_log_P1.json"), json.dumps([old_entry]))
+        
+        manager = StateManager(output_dir=self.tmp)
+        manager.append_audit_log("P1", "APPROVE", [], [], now="2024-01-02T00:00:00")
+        
+        decisions = [entry["final_decision"] for entry in manager.load_audit_log("P1")]
+        self.assertEqual(decisions, ["HOLD", "APPROVE"])
+        self.assertEqual(os.listdir(self.tmp), ["discharge_audit_log_P1.jsonl"])
+
+    def test_cached_decision_is_flagged(self):
+        manager = StateManager(output_dir=self.tmp)
+        manager.append_audit_log("P1", "HOLD", [], [], now="2024-01-01T00:00:00")
+        manager.append_audit_log("P1", "HOLD", [], [], now="2024-01-01T00:01:00", served_from_cache=True)
+
+        flags = [entry.get("served_from_cache") for entry in manager.load_audit_log("P1")]
+        self.assertEqual(flags, [None, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
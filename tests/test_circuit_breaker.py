@@ -0,0 +1,72 @@
+"""Tests for the Gemini circuit breaker and the streaming helper it guards."""
+
+import time
+import unittest
+
+from agents.base_agent import stream_content
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, GEMINI_BREAKER
+
+
+class _FailingModel:
+    """Model stub whose calls always fail, counting attempts"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def generate_content(self, contents, **kwargs):
+        self.calls += 1
+        raise ConnectionError("Gemini unavailable")
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.breaker = CircuitBreaker("Test", failure_threshold=2, cooldown_s=0.05)
+    
+    def test_stays_closed_below_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.check()
+    
+    def test_opens_at_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+    
+    def test_lets_a_call_through_after_cooldown(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.06)
+        self.breaker.check()
+        
+        # A failed trial call reopens the circuit straight away
+        self.breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+    
+    def test_success_closes_and_resets(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.check()
+        self.assertEqual(self.breaker.fail_count, 0)
+
+
+class StreamContentBreakerTest(unittest.TestCase):
+    
+    def tearDown(self):
+        GEMINI_BREAKER.record_success()
+    
+    def test_open_circuit_skips_the_api(self):
+        model = _FailingModel()
+        for _ in range(GEMINI_BREAKER.failure_threshold):
+            with self.assertRaises(ConnectionError):
+                stream_content(model, "prompt")
+        
+        with self.assertRaises(CircuitOpenError):
+            stream_content(model, "prompt")
+        self.assertEqual(model.calls, GEMINI_BREAKER.failure_threshold)
+
+
+if __name__ == "__main__":
+    unittest.main()
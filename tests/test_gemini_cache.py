@@ -0,0 +1,102 @@
+"""Tests for the prompt-keyed Gemini response cache."""
+
+import unittest
+import uuid
+
+from agents.base_agent import BaseAgent
+from utils.gemini_cache import prompt_key, get_cached_response
+
+_JSON_CONFIG = {"response_mime_type": "application/json"}
+
+
+class _Chunk:
+    """Streamed response chunk stub"""
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class _Model:
+    """Model stub streaming a fixed response, counting calls"""
+    
+    def __init__(self, response_text: str):
+        self.response_text = response_text
+        self.calls = 0
+    
+    def generate_content(self, contents, **kwargs):
+        self.calls += 1
+        return iter([_Chunk(self.response_text)])
+
+
+class _Agent(BaseAgent):
+    
+    def __init__(self, model):
+        super().__init__("CacheTest")
+        self.model = model
+    
+    def verify(self, patient_id: str, **kwargs):
+        raise NotImplementedError
+
+
+def _unique_prompt() -> str:
+    """Prompt no other test has cached"""
+    return f"prompt {uuid.uuid4()}"
+
+
+class PromptKeyTest(unittest.TestCase):
+    
+    def test_same_prompt_same_key(self):
+        self.assertEqual(prompt_key("same prompt"), prompt_key("same prompt"))
+    
+    def test_different_prompts_different_keys(self):
+        self.assertNotEqual(prompt_key("prompt a"), prompt_key("prompt b"))
+
+
+class GenerateContentCacheTest(unittest.TestCase):
+    
+    def test_repeat_prompt_is_served_from_cache(self):
+        model = _Model('{"noc": true, "confidence": 0.9, "issues": []}')
+        agent = _Agent(model)
+        prompt = _unique_prompt()
+        
+        first = agent._generate_content(prompt, _JSON_CONFIG, validate=agent._check_verification)
+        second = agent._generate_content(prompt, _JSON_CONFIG, validate=agent._check_verification)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(model.calls, 1)
+    
+    def test_invalid_response_is_returned_but_not_cached(self):
+        model = _Model('{"noc": true, "confid')
+        agent = _Agent(model)
+        prompt = _unique_prompt()
+        
+        text = agent._generate_content(prompt, _JSON_CONFIG, validate=agent._check_verification)
+        agent._generate_content(prompt, _JSON_CONFIG, validate=agent._check_verification)
+        
+        self.assertEqual(text, '{"noc": true, "confid')
+        self.assertEqual(model.calls, 2)
+        self.assertIsNone(get_cached_response(prompt_key(prompt)))
+    
+    def test_json_mode_rejects_non_object_by_default(self):
+        model = _Model('["not", "an", "object"]')
+        agent = _Agent(model)
+        prompt = _unique_prompt()
+        
+        agent._generate_content(prompt, _JSON_CONFIG)
+        
+        self.assertIsNone(get_cached_response(prompt_key(prompt)))
+    
+    def test_use_cache_false_always_calls(self):
+        model = _Model('{"noc": true, "confidence": 0.9}')
+        agent = _Agent(model)
+        prompt = _unique_prompt()
+        
+        agent._generate_content(prompt, _JSON_CONFIG, use_cache=False)
+        agent._generate_content(prompt, _JSON_CONFIG, use_cache=False)
+        
+        self.assertEqual(model.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
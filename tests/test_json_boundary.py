@@ -0,0 +1,84 @@
+"""Tests for finding the end of a streamed JSON response."""
+
+import unittest
+
+from agents.base_agent import JsonBoundary, stream_content
+
+
+def _boundary_of(chunks):
+    """Feed chunks in order; return (chunk index, end index) where the value closes, or None"""
+    boundary = JsonBoundary()
+    for i, chunk in enumerate(chunks):
+        end = boundary.feed(chunk)
+        if end >= 0:
+            return i, end
+    return None
+
+
+class _Chunk:
+    """Streamed response chunk stub"""
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class _Model:
+    """Model stub streaming fixed chunks and counting how many were read"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+    
+    def generate_content(self, contents, **kwargs):
+        for chunk in self.chunks:
+            self.read += 1
+            yield _Chunk(chunk)
+
+
+class JsonBoundaryTest(unittest.TestCase):
+    
+    def test_single_chunk_with_trailing_text(self):
+        self.assertEqual(_boundary_of(['{"a": 1} trailing']), (0, 8))
+    
+    def test_value_split_across_chunks(self):
+        self.assertEqual(_boundary_of(['{"a": ', '[1, 2', ']}', ' x']), (2, 2))
+    
+    def test_braces_inside_strings_are_ignored(self):
+        self.assertEqual(_boundary_of(['{"s": "}{][", "t": "}"}']), (0, 23))
+    
+    def test_escaped_quote_does_not_end_string(self):
+        self.assertEqual(_boundary_of(['{"s": "a\\"}"} x']), (0, 13))
+    
+    def test_escape_split_across_chunks(self):
+        self.assertEqual(_boundary_of(['{"s": "a\\', '"}"', '} x']), (2, 1))
+    
+    def test_escaped_backslash_before_closing_quote(self):
+        self.assertEqual(_boundary_of(['{"s": "a\\\\"} x']), (0, 12))
+    
+    def test_nested_arrays(self):
+        self.assertEqual(_boundary_of(['[[1, [2]], {"k": [3]}] tail']), (0, 22))
+    
+    def test_leading_prose(self):
+        self.assertEqual(_boundary_of(['Here you go: {"a": {"b": 1}} done']), (0, 28))
+    
+    def test_unclosed_value(self):
+        self.assertIsNone(_boundary_of(['{"a": [1, 2', '], "b": "}"']))
+
+
+class StreamEarlyExitTest(unittest.TestCase):
+    
+    def test_json_mode_stops_at_closing_brace(self):
+        model = _Model(['{"noc": true, ', '"note": "}"}', ' trailing', ''])
+        text = stream_content(model, "prompt", {"response_mime_type": "application/json"})
+        self.assertEqual(text, '{"noc": true, "note": "}"}')
+        self.assertEqual(model.read, 2)
+    
+    def test_free_form_text_reads_whole_stream(self):
+        model = _Model(['free ', 'text', ''])
+        self.assertEqual(stream_content(model, "prompt"), "free text")
+        self.assertEqual(model.read, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
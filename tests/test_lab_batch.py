@@ -0,0 +1,57 @@
+"""Tests for the vectorized lab threshold check used by LabAgent.verify_batch()."""
+
+import time
+import unittest
+from unittest import mock
+
+from agents import lab_agent
+from agents.lab_agent import LabAgent, _critical_mask, _exceeds_critical_threshold
+
+_COMPONENTS = [
+    {"name": "Hemoglobin", "value": 6.5},
+    {"name": "Hemoglobin", "value": 7.0},
+    {"name": "Platelets", "value": 480},
+    {"name": "Platelets", "value": 40},
+    {"name": "WBC", "value": 12},
+    {"name": "RBC", "value": "low"},
+    {"name": "Sodium", "value": 1},
+    {"name": "RBC"},
+]
+
+
+class CriticalMaskTest(unittest.TestCase):
+    
+    def test_matches_per_component_check(self):
+        expected = [_exceeds_critical_threshold(component) for component in _COMPONENTS]
+        self.assertEqual(expected, [True, False, True, True, False, False, False, False])
+        self.assertEqual(_critical_mask(_COMPONENTS), expected)
+    
+    def test_matches_without_numpy(self):
+        with mock.patch.object(lab_agent, "np", None):
+            self.assertEqual(_critical_mask(_COMPONENTS), [True, False, True, True, False, False, False, False])
+    
+    def test_empty(self):
+        self.assertEqual(_critical_mask([]), [])
+
+
+
+class VerifyBatchTest(unittest.TestCase):
+    
+    def test_each_patient_is_timed_separately(self):
+        agent = LabAgent()
+        load_patient_data = agent.load_patient_data
+        
+        def slow_first_patient(patient_id=None):
+            if patient_id == "P00231":
+                time.sleep(0.05)
+            return load_patient_data(patient_id)
+        
+        with mock.patch.object(agent, "load_patient_data", slow_first_patient):
+            outputs = agent.verify_batch(["P00231", "NOPE"])
+        
+        self.assertGreaterEqual(outputs["P00231"].meta.time_ms, 50)
+        self.assertLess(outputs["NOPE"].meta.time_ms, 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests for PharmacyAgent.verify_batch()."""
+
+import json
+import time
+import unittest
+from unittest import mock
+
+from agents.pharmacy_agent import PharmacyAgent
+
+
+class _Chunk:
+    """Streamed response chunk stub"""
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class _BatchModel:
+    """Model stub answering every batched prompt with a fixed results list after a delay"""
+    
+    def __init__(self, results, delay_s: float):
+        self.response_text = json.dumps({"results": results})
+        self.delay_s = delay_s
+    
+    def generate_content(self, contents, **kwargs):
+        time.sleep(self.delay_s)
+        return iter([_Chunk(self.response_text)])
+
+
+class VerifyBatchTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.agent = PharmacyAgent()
+        load_patient_data = self.agent.load_patient_data
+        
+        # P00231 is blocked by the rule checks; make its reads slow
+        def slow_first_patient(patient_id=None):
+            if patient_id == "P00231":
+                time.sleep(0.05)
+            return load_patient_data(patient_id)
+        
+        patcher = mock.patch.object(self.agent, "load_patient_data", slow_first_patient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_rule_decided_patient_time_is_not_carried_over(self):
+        self.agent.model = None
+        outputs = self.agent.verify_batch(["P00231", "P00232"])
+        
+        self.assertGreaterEqual(outputs["P00231"].meta.time_ms, 50)
+        self.assertLess(outputs["P00232"].meta.time_ms, 40)
+    
+    def test_batched_patient_time_includes_the_call_it_waited_on(self):
+        self.agent.model = _BatchModel(
+            [{"patient_id": "P00232", "noc": True, "confidence": 0.9, "issues": [], "raw_data": {}}],
+            delay_s=0.02
+        )
+        outputs = self.agent.verify_batch(["P00231", "P00232"])
+        
+        self.assertTrue(outputs["P00232"].noc)
+        self.assertGreaterEqual(outputs["P00232"].meta.time_ms, 20)
+        self.assertLess(outputs["P00232"].meta.time_ms, 60)
+
+
+class FastRuleCheckTest(unittest.TestCase):
+
+    def setUp(self):
+        self.agent = PharmacyAgent()
+        self.agent.model = None
+
+    def test_payment_due_is_not_counted_as_blocking(self):
+        with self.assertLogs("agents.pharmacy_agent", level="INFO") as logs:
+            output = self.agent.verify("P00231")
+
+        self.assertEqual([issue.code for issue in output.issues], ["PHARM_ORDER_PENDING", "PHARM_PAYMENT_PENDING"])
+        self.assertIn("(1 blocking issues)", "\n".join(logs.output))
+
+    def test_rules_run_once_without_a_model(self):
+        with mock.patch.object(self.agent, "_fallback_verification", wraps=self.agent._fallback_verification) as rules:
+            output = self.agent.verify("P00232")
+
+        self.assertTrue(output.noc)
+        self.assertEqual(rules.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
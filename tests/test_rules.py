@@ -0,0 +1,82 @@
+"""Tests for the rule tables driving the rule-based fallbacks."""
+
+import unittest
+
+from agents.insurance_agent import _FALLBACK_RULES
+from agents.lab_agent import _exceeds_critical_threshold
+from utils.rules import flatten_dict, apply_rules, first_match
+
+
+class FlattenDictTest(unittest.TestCase):
+    
+    def test_nested_dicts_and_lists_use_dotted_keys(self):
+        data = {"policy": {"active": False, "limits": [10, {"cap": 5}]}, "notes": [], "meta": {}}
+        self.assertEqual(flatten_dict(data), {
+            "policy.active": False,
+            "policy.limits.0": 10,
+            "policy.limits.1.cap": 5,
+            "notes": [],
+            "meta": {},
+        })
+    
+    def test_scalar_without_prefix_is_empty(self):
+        self.assertEqual(flatten_dict(3), {})
+
+
+class ApplyRulesTest(unittest.TestCase):
+    
+    RULES = (
+        ("policy.active", "eq", False, "POLICY_INACTIVE"),
+        ("policy.cap", "lt", 10, "LOW_CAP"),
+        ("policy.active", "eq", True, "ACTIVE"),
+    )
+    
+    def test_matches_in_rule_order(self):
+        flat = flatten_dict({"policy": {"active": False, "cap": 5}})
+        self.assertEqual(apply_rules(flat, self.RULES), [("POLICY_INACTIVE", False), ("LOW_CAP", 5)])
+    
+    def test_missing_field_never_matches_ordering_rule(self):
+        self.assertEqual(apply_rules({}, self.RULES[1:2]), [])
+    
+    def test_first_match_stops_at_the_first_hit(self):
+        flat = flatten_dict({"policy": {"active": False, "cap": 5}})
+        # An unknown operator would raise KeyError if the second rule were evaluated
+        rules = self.RULES[:1] + (("policy.cap", "unknown", 0, "NEVER"),)
+        self.assertEqual(first_match(flat, rules), ("POLICY_INACTIVE", False))
+        self.assertIsNone(first_match(flat, self.RULES[2:]))
+    
+    def test_first_match_skips_unmatched_rules(self):
+        flat = flatten_dict({"policy": {"active": True, "cap": 5}})
+        self.assertEqual(first_match(flat, self.RULES), ("LOW_CAP", 5))
+    
+    def test_insurance_fallback_rules(self):
+        records = {
+            "policy_details": {"policy_status": "expired"},
+            "pre_authorization_records": [{"status": "approved"}],
+        }
+        codes = [code for code, _ in apply_rules(flatten_dict(records), _FALLBACK_RULES)]
+        self.assertEqual(codes, ["INS_POLICY_EXPIRED"])
+        
+        # No pre-authorization record at all is treated as missing
+        records = {"policy_details": {"policy_status": "active"}}
+        codes = [code for code, _ in apply_rules(flatten_dict(records), _FALLBACK_RULES)]
+        self.assertEqual(codes, ["INS_PREAUTH_MISSING"])
+
+
+class LabThresholdTest(unittest.TestCase):
+    
+    def test_bounds_are_exclusive(self):
+        self.assertFalse(_exceeds_critical_threshold({"name": "Hemoglobin", "value": 7.0}))
+        self.assertTrue(_exceeds_critical_threshold({"name": "Hemoglobin", "value": 6.9}))
+        self.assertFalse(_exceeds_critical_threshold({"name": "Platelets", "value": 450}))
+        self.assertTrue(_exceeds_critical_threshold({"name": "Platelets", "value": 451}))
+        self.assertTrue(_exceeds_critical_threshold({"name": "WBC", "value": 1.5}))
+    
+    def test_unknown_component_or_non_numeric_value_never_exceeds(self):
+        self.assertFalse(_exceeds_critical_threshold({"name": "Sodium", "value": 1}))
+        self.assertFalse(_exceeds_critical_threshold({"name": "RBC", "value": "low"}))
+        self.assertFalse(_exceeds_critical_threshold({"name": "RBC"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
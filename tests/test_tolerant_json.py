@@ -0,0 +1,34 @@
+"""Tests for decoding Gemini JSON responses wrapped in fences or prose."""
+
+import unittest
+
+from agents.base_agent import BaseAgent
+
+
+class LoadsTolerantTest(unittest.TestCase):
+    
+    def test_plain_json(self):
+        self.assertEqual(BaseAgent._loads_tolerant('{"noc": true}'), {"noc": True})
+    
+    def test_fenced_json(self):
+        self.assertEqual(BaseAgent._loads_tolerant('```json\n{"noc": true}\n```'), {"noc": True})
+        self.assertEqual(BaseAgent._loads_tolerant('```\n{"noc": true}\n```'), {"noc": True})
+    
+    def test_prose_around_json(self):
+        text = 'Result: {"noc": false, "note": "see {x}"} Thanks!'
+        self.assertEqual(BaseAgent._loads_tolerant(text), {"noc": False, "note": "see {x}"})
+    
+    def test_first_object_wins(self):
+        self.assertEqual(BaseAgent._loads_tolerant('{"a": 1} and {"b": 2}'), {"a": 1})
+    
+    def test_no_json_raises(self):
+        with self.assertRaises(ValueError):
+            BaseAgent._loads_tolerant("no JSON here")
+    
+    def test_unclosed_object_raises(self):
+        with self.assertRaises(ValueError):
+            BaseAgent._loads_tolerant('Result: {"noc": true, "confidence"')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is skipped because the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Process-wide circuit breaker for an external service.
+
+    After failure_threshold consecutive failures the circuit opens and calls are
+    skipped for cooldown_s seconds. The next call after the cooldown is let
+    through; a success closes the circuit, another failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_s: float = 30.0):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Service name used in error messages
+            failure_threshold: Consecutive failures before the circuit opens
+            cooldown_s: Seconds to skip calls once open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.fail_count = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Ensure a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        remaining = self.open_until - time.monotonic()
+        if remaining > 0:
+            raise CircuitOpenError(
+                f"{self.name} circuit open after {self.fail_count} consecutive failures, "
+                f"retrying in {remaining:.0f}s"
+            )
+
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self.fail_count = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit at the threshold"""
+        with self._lock:
+            self.fail_count += 1
+            if self.fail_count >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.cooldown_s
+
+
+# Shared by every agent so a Gemini outage costs one timeout per cooldown window
+GEMINI_BREAKER = CircuitBreaker("Gemini")
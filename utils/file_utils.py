@@ -1,8 +1,124 @@
+import functools
 import json
-from pathlib import Path
-from typing import Any, Dict, Optional
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def loads_json(data: Union[str, bytes]) -> Any:
+    """
+    Parse JSON text, using orjson when it is installed.
+    
+    Args:
+        data: JSON document as str or UTF-8 bytes
+        
+    Returns:
+        Parsed JSON value
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_json(data: Any, indent: bool = True) -> str:
+    """
+    Serialize a value to JSON text, using orjson when it is installed.
+    
+    Args:
+        data: JSON-serializable value
+        indent: Pretty-print with two-space indentation; False gives the most
+            compact form (no whitespace), e.g. for JSON embedded in prompts
+        
+    Returns:
+        JSON string (non-ASCII characters are kept as-is)
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    if indent:
+        return _json_encoder(2).encode(data)
+    return _json_encoder(None, (",", ":")).encode(data)
+
+
+@functools.lru_cache(maxsize=8)
+def _json_encoder(indent: Optional[int], separators: Optional[Tuple[str, str]] = None) -> json.JSONEncoder:
+    """
+    Stdlib encoder for the fallback path when orjson is unavailable.
+    
+    json.dumps builds a new JSONEncoder for every call with non-default
+    options; one is kept per configuration instead.
+    """
+    return json.JSONEncoder(ensure_ascii=False, indent=indent, separators=separators)
+
+
+def get_mtime_ns(file_path: str) -> int:
+    """
+    Get a file's modification time for use as a cache key.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Modification time in nanoseconds, or 0 if the file doesn't exist
+    """
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def get_file_version(file_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Get a file's (modification time, size) for use as a cache key.
+    
+    The size catches rewrites that land within the filesystem's timestamp
+    granularity and so leave the modification time unchanged.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Tuple of (mtime in nanoseconds, size in bytes), or None if the file doesn't exist
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_bytes(file_path: str) -> bytes:
+    """
+    Read a whole file with os.open/os.read.
+    
+    Skips the buffered file object (and its extra fstat/ioctl/lseek calls);
+    a file read in full by the first read() costs one open, fstat, read and close.
+    """
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+    try:
+        size = os.fstat(fd).st_size
+        data = os.read(fd, size + 1)
+        if len(data) == size:
+            return data
+        # The file changed size while being read, or the read came back short
+        chunks = [data]
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+
 
 def read_json_file(file_path: str) -> Optional[Dict[str, Any]]:
     """
@@ -15,15 +131,124 @@ def read_json_file(file_path: str) -> Optional[Dict[str, Any]]:
         Dictionary containing the JSON data, or None if file doesn't exist or is invalid
     """
     try:
-        path = Path(file_path)
-        if not path.exists():
-            return None
-        
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return loads_json(_read_bytes(file_path))
+    except FileNotFoundError:
+        return None
     except (json.JSONDecodeError, IOError) as e:
-        print(f"Error reading {file_path}: {e}")
+        logger.warning("Error reading %s: %s", file_path, e)
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def _load_json_cached(file_path: str, version: Tuple[int, int]) -> Optional[Any]:
+    """Parse a JSON file once per (path, file version)"""
+    return read_json_file(file_path)
+
+
+def read_json_file_cached(file_path: str) -> Optional[Any]:
+    """
+    Read a JSON file, reusing the parsed contents until the file changes.
+    
+    The returned object is shared between callers and must not be mutated.
+    
+    Args:
+        file_path: Path to the JSON file
+        
+    Returns:
+        Parsed JSON data, or None if file doesn't exist or is invalid
+    """
+    file_path = str(file_path)
+    version = get_file_version(file_path)
+    if version is None:
+        return None
+    return _load_json_cached(file_path, version)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_json_index(file_path: str, version: Tuple[int, int], key: str) -> Optional[Dict[Any, Any]]:
+    """Index a JSON list of records by key once per (path, file version)"""
+    data = _load_json_cached(file_path, version)
+    if not isinstance(data, list):
+        return None
+    index = {}
+    for record in data:
+        if isinstance(record, dict):
+            # The first record for a key wins, matching a linear scan
+            index.setdefault(record.get(key), record)
+    return index
+
+
+def read_json_indexed(file_path: str, key: str = "patient_id") -> Optional[Dict[Any, Any]]:
+    """
+    Read a JSON list of records as a dict keyed by one of their fields.
+    
+    The index is rebuilt only when the file changes; it and its records are
+    shared between callers and must not be mutated.
+    
+    Args:
+        file_path: Path to the JSON file
+        key: Record field to index by
+        
+    Returns:
+        Dict mapping key values to records, or None if the file doesn't exist,
+        is invalid or is not a list
+    """
+    file_path = str(file_path)
+    version = get_file_version(file_path)
+    if version is None:
         return None
+    return _load_json_index(file_path, version, key)
+
+
+def _make_parent_dirs(file_path: str):
+    """Create the directories a file path lives in"""
+    os.makedirs(os.path.dirname(os.fspath(file_path)) or ".", exist_ok=True)
+
+
+def _write_bytes(file_path: str, payload: bytes, mode: str = 'wb'):
+    """
+    Write encoded bytes to a file in a single write call.
+    
+    Parent directories are only created when the first open fails, so repeat
+    writes to an existing directory skip the mkdir calls.
+    """
+    try:
+        f = open(file_path, mode)
+    except FileNotFoundError:
+        _make_parent_dirs(file_path)
+        f = open(file_path, mode)
+    with f:
+        f.write(payload)
+
+
+def _replace_bytes(file_path: str, payload: bytes):
+    """
+    Replace a file's contents atomically.
+    
+    The payload is written to a temporary file next to the target and renamed
+    over it, so a crash mid-write leaves the previous version intact instead
+    of a truncated file.
+    """
+    tmp_path = f"{os.fspath(file_path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        _write_bytes(tmp_path, payload)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        # A failed write (e.g. disk full) or rename must not leave the temp file behind
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _encode_json(data: Any, indent: Optional[int] = 2) -> bytes:
+    """Encode a value as UTF-8 JSON bytes for writing to disk"""
+    # orjson only supports two-space indentation
+    if orjson is not None and indent in (2, None):
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option)
+    return _json_encoder(indent).encode(data).encode('utf-8')
 
 
 def write_json_file(file_path: str, data: Dict[str, Any], indent: int = 2) -> bool:
@@ -39,14 +264,11 @@ def write_json_file(file_path: str, data: Dict[str, Any], indent: int = 2) -> bo
         True if successful, False otherwise
     """
     try:
-        path = Path(file_path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=indent, ensure_ascii=False)
+        # Encode in memory and hand the OS one write instead of many small ones
+        _replace_bytes(file_path, _encode_json(data, indent))
         return True
     except IOError as e:
-        print(f"Error writing {file_path}: {e}")
+        logger.warning("Error writing %s: %s", file_path, e)
         return False
 
 
@@ -54,6 +276,9 @@ def append_to_json_log(file_path: str, entry: Dict[str, Any]) -> bool:
     """
     Append an entry to a JSON log file (array of entries).
     
+    A path ending in ".jsonl" is appended to as JSON Lines with append_jsonl()
+    instead, so the log is never reread or rewritten.
+    
     Args:
         file_path: Path to the log file
         entry: Dictionary entry to append
@@ -61,23 +286,113 @@ def append_to_json_log(file_path: str, entry: Dict[str, Any]) -> bool:
     Returns:
         True if successful, False otherwise
     """
+    if str(file_path).endswith(".jsonl"):
+        return append_jsonl(file_path, entry)
+    
     try:
-        path = Path(file_path)
-        
         # Read existing log or create new array
-        if path.exists():
-            with open(path, 'r', encoding='utf-8') as f:
-                log = json.load(f)
-        else:
+        try:
+            log = loads_json(_read_bytes(file_path))
+        except FileNotFoundError:
             log = []
         
-        # Append new entry
+        # Append new entry and write the log back with one encode and one write
         log.append(entry)
-        
-        # Write back
-        return write_json_file(file_path, log)
+        _replace_bytes(file_path, _encode_json(log))
+        return True
     except Exception as e:
-        print(f"Error appending to {file_path}: {e}")
+        logger.warning("Error appending to %s: %s", file_path, e)
+        return False
+
+
+def append_jsonl(file_path: str, entry: Dict[str, Any]) -> bool:
+    """
+    Append an entry to a JSON Lines log file (one JSON object per line).
+    
+    Unlike append_to_json_log(), the existing log is never read, so the cost
+    of an append does not grow with the size of the log.
+    
+    Args:
+        file_path: Path to the log file
+        entry: Dictionary entry to append
+        
+    Returns:
+        True if successful, False otherwise
+    """
+    try:
+        if orjson is not None:
+            line = orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+        else:
+            line = (_json_encoder(None).encode(entry) + "\n").encode('utf-8')
+        _write_bytes(file_path, line, 'ab')
+        return True
+    except (IOError, TypeError) as e:
+        logger.warning("Error appending to %s: %s", file_path, e)
+        return False
+
+
+def read_jsonl(file_path: str) -> List[Any]:
+    """
+    Read every entry from a JSON Lines log file.
+    
+    Blank lines and lines that don't parse (e.g. a write cut short) are skipped.
+    
+    Args:
+        file_path: Path to the log file
+        
+    Returns:
+        List of entries, empty if the file doesn't exist
+    """
+    entries = []
+    try:
+        with open(file_path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(loads_json(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    except IOError as e:
+        logger.warning("Error reading %s: %s", file_path, e)
+    return entries
+
+
+def migrate_json_log(json_path: str, jsonl_path: str) -> bool:
+    """
+    Move the entries of a JSON array log into a JSON Lines log.
+    
+    The old entries are written ahead of anything already in the JSON Lines
+    file, and the JSON file is removed once they are saved.
+    
+    Args:
+        json_path: Path to the JSON array log written by append_to_json_log()
+        jsonl_path: Path to the JSON Lines log
+        
+    Returns:
+        True if a JSON log was migrated, False if there was none or it was unreadable
+    """
+    legacy = read_json_file(json_path)
+    if not isinstance(legacy, list):
+        return False
+    
+    entries = legacy + read_jsonl(jsonl_path)
+    if orjson is not None:
+        payload = b"".join(
+            orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+            for entry in entries
+        )
+    else:
+        encode = _json_encoder(None).encode
+        payload = "".join(encode(entry) + "\n" for entry in entries).encode('utf-8')
+    try:
+        _replace_bytes(jsonl_path, payload)
+        os.remove(json_path)
+        return True
+    except IOError as e:
+        logger.warning("Error migrating %s: %s", json_path, e)
         return False
 
 
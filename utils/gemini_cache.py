@@ -0,0 +1,51 @@
+import hashlib
+import threading
+from typing import Optional
+
+from cachetools import TTLCache
+
+
+# Gemini response text keyed by prompt hash, shared by every agent in the process
+CACHE = TTLCache(maxsize=512, ttl=600)
+
+# TTLCache is not thread-safe on its own
+_lock = threading.Lock()
+
+
+def prompt_key(prompt: str) -> str:
+    """
+    Build a compact cache key for a prompt.
+    
+    Args:
+        prompt: Fully rendered prompt text
+        
+    Returns:
+        Hex digest identifying the prompt
+    """
+    return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    """
+    Look up a cached Gemini response.
+    
+    Args:
+        key: Key produced by prompt_key()
+        
+    Returns:
+        Cached response text, or None on a miss or expired entry
+    """
+    with _lock:
+        return CACHE.get(key)
+
+
+def cache_response(key: str, response_text: str):
+    """
+    Store a Gemini response for later reuse.
+    
+    Args:
+        key: Key produced by prompt_key()
+        response_text: Raw response text returned by Gemini
+    """
+    with _lock:
+        CACHE[key] = response_text
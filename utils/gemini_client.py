@@ -0,0 +1,99 @@
+import asyncio
+import functools
+import threading
+import weakref
+from typing import Any, Dict
+
+from config import Config
+
+
+# GenerativeModel instances shared by every agent in the process, keyed by model name
+_MODELS: Dict[str, Any] = {}
+
+# One semaphore per event loop; asyncio primitives cannot be shared across loops
+_SLOTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def configure(api_key: str):
+    """
+    Configure the Gemini SDK with an API key.
+
+    Repeated calls with the same key are no-ops. The SDK is imported on first
+    use so offline runs never load it.
+    
+    The transport is left at the SDK default on purpose: sync calls share one
+    persistent gRPC channel and async calls one grpc_asyncio channel, so no
+    request pays for a new TLS handshake. Passing transport="grpc" would give
+    the async client a sync channel and break generate_content_async.
+
+    Args:
+        api_key: Gemini API key
+    """
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+
+
+def get_model(name: str) -> Any:
+    """
+    Get the shared GenerativeModel for a model name, creating it on first use.
+
+    Args:
+        name: Gemini model name (e.g., Config.GEMINI_MODEL)
+
+    Returns:
+        GenerativeModel shared across agents
+    """
+    model = _MODELS.get(name)
+    if model is None:
+        with _lock:
+            model = _MODELS.get(name)
+            if model is None:
+                import google.generativeai as genai
+                model = _MODELS[name] = genai.GenerativeModel(name)
+    return model
+
+
+def async_slot() -> asyncio.Semaphore:
+    """
+    Get the semaphore bounding concurrent async Gemini calls on the running loop.
+    
+    Every generate_content_async call should hold a slot, so concurrent
+    verifications share at most Config.GEMINI_CONCURRENCY in-flight requests
+    on the pooled channel instead of tripping the API's rate limits.
+    
+    Returns:
+        Semaphore for the current event loop
+    """
+    loop = asyncio.get_running_loop()
+    slot = _SLOTS.get(loop)
+    if slot is None:
+        slot = _SLOTS[loop] = asyncio.Semaphore(Config.GEMINI_CONCURRENCY)
+    return slot
+
+
+def warmup(name: str) -> threading.Thread:
+    """
+    Open the Gemini connection in the background with a token-count request.
+    
+    Call after configure() at application start so the first verification
+    does not pay for connection and TLS setup. Failures are ignored; the
+    first real call reports them.
+    
+    Args:
+        name: Gemini model name (e.g., Config.GEMINI_MODEL)
+        
+    Returns:
+        The started daemon thread
+    """
+    def _ping():
+        try:
+            get_model(name).count_tokens("ping")
+        except Exception:
+            pass
+    
+    thread = threading.Thread(target=_ping, name="gemini-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,43 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+from config import Config
+
+
+# Listener writing queued records to stderr (None until configure_logging() runs)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(fmt: str = "%(levelname)s %(name)s: %(message)s") -> logging.handlers.QueueListener:
+    """
+    Route log records through a queue so logging never blocks the caller on I/O.
+
+    Records are formatted and written to stderr by a background listener thread,
+    stopped (and flushed) at interpreter exit. Repeated calls are no-ops.
+
+    Args:
+        fmt: Log record format
+
+    Returns:
+        The running queue listener
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt))
+
+    # The queue side only merges the message arguments; the listener applies fmt
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=Config.LOG_LEVEL, handlers=[queue_handler])
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
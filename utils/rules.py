@@ -0,0 +1,95 @@
+import operator
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Comparison operators available to rule tables
+OPS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+}
+
+# (dotted field path, operator name, value, issue code)
+Rule = Tuple[str, str, Any, str]
+
+
+def flatten_dict(data: Any, prefix: str = "") -> Dict[str, Any]:
+    """
+    Flatten nested dicts and lists into a single dict with dotted keys.
+
+    List items are keyed by index, e.g. {"a": [{"b": 1}]} -> {"a.0.b": 1}.
+
+    Args:
+        data: Nested dict/list structure
+        prefix: Key prefix for the current level
+
+    Returns:
+        Dict mapping dotted paths to leaf values
+    """
+    flat = {}
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    else:
+        return {prefix: data} if prefix else {}
+
+    for key, value in items:
+        path = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, (dict, list)) and value:
+            flat.update(flatten_dict(value, path))
+        else:
+            flat[path] = value
+    return flat
+
+
+def _evaluate(flat: Dict[str, Any], path: str, op: str, value: Any) -> Tuple[bool, Any]:
+    """Evaluate one rule condition; returns (matched, field value)"""
+    field_value = flat.get(path)
+    try:
+        return bool(OPS[op](field_value, value)), field_value
+    except TypeError:
+        # Ordering comparisons against a missing or non-numeric field never match
+        return False, field_value
+
+
+def apply_rules(flat: Dict[str, Any], rules: Iterable[Rule]) -> List[Tuple[str, Any]]:
+    """
+    Evaluate a rule table against flattened data.
+
+    Missing fields evaluate as None.
+
+    Args:
+        flat: Output of flatten_dict()
+        rules: Rules as (path, op, value, issue_code) tuples
+
+    Returns:
+        List of (issue_code, field value) for every rule that matched, in rule order
+    """
+    matches = []
+    for path, op, value, issue_code in rules:
+        matched, field_value = _evaluate(flat, path, op, value)
+        if matched:
+            matches.append((issue_code, field_value))
+    return matches
+
+
+def first_match(flat: Dict[str, Any], rules: Iterable[Rule]) -> Optional[Tuple[str, Any]]:
+    """
+    Return the first rule that matches, without evaluating the rest.
+
+    Args:
+        flat: Output of flatten_dict()
+        rules: Rules as (path, op, value, issue_code) tuples
+
+    Returns:
+        (issue_code, field value) of the first matching rule, or None if none match
+    """
+    for path, op, value, issue_code in rules:
+        matched, field_value = _evaluate(flat, path, op, value)
+        if matched:
+            return (issue_code, field_value)
+    return None